@@ -0,0 +1,304 @@
+"""Route benchmarks
+
+This module benchmarks application's hot routes end to end against
+    :class:`~videolog.fake.FakeYouTube` and a synthetic JSON database of
+    configurable scale. Reports latency percentiles, YouTube Data API calls per
+    request and peak traced memory per route.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_routes --scale 1k --scale 10k
+"""
+
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+from videolog.app import app
+from videolog.fake import FakeYouTube, FAKE_USER_ID, PLAYLIST_MAX_ITEMS
+
+SCALES = {
+    '1k': (10, 100),
+    '10k': (100, 100),
+    '100k': (1000, 100)
+}
+
+ROUTES = ['channel', 'all', 'video', 'batch', 'comments', 'play']
+
+def build_db(fake, played = 0.3, archived = 0.05, seed = 0):
+    """Builds synthetic database.
+
+    Tracks all fake channels, marks given share of videos as played and
+        archives given share of videos into fake archive playlists.
+
+    Args:
+        fake (videolog.fake.FakeYouTube): Fake API holding the data set.
+        played (float): Share of played videos.
+        archived (float): Share of archived videos.
+        seed (int): Random seed.
+
+    Returns:
+        dict: JSON database object.
+    """
+
+    rng = random.Random(seed)
+    channels = {}
+    archive_videos = []
+
+    for channel_index in range(fake.channels):
+        channel_id = fake.channel_id(channel_index)
+        channels[channel_id] = {'played': {}, 'archived': {}}
+
+        for index in range(fake.videos):
+            video_id = fake.video_id(channel_index, index)
+            if rng.random() < played:
+                channels[channel_id]['played'][video_id] = '2018-01-01T00:00:00+00:00'
+            if rng.random() < archived:
+                archive_videos.append((channel_id, video_id))
+
+    for start in range(0, len(archive_videos), PLAYLIST_MAX_ITEMS):
+        chunk = archive_videos[start:start + PLAYLIST_MAX_ITEMS]
+        archive_id = fake.create_playlist(
+            'Fake User\'s Archive #' + str(start // PLAYLIST_MAX_ITEMS + 1),
+            [video_id for channel_id, video_id in chunk]
+        )
+        for channel_id, video_id in chunk:
+            channels[channel_id]['archived'][video_id] = archive_id
+
+    return {FAKE_USER_ID: channels}
+
+def percentile(values, p):
+    """Gets percentile.
+
+    Args:
+        values (list): Sorted values.
+        p (float): Percentile (0-100).
+
+    Returns:
+        float: Nearest-rank percentile.
+    """
+
+    if not values:
+        return float('nan')
+    rank = max(int(round(p / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+def route_requests(db, fake, rng):
+    """Gets request factories.
+
+    Args:
+        db (dict): JSON database object.
+        fake (videolog.fake.FakeYouTube): Fake API.
+        rng (random.Random): Random generator.
+
+    Returns:
+        dict: Route name to function returning (method, URL, kwargs) tuple.
+    """
+
+    channels = list(db[FAKE_USER_ID].keys())
+    archived = [
+        video_id
+        for channel in db[FAKE_USER_ID].values()
+        for video_id in channel['archived'].keys()
+    ]
+
+    def channel():
+        return 'get', '/videos/' + rng.choice(channels), {}
+
+    def all():
+        return 'get', '/videos/all', {}
+
+    def video():
+        channel_index = rng.randrange(fake.channels)
+        return 'get', '/videos/{}/{}'.format(
+            fake.channel_id(channel_index),
+            fake.video_id(channel_index, rng.randrange(fake.videos))
+        ), {}
+
+    def batch():
+        downloaded = '\n'.join(
+            'youtube ' + video_id for video_id in archived[::2]
+        ).encode('utf-8')
+        return 'post', '/archive/batch', {'data': {
+            'archiveFile': (io.BytesIO(downloaded), 'archive.txt')
+        }, 'content_type': 'multipart/form-data'}
+
+    def comments():
+        return 'get', '/archive/comments', {}
+
+    def play():
+        channel_index = rng.randrange(fake.channels)
+        return 'get', '/api/videos/{}/{}/play'.format(
+            fake.channel_id(channel_index),
+            fake.video_id(channel_index, rng.randrange(fake.videos))
+        ), {}
+
+    return {
+        'channel': channel, 'all': all, 'video': video,
+        'batch': batch, 'comments': comments, 'play': play
+    }
+
+def bench_route(client, fake, factory, iterations):
+    """Benchmarks single route.
+
+    Args:
+        client (flask.testing.FlaskClient): Logged in test client.
+        fake (videolog.fake.FakeYouTube): Fake API.
+        factory (function): Request factory.
+        iterations (int): Number of timed requests.
+
+    Returns:
+        dict: Latency percentiles (ms), API calls per request, peak memory
+            (MiB) and number of failed requests.
+    """
+
+    def request():
+        method, url, kwargs = factory()
+        response = getattr(client, method)(url, **kwargs)
+        response.get_data()
+        return response.status_code < 400
+
+    request()
+
+    latencies = []
+    errors = 0
+    calls = sum(fake.calls.values())
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        errors += 0 if request() else 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    calls = (sum(fake.calls.values()) - calls) / iterations
+
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99), 'max': latencies[-1],
+        'calls': calls, 'peak': peak, 'errors': errors
+    }
+
+def bench_scale(name, channels, videos, routes, iterations, latency, seed):
+    """Benchmarks routes at given scale.
+
+    Args:
+        name (str): Scale name.
+        channels (int): Number of channels.
+        videos (int): Number of videos per channel.
+        routes (list): Names of benchmarked routes.
+        iterations (int): Number of timed requests per route.
+        latency (float): Fake API latency (in seconds).
+        seed (int): Random seed.
+
+    Returns:
+        list: Results (dict per route).
+    """
+
+    fake = FakeYouTube(channels = channels, videos = videos, latency = latency)
+    db = build_db(fake, seed = seed)
+    cwd = os.getcwd()
+    results = []
+
+    app.config['API_ROOT_URL'] = fake.start()
+    app.logger.disabled = True
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            with open('db.json', 'w') as f:
+                json.dump(db, f)
+
+            factories = route_requests(db, fake, random.Random(seed))
+            with app.test_client() as client:
+                with client.session_transaction() as session:
+                    session['credentials'] = {'token': 'bench_token'}
+                    session['user'] = {
+                        'id': FAKE_USER_ID, 'name': 'Fake User', 'thumbnail': ''
+                    }
+
+                for route in routes:
+                    result = bench_route(client, fake, factories[route], iterations)
+                    result.update(scale = name, route = route)
+                    results.append(result)
+                    click.echo(format_result(result))
+    finally:
+        os.chdir(cwd)
+        app.logger.disabled = False
+        app.config.pop('API_ROOT_URL', None)
+        fake.stop()
+
+    return results
+
+def format_result(result):
+    """Formats result as table row.
+
+    Args:
+        result (dict): Route benchmark result.
+
+    Returns:
+        str: Table row.
+    """
+
+    return (
+        '{scale:>6} {route:>9} {p50:>10.1f} {p90:>10.1f} {p99:>10.1f} '
+        '{max:>10.1f} {calls:>9.1f} {peak:>9.1f} {errors:>6}'
+    ).format(**result)
+
+@click.command()
+@click.option('--scale', '-s', 'scales', multiple = True,
+              type = click.Choice(sorted(SCALES.keys())),
+              help = 'Data set scale (videos in total). Can be repeated.')
+@click.option('--channels', default = None, type = int,
+              help = 'Custom number of channels (overrides --scale).')
+@click.option('--videos', default = 100,
+              help = 'Videos per channel when using --channels.')
+@click.option('--route', '-r', 'routes', multiple = True,
+              type = click.Choice(ROUTES),
+              help = 'Benchmarked route. Can be repeated. Defaults to all.')
+@click.option('--iterations', '-n', default = 10,
+              help = 'Timed requests per route.')
+@click.option('--latency', default = 0.0,
+              help = 'Fake API latency per call (in seconds).')
+@click.option('--seed', default = 0,
+              help = 'Random seed.')
+@click.option('--output', '-o', default = None, type = click.Path(),
+              help = 'Write results to JSON file.')
+def main(scales, channels, videos, routes, iterations, latency, seed, output):
+    """Benchmarks application's hot routes."""
+
+    if channels is not None:
+        runs = [('{}x{}'.format(channels, videos), channels, videos)]
+    else:
+        runs = [
+            (name,) + SCALES[name]
+            for name in (scales or ['1k'])
+        ]
+
+    click.echo('{:>6} {:>9} {:>10} {:>10} {:>10} {:>10} {:>9} {:>9} {:>6}'.format(
+        'scale', 'route', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms',
+        'api/req', 'peak MiB', 'errors'
+    ))
+
+    results = []
+    for name, run_channels, run_videos in runs:
+        results.extend(bench_scale(
+            name, run_channels, run_videos, list(routes or ROUTES),
+            iterations, latency, seed
+        ))
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent = 2, sort_keys = True)
+
+if __name__ == '__main__':
+    main()
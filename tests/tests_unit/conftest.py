@@ -0,0 +1,24 @@
+import flask
+import pytest
+
+from videolog.app import app
+from videolog.cache import clear_caches
+from videolog.fake import FakeYouTube, FAKE_USER_ID
+
+@pytest.fixture(autouse = True)
+def session_path(tmpdir, monkeypatch):
+    monkeypatch.setitem(app.config, 'SESSION_PATH', str(tmpdir.join('sessions.sqlite')))
+
+@pytest.fixture
+def fake(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join('db.json').write('{}')
+    fake = FakeYouTube(channels = 3, videos = 120, subscriptions = 2)
+    app.config['API_ROOT_URL'] = fake.start()
+    clear_caches()
+    with app.test_request_context():
+        flask.session['credentials'] = { 'token': 'test_token' }
+        flask.session['user'] = { 'id': FAKE_USER_ID, 'name': 'Fake User' }
+        yield fake
+    app.config.pop('API_ROOT_URL')
+    fake.stop()
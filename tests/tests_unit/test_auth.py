@@ -1,7 +1,8 @@
+import time
+
 import flask
 import flexmock
 import pytest
-import requests
 
 from videolog.app import app
 from videolog.auth import auth_check
@@ -19,7 +20,9 @@ def test_auth_check_credentials():
 
 def test_auth_check_grant():
     import videolog.auth
-    flexmock(requests, get = flexmock(status_code = 400))
+    flexmock(videolog.auth, get_session = flexmock(
+        get = lambda *args, **kwargs: flexmock(status_code = 400)
+    ))
     with app.test_client() as client:
         with client.session_transaction() as session:
             session['credentials'] = {
@@ -41,3 +44,66 @@ def test_auth_check_token():
         with pytest.raises(Exception) as e:
             auth_check()
         assert str(e.value) == 'logout'
+
+def test_auth_check_cached():
+    import videolog.auth
+    flexmock(videolog.auth).should_receive('get_session').never()
+    with app.test_request_context():
+        flask.session['credentials'] = {
+            'token': 'test_token'
+        }
+        flask.session['token_expiry'] = time.time() + 3600
+
+        auth_check()
+
+def test_auth_check_expired():
+    import videolog.auth
+    session = flexmock()
+    session.should_receive('get').and_return(
+        flexmock(status_code = 200, json = lambda: { 'expires_in': '3600' })
+    ).once()
+    flexmock(videolog.auth, get_session = session)
+    with app.test_request_context():
+        flask.session['credentials'] = {
+            'token': 'test_token'
+        }
+        flask.session['token_expiry'] = time.time()
+
+        auth_check()
+        auth_check()
+        assert flask.session['token_expiry'] > time.time() + 3000
+
+def test_auth_check_unavailable():
+    import videolog.auth
+    session = flexmock()
+    session.should_receive('get').and_return(flexmock(status_code = 503)).once()
+    flexmock(videolog.auth, get_session = session)
+    with app.test_request_context():
+        flask.session['credentials'] = {
+            'token': 'test_token'
+        }
+        flask.session['token_expiry'] = time.time()
+
+        auth_check()
+        auth_check()
+        assert flask.session['token_expiry'] > (
+            time.time() + videolog.auth.TOKEN_EXPIRY_MARGIN
+        )
+
+def test_auth_check_refresh_unavailable():
+    import google.auth.exceptions
+    import google.oauth2.credentials
+    import videolog.auth
+    (flexmock(google.oauth2.credentials.Credentials)
+        .should_receive('refresh')
+        .and_raise(google.auth.exceptions.TransportError('unreachable'))
+        .once())
+    with app.test_request_context():
+        flask.session['credentials'] = {
+            'token': 'test_token', 'refresh_token': 'test_refresh_token'
+        }
+        flask.session['token_expiry'] = time.time()
+
+        auth_check()
+        auth_check()
+        assert flask.session['credentials']['token'] == 'test_token'
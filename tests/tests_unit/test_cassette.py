@@ -0,0 +1,39 @@
+import flask
+import pytest
+
+from videolog.app import app
+from videolog.cassette import CassetteError
+from videolog.fake import FakeYouTube, FAKE_USER_ID
+from videolog.youtube import yt_get_client, yt_get_subscriptions
+
+@pytest.fixture
+def session():
+    with app.test_request_context():
+        flask.session['credentials'] = { 'token': 'test_token' }
+        flask.session['user'] = { 'id': FAKE_USER_ID, 'name': 'Fake User' }
+        yield flask.session
+    for key in ['API_ROOT_URL', 'CASSETTE_MODE', 'CASSETTE_DIR', 'CASSETTE_TIMING']:
+        app.config.pop(key, None)
+
+def test_cassette_record_replay(session, tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join('db.json').write('{}')
+    fake = FakeYouTube(channels = 3, subscriptions = 3)
+    app.config['API_ROOT_URL'] = fake.start()
+    app.config['CASSETTE_DIR'] = str(tmpdir)
+    app.config['CASSETTE_MODE'] = 'record'
+
+    recorded = yt_get_subscriptions()
+    fake.stop()
+
+    assert len(recorded) == 3
+    assert tmpdir.join(FAKE_USER_ID + '.jsonl').check()
+
+    app.config['CASSETTE_MODE'] = 'replay'
+    app.config['CASSETTE_TIMING'] = False
+
+    assert yt_get_subscriptions() == recorded
+    assert fake.calls['subscriptions.list'] == 1
+
+    with pytest.raises(CassetteError):
+        yt_get_client().playlists().list(part = 'snippet', mine = True).execute()
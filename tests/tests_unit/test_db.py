@@ -1,12 +1,17 @@
 import io
 import json
+import os
 
 import builtins
+import flask
 import flexmock
 import pytest
 
-from videolog.db import get_db, update_db
+from videolog.db import get_db, update_db, db_apply, db_update_archives
+from videolog.db import db_diff_archives, db_get_archive_counts, db_get_archived
 from videolog.db import db_get_tracks
+from videolog.db import db_update_tracks
+from videolog.fake import FAKE_USER_ID
 
 DB_FIXTURE_PATH = './tests/fixtures/db.json'
 
@@ -37,6 +42,7 @@ def test_update_db():
 
     flexmock(builtins, open = storage)
     flexmock(storage, close = True)
+    flexmock(os).should_receive('replace').with_args(str, 'db.json').once()
 
     db['user_id']['channel_id']['played']['video_id'] = 'modified'
     update_db(db)
@@ -69,3 +75,133 @@ def test_db_get_tracks():
         #with app.app_context():
         #    assert db_get_tracks() == True
     #assert db_get_tracks() == db_get_tracks(sort_by_played = None)
+
+def test_db_get_archive_counts():
+    from videolog.app import app
+    flexmock(builtins, open = open(DB_FIXTURE_PATH))
+
+    with app.test_request_context():
+        flask.session['user'] = { 'id': 'user_id' }
+        assert db_get_archive_counts() == { 'playlist_id': 1 }
+
+def test_db_diff_archives():
+    from videolog.app import app
+    db = { 'user_id': {
+        'a': { 'played': {}, 'archived': { 'v1': 'p1', 'v2': 'p1', 'v3': 'p2' },
+            'archived_items': { 'v1': 'i1', 'v2': 'i2' } }
+    } }
+
+    with app.test_request_context():
+        flask.session['user'] = { 'id': 'user_id' }
+        assert db_diff_archives(db, {
+            'p1': { 'v1': 'i1', 'v4': 'i4' },
+            'p2': { 'v2': 'i5' }
+        }) == {
+            'added': { 'p1': ['v4'] },
+            'removed': { 'p2': ['v3'] },
+            'moved': { 'v2': 'p2' },
+            'items': { 'v4': 'i4', 'v2': 'i5' }
+        }
+        assert db_diff_archives(db, {
+            'p1': { 'v1': 'i1', 'v2': 'i2' },
+            'p2': { 'v3': 'i3' }
+        }) == { 'added': {}, 'removed': {}, 'moved': {}, 'items': { 'v3': 'i3' } }
+
+def test_db_get_tracks_cache(fake, tmpdir):
+    tmpdir.join('db.json').write(json.dumps({ FAKE_USER_ID: {
+        fake.channel_id(index): { 'played': {}, 'archived': {} }
+        for index in range(3)
+    } }))
+
+    assert [track['id'] for track in db_get_tracks(sort_by_played = False)] == [
+        fake.channel_id(index) for index in range(3)
+    ]
+    db_update_tracks(fake.channel_id(2), True)
+    tracks = db_get_tracks(sort_by_played = True)
+
+    assert tracks[0]['id'] == fake.channel_id(2)
+    assert tracks[0]['statistics']['playedCount'] == 1
+    assert fake.calls['channels.list'] == 1
+
+    db_update_tracks()
+    db_get_tracks(sort_by_played = True)
+    assert fake.calls['channels.list'] == 2
+
+def test_db_update_archives(fake, tmpdir, monkeypatch):
+    import videolog.youtube
+
+    archive_id = fake.create_playlist('Archive', [
+        fake.video_id(0, 0), fake.video_id(1, 0)
+    ])
+    tmpdir.join('db.json').write(json.dumps({ FAKE_USER_ID: {
+        fake.channel_id(0): { 'played': {}, 'archived': {
+            fake.video_id(0, 0): archive_id
+        } }
+    } }))
+    get_playlist_items = videolog.youtube.yt_get_playlist_items
+
+    def concurrent_update(playlist_id):
+        # Video played while the sync is paging archives.
+        def update(db):
+            db[FAKE_USER_ID][fake.channel_id(0)]['played']['video'] = 'now'
+        db_apply(update)
+        return get_playlist_items(playlist_id)
+
+    monkeypatch.setattr(videolog.youtube, 'yt_get_playlist_items', concurrent_update)
+    report = db_update_archives()
+    db = get_db()[FAKE_USER_ID]
+
+    assert report['added'] == { archive_id: [fake.video_id(1, 0)] }
+    assert db[fake.channel_id(0)]['played'] == { 'video': 'now' }
+    assert db[fake.channel_id(1)]['archived'] == { fake.video_id(1, 0): archive_id }
+    assert not [name for name in os.listdir(str(tmpdir)) if name.endswith('.tmp')]
+
+def test_db_update_archives_failed(fake, tmpdir, monkeypatch):
+    import videolog.youtube
+
+    archive_ids = [
+        fake.create_playlist('Archive', [fake.video_id(0, 0)]),
+        fake.create_playlist('Archive #2', [fake.video_id(0, 1)])
+    ]
+    tmpdir.join('db.json').write(json.dumps({ FAKE_USER_ID: {
+        fake.channel_id(0): { 'played': {}, 'archived': {
+            fake.video_id(0, 0): archive_ids[0],
+            fake.video_id(0, 1): archive_ids[1],
+            fake.video_id(0, 2): archive_ids[1]
+        } }
+    } }))
+    get_playlist_items = videolog.youtube.yt_get_playlist_items
+
+    def failing(playlist_id):
+        fake.error_rate = 1.0 if playlist_id == archive_ids[0] else 0.0
+        return get_playlist_items(playlist_id)
+
+    monkeypatch.setattr(videolog.youtube, 'yt_get_playlist_items', failing)
+    report = db_update_archives()
+    db = get_db()[FAKE_USER_ID]
+
+    assert report['removed'] == { archive_ids[1]: [fake.video_id(0, 2)] }
+    assert db[fake.channel_id(0)]['archived'] == {
+        fake.video_id(0, 0): archive_ids[0],
+        fake.video_id(0, 1): archive_ids[1]
+    }
+
+def test_db_update_archives_counts(fake, tmpdir):
+    archive_ids = [
+        fake.create_playlist('Archive', [fake.video_id(0, 0), 'deleted_video']),
+        fake.create_playlist('Archive #2')
+    ]
+    tmpdir.join('db.json').write(json.dumps({
+        FAKE_USER_ID: { fake.channel_id(0): { 'played': {}, 'archived': {
+            fake.video_id(0, 0): archive_ids[0]
+        } } },
+        'meta': { FAKE_USER_ID: { 'archives': { archive_ids[1]: 0 } } }
+    }))
+
+    assert db_get_archive_counts() == { archive_ids[0]: 1, archive_ids[1]: 0 }
+
+    report = db_update_archives()
+
+    assert report['added'] == { archive_ids[0]: ['deleted_video'] }
+    assert db_get_archive_counts() == { archive_ids[0]: 2, archive_ids[1]: 0 }
+    assert 'deleted_video' not in db_get_archived()
@@ -0,0 +1,35 @@
+from videolog.fake import FAKE_USER_ID
+from videolog.youtube import yt_get_user, yt_get_subscriptions
+from videolog.youtube import yt_get_channel, yt_get_playlist_items
+from videolog.youtube import yt_insert_to_playlist, yt_remove_from_playlist
+
+def test_fake_user(fake):
+    assert yt_get_user()['id'] == FAKE_USER_ID
+    assert yt_get_subscriptions(list_only = True).keys() == set([
+        fake.channel_id(0), fake.channel_id(1)
+    ])
+
+def test_fake_uploads_pagination(fake):
+    channel = yt_get_channel('contentDetails', channel_id = fake.channel_id(2))
+    uploads = channel['contentDetails']['relatedPlaylists']['uploads']
+    video_ids = yt_get_playlist_items(uploads, video_ids_only = True)
+
+    assert len(video_ids) == 120
+    assert video_ids[0] == fake.video_id(2, 119)
+    assert fake.calls['playlistItems.list'] == 3
+
+def test_fake_playlist_items(fake):
+    playlist_id = fake.create_playlist('Test')
+
+    assert yt_insert_to_playlist(fake.video_id(0, 1), playlist_id)
+    assert yt_get_playlist_items(playlist_id, video_ids_only = True) == [
+        fake.video_id(0, 1)
+    ]
+    assert yt_remove_from_playlist(fake.video_id(0, 1), playlist_id)
+    assert yt_get_playlist_items(playlist_id) == []
+
+def test_fake_errors(fake):
+    fake.error_rate = 1.0
+
+    assert yt_get_subscriptions() == []
+    assert fake.calls['subscriptions.list'] == 1
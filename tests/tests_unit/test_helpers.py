@@ -1,5 +1,9 @@
+import io
+import zipfile
+
 import pytest
-from videolog.helpers import build_resource, allowed_file
+from videolog.helpers import build_resource, allowed_file, paginate, stream_zip
+from videolog.helpers import filter_downloaded, parse_duration, shard
 
 def test_build_resource():
     assert build_resource({}) == {}
@@ -25,3 +29,53 @@ def test_allowed_file(filename):
         assert allowed_file(filename) == True
     else:
         assert allowed_file(filename) == False
+
+def test_paginate():
+    items = ['e', 'd', 'c', 'b', 'a']
+    key = lambda item: item
+
+    assert paginate(items, key, size = 2) == (['e', 'd'], 'd')
+    assert paginate(items, key, 'd', 2) == (['c', 'b'], 'b')
+    assert paginate(items, key, 'b', 2) == (['a'], None)
+    assert paginate(items[1:], key, 'dd', 2) == (['d', 'c'], 'c')
+    assert paginate(items, key, 'a', 2) == ([], None)
+
+def test_stream_zip():
+    chunks = list(stream_zip([('a/1.json', '[]'), ('b/2.json', b'{}')]))
+
+    assert len(chunks) == 3
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.namelist() == ['a/1.json', 'b/2.json']
+        assert zf.read('b/2.json') == b'{}'
+
+def test_filter_downloaded():
+    lines = io.BytesIO(
+        b'youtube aaaaaaaaaaa\r\n'
+        b'vimeo bbbbbbbbbbb\n'
+        b'\n'
+        b'malformed\n'
+        b'youtube \xff\n'
+        b'youtube ccccccccccc'
+    )
+
+    assert filter_downloaded(lines, ['aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc']) == set([
+        'bbbbbbbbbbb'
+    ])
+
+def test_parse_duration():
+    assert parse_duration('PT1H2M3S') == 3723
+    assert parse_duration('P1DT1S') == 86401
+    assert parse_duration('PT15M') == 900
+    assert parse_duration('P0D') == 0
+    assert parse_duration(None) == 0
+
+def test_shard():
+    durations = { 'a': 10, 'b': 7, 'c': 5, 'd': 4, 'e': 3, 'f': 1 }
+    channels = { 'a': 'x', 'b': 'y', 'c': 'y', 'd': 'z', 'e': 'z', 'f': 'z' }
+
+    assert shard('abcdef', 2) == [['a', 'c', 'e'], ['b', 'd', 'f']]
+    assert shard('fedcba', 2, durations.get) == [['a', 'd', 'f'], ['b', 'c', 'e']]
+    assert shard('abcdef', 2, durations.get, channels.get) == [
+        ['b', 'c'], ['a', 'd', 'e', 'f']
+    ]
+    assert shard('a', 3) == [['a'], [], []]
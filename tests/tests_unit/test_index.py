@@ -0,0 +1,35 @@
+import pytest
+
+from videolog.index import ChannelCatalog, VideoIndex, sample
+
+def test_video_index():
+    index = VideoIndex(['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i'])
+    played = index.bitmap(['b', 'c', 'i', 'x'])
+    archived = index.bitmap(['a', 'c'])
+
+    assert played == 0b100000110
+    assert index.select(index.ids, index.filter(played, 'true')) == ['b', 'c', 'i']
+    assert index.select(index.ids,
+        index.filter(played, 'false') & index.filter(archived, 'false')
+    ) == ['d', 'e', 'f', 'g', 'h']
+    assert index.select(index.ids,
+        index.filter(played, 'true') & index.filter(archived, 'null')
+    ) == ['b', 'c', 'i']
+    assert index.select([], 0) == []
+
+def test_channel_catalog():
+    catalog = ChannelCatalog([
+        { 'snippet': { 'publishedAt': date, 'resourceId': { 'videoId': video_id } } }
+        for date, video_id in [('3', 'c'), ('1', 'a'), ('2', 'b')]
+    ])
+
+    assert catalog.ids == ['a', 'b', 'c']
+    assert 'b' in catalog and 'd' not in catalog
+
+def test_sample():
+    assert sample(['a', 'b', 'c'], lambda item: item == 'b') == 'b'
+    assert sample(['a', 'b', 'c'], lambda item: item == 'b', attempts = 0) == 'b'
+    with pytest.raises(IndexError):
+        sample(['a', 'b', 'c'], lambda item: False)
+    with pytest.raises(IndexError):
+        sample([])
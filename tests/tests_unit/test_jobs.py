@@ -0,0 +1,293 @@
+import json
+import os
+import time
+
+import flask
+import pytest
+
+import videolog.web
+
+from videolog.app import app
+from videolog.constants import PENDING_CHANGE_INTERVAL
+from videolog.fake import FAKE_USER_ID
+from videolog.jobs import JobRunner
+
+@pytest.fixture
+def runner(fake, monkeypatch):
+    import videolog.jobs
+
+    runner = JobRunner()
+    monkeypatch.setattr(videolog.jobs, 'runner', runner)
+    monkeypatch.setattr(videolog.web, 'runner', runner)
+    return runner
+
+def write_db(channels):
+    with open('db.json', 'w') as f:
+        json.dump({ FAKE_USER_ID: channels }, f)
+
+def wait(runner, job_id):
+    for attempt in range(100):
+        job = runner.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.05)
+
+def test_job_export_comments(fake, runner):
+    videos = [
+        [fake.channel_id(0), fake.video_id(0, 0)],
+        [fake.channel_id(1), fake.video_id(1, 2)]
+    ]
+    job = wait(runner, runner.submit('comments', { 'videos': videos })['id'])
+
+    assert job['status'] == 'done'
+    assert (job['done'], job['total']) == (2, 2)
+    assert os.path.isfile(os.path.join(
+        runner.get_directory(job['id']), 'comments', fake.channel_id(1),
+        fake.video_id(1, 2) + '.comments.json'
+    ))
+    assert runner.list(FAKE_USER_ID)[0]['id'] == job['id']
+    assert runner.get(job['id'], 'other_user') is None
+
+def test_job_session(fake, runner):
+    runner.schedule('comments', { 'videos': [] }, 3600)
+    job = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+
+    for name in ('jobs.json', 'schedules.json'):
+        with open(os.path.join('jobs', name)) as f:
+            assert 'test_token' not in f.read()
+    assert job['status'] == 'done'
+
+    app.session_interface.delete(app, flask.session.sid)
+    runner._load_schedules()[FAKE_USER_ID + ':comments']['submitted'] -= 3600
+    runner.run_schedules()
+    assert runner.get_schedule(FAKE_USER_ID, 'comments') is None
+
+def test_job_resume(fake, runner):
+    job = runner.submit('comments', { 'videos': [
+        [fake.channel_id(0), fake.video_id(0, 0)],
+        [fake.channel_id(0), fake.video_id(0, 1)]
+    ] })
+    wait(runner, job['id'])
+
+    # Simulate job interrupted after the first video.
+    with open(os.path.join('jobs', 'jobs.json')) as f:
+        jobs = json.load(f)
+    jobs[job['id']]['status'] = 'running'
+    with open(os.path.join('jobs', 'jobs.json'), 'w') as f:
+        json.dump(jobs, f)
+    os.remove(os.path.join(runner.get_directory(job['id']), 'comments',
+        fake.channel_id(0), fake.video_id(0, 1) + '.comments.json'
+    ))
+    fake.calls.clear()
+
+    runner = JobRunner()
+    runner.resume(app)
+
+    assert wait(runner, job['id'])['status'] == 'done'
+    assert fake.calls['commentThreads.list'] == 1
+
+def test_job_cancel(fake):
+    runner = JobRunner(workers = 1)
+    fake.latency = 0.2
+    blocking = runner.submit('import', { 'id': 'missing' })
+    job = runner.submit('sync', {})
+    runner.cancel(job['id'])
+
+    assert runner.get(job['id'])['status'] == 'cancelled'
+    wait(runner, blocking['id'])
+
+def test_job_import_playlist(fake, runner, monkeypatch):
+    monkeypatch.setattr(videolog.web, 'IMPORT_COMMIT_SIZE', 2)
+    archive_id = fake.create_playlist('Archive', [fake.video_id(0, 0)])
+    playlist_id = fake.create_playlist('Playlist', [
+        fake.video_id(channel, video)
+        for channel in range(2)
+        for video in range(3)
+    ])
+    write_db({ fake.channel_id(0): { 'played': {},
+        'archived': { fake.video_id(0, 0): archive_id }
+    } })
+    fake.calls.clear()
+
+    job = wait(runner, runner.submit('import', { 'id': playlist_id })['id'])
+
+    with open('db.json') as f:
+        db = json.load(f)[FAKE_USER_ID]
+
+    assert job['status'] == 'done'
+    assert (job['done'], job['total']) == (5, 5)
+    assert db[fake.channel_id(1)]['archived'] == {
+        fake.video_id(1, video): archive_id
+        for video in range(3)
+    }
+    assert len(fake.playlists[archive_id]['items']) == 6
+    assert fake.calls['videos.list'] == 1
+    assert 'playlists.list' not in fake.calls
+    assert fake.calls['playlistItems.insert'] == 5
+
+def test_job_schedule(fake, runner):
+    archive_id = fake.create_playlist('Archive', [fake.video_id(0, 0)])
+    write_db({ fake.channel_id(0): { 'played': {},
+        'archived': { fake.video_id(0, 0): archive_id }
+    } })
+
+    fake.playlists[archive_id]['items']['item_added'] = fake.video_id(1, 0)
+    fake.calls.clear()
+
+    runner.schedule('sync', {}, 3600)
+    job = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+
+    with open(os.path.join(runner.get_directory(job['id']), 'report.json')) as f:
+        report = json.load(f)
+    with open('db.json') as f:
+        db = json.load(f)[FAKE_USER_ID]
+
+    assert runner.get_schedule(FAKE_USER_ID, 'sync')['finished'] is not None
+    assert report['added'] == { archive_id: [fake.video_id(1, 0)] }
+    assert db[fake.channel_id(1)]['archived_items'] == {
+        fake.video_id(1, 0): 'item_added'
+    }
+    assert fake.calls['videos.list'] == 1
+
+    runner.schedule('sync', {}, 3600)
+    assert len(runner.list(FAKE_USER_ID)) == 1
+
+    runner._load_schedules()[FAKE_USER_ID + ':sync']['submitted'] -= 3600
+    runner.run_schedules()
+    assert len(runner.list(FAKE_USER_ID)) == 2
+
+def test_job_untrack_channels(fake, runner):
+    from videolog.web import web_channels_update_tracks
+
+    video_ids = [fake.video_id(0, video) for video in range(3)]
+    archive_id = fake.create_playlist('Archive', video_ids + [fake.video_id(1, 0)])
+    item_id = next(iter(fake.playlists[archive_id]['items']))
+    write_db({
+        fake.channel_id(0): { 'played': {},
+            'archived': { video_id: archive_id for video_id in video_ids },
+            'archived_items': { video_ids[0]: item_id }
+        },
+        fake.channel_id(1): { 'played': {},
+            'archived': { fake.video_id(1, 0): archive_id }
+        }
+    })
+    fake.calls.clear()
+
+    web_channels_update_tracks(json.dumps({ fake.channel_id(0): False }))
+    job = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+
+    with open('db.json') as f:
+        db = json.load(f)
+    assert list(db[FAKE_USER_ID]) == [fake.channel_id(1)]
+    assert db['meta'][FAKE_USER_ID]['removing'] == {}
+    assert job['type'] == 'untrack' and job['status'] == 'done'
+    assert (job['done'], job['total']) == (3, 3)
+    assert list(fake.playlists[archive_id]['items'].values()) == [fake.video_id(1, 0)]
+    assert fake.calls['playlistItems.list'] == 1
+
+def test_job_untrack_channels_failed(fake, runner):
+    from videolog.web import web_channels_update_tracks
+
+    video_ids = [fake.video_id(0, video) for video in range(2)]
+    archive_id = fake.create_playlist('Archive', video_ids + [fake.video_id(1, 0)])
+    write_db({
+        fake.channel_id(0): { 'played': {},
+            'archived': { video_id: archive_id for video_id in video_ids }
+        },
+        fake.channel_id(1): { 'played': {},
+            'archived': { fake.video_id(1, 0): archive_id }
+        }
+    })
+
+    fake.error_rate = 1.0
+    web_channels_update_tracks(json.dumps({ fake.channel_id(0): False }))
+    job = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+    fake.error_rate = 0.0
+
+    assert job['status'] == 'failed'
+    assert len(fake.playlists[archive_id]['items']) == 3
+
+    # Sync neither brings the channel back nor keeps its videos archived.
+    job = wait(runner, runner.submit('sync', {})['id'])
+    retry = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+
+    with open('db.json') as f:
+        db = json.load(f)
+    assert job['status'] == 'done' and retry['type'] == 'untrack'
+    assert retry['status'] == 'done'
+    assert list(db[FAKE_USER_ID]) == [fake.channel_id(1)]
+    assert db['meta'][FAKE_USER_ID]['removing'] == {}
+    assert list(fake.playlists[archive_id]['items'].values()) == [
+        fake.video_id(1, 0)
+    ]
+
+def test_job_import_playlist_full(fake, runner, monkeypatch):
+    monkeypatch.setattr(videolog.web, 'ARCHIVE_CAPACITY', 1)
+    archive_id = fake.create_playlist('Archive', [fake.video_id(0, 0)])
+    playlist_id = fake.create_playlist('Playlist', [
+        fake.video_id(0, 1), fake.video_id(0, 2)
+    ])
+    write_db({ fake.channel_id(0): { 'played': {},
+        'archived': { fake.video_id(0, 0): archive_id }
+    } })
+    monkeypatch.setattr(videolog.web, 'yt_create_playlist', lambda: {})
+
+    job = wait(runner, runner.submit('import', { 'id': playlist_id })['id'])
+
+    assert job['status'] == 'failed'
+    assert (job['done'], job['total']) == (0, 2)
+
+def test_job_logout(fake, runner):
+    from videolog.auth import auth_logout
+
+    runner.schedule('comments', { 'videos': [] }, 3600)
+    auth_logout()
+
+    assert runner.get_schedule(FAKE_USER_ID, 'comments') is None
+    with open(os.path.join('jobs', 'schedules.json')) as f:
+        assert json.load(f) == {}
+
+def test_job_import_playlist_undercounted(fake, runner, monkeypatch):
+    import videolog.fake
+
+    # Archive is full on YouTube (deleted videos) but not in the database.
+    monkeypatch.setattr(videolog.fake, 'PLAYLIST_MAX_ITEMS', 2)
+    archive_id = fake.create_playlist('Archive', [fake.video_id(0, 0), 'deleted'])
+    playlist_id = fake.create_playlist('Playlist', [fake.video_id(0, 1)])
+    write_db({ fake.channel_id(0): { 'played': {},
+        'archived': { fake.video_id(0, 0): archive_id }
+    } })
+
+    job = wait(runner, runner.submit('import', { 'id': playlist_id })['id'])
+
+    with open('db.json') as f:
+        db = json.load(f)
+    created = db[FAKE_USER_ID][fake.channel_id(0)]['archived'][fake.video_id(0, 1)]
+
+    assert job['status'] == 'done'
+    assert created not in (archive_id, playlist_id)
+    assert fake.playlists[created]['title'] == 'Fake User\'s Archive #2'
+    assert db['meta'][FAKE_USER_ID]['archives'] == {
+        archive_id: videolog.web.ARCHIVE_CAPACITY, created: 1
+    }
+
+def test_job_confirm_changes(fake, runner):
+    from videolog.youtube import yt_create_subscription
+
+    subscription_id = yt_create_subscription(fake.channel_id(2))
+    fake.subscriptions.pop(fake.channel_id(2))
+
+    job = wait(runner, runner.submit('confirm', {})['id'])
+    schedule = runner.get_schedule(FAKE_USER_ID, 'confirm')
+
+    assert job['status'] == 'done'
+    assert schedule['interval'] == PENDING_CHANGE_INTERVAL
+    assert schedule['submitted'] is not None
+
+    fake.subscriptions[fake.channel_id(2)] = subscription_id
+    runner._load_schedules()[FAKE_USER_ID + ':confirm']['submitted'] -= 3600
+    runner.run_schedules()
+    job = wait(runner, runner.list(FAKE_USER_ID)[0]['id'])
+
+    assert job['status'] == 'done' and len(runner.list(FAKE_USER_ID)) == 2
+    assert runner.get_schedule(FAKE_USER_ID, 'confirm') is None
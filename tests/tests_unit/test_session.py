@@ -0,0 +1,51 @@
+import flask
+import pytest
+
+from videolog.session import FilesystemSessionInterface, SqliteSessionInterface
+
+@pytest.fixture(params = [SqliteSessionInterface, FilesystemSessionInterface])
+def testapp(request, tmpdir):
+    app = flask.Flask(__name__)
+    app.secret_key = b'test'
+    app.session_interface = request.param()
+    app.config['SESSION_PATH'] = str(tmpdir.join('sessions'))
+
+    @app.route('/<value>')
+    def session_set(value = None):
+        if value == 'clear':
+            flask.session.clear()
+        else:
+            flask.session['user'] = { 'id': value }
+        return ''
+
+    @app.route('/')
+    def session_get():
+        return flask.jsonify(flask.session.get('user'))
+
+    return app
+
+def test_session_store(testapp):
+    client = testapp.test_client()
+    response = client.get('/user_id')
+
+    assert 'user_id' not in response.headers['Set-Cookie']
+    assert client.get('/').get_json() == { 'id': 'user_id' }
+
+    client.get('/clear')
+    assert client.get('/').get_json() is None
+
+def test_session_expired(testapp):
+    client = testapp.test_client()
+    client.get('/user_id')
+    sid = client.get_cookie(testapp.config['SESSION_COOKIE_NAME']).value
+    testapp.session_interface.cleanup(testapp, float('inf'))
+
+    assert testapp.session_interface.load(testapp, sid) is None
+    assert client.get('/').get_json() is None
+
+def test_session_default_path(tmpdir):
+    app = flask.Flask(__name__, instance_path = str(tmpdir.join('instance')))
+    interface = SqliteSessionInterface()
+
+    assert interface.get_path(app) == str(tmpdir.join('instance', 'sessions.sqlite'))
+    assert tmpdir.join('instance').isdir()
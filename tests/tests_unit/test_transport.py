@@ -0,0 +1,27 @@
+import http.server
+import threading
+
+from videolog.transport import get_session
+
+class CookieHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'user=test_user; Path=/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def test_get_session_cookies():
+    server = http.server.HTTPServer(('127.0.0.1', 0), CookieHandler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        session = get_session()
+        session.get('http://127.0.0.1:%d/' % server.server_port)
+
+        assert len(session.cookies) == 0
+        assert get_session() is session
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,55 @@
+import json
+
+import flask
+
+from videolog.app import app
+from videolog.db import db_get_version, db_update_version
+from videolog.fake import FAKE_USER_ID
+from videolog.web import web_conditional, web_videos_filter, web_videos_key
+from videolog.youtube import yt_get_catalog_version, yt_get_channel_videos
+
+def test_web_conditional(fake):
+    render = lambda: 'rendered'
+
+    with app.test_request_context('/archive'):
+        flask.session['user'] = { 'id': FAKE_USER_ID }
+        etag = web_conditional(render).get_etag()[0]
+
+    with app.test_request_context('/archive', headers = {
+        'If-None-Match': '"' + etag + '"'
+    }):
+        flask.session['user'] = { 'id': FAKE_USER_ID }
+        assert web_conditional(render).status_code == 304
+
+        version = db_get_version()
+        db_update_version()
+        assert db_get_version() != version
+        assert web_conditional(render).get_data() == b'rendered'
+
+    with open('db.json') as f:
+        assert json.load(f)['meta'][FAKE_USER_ID]['version'] == 1
+
+def test_web_catalog_version(fake):
+    channel_ids = [fake.channel_id(0), fake.channel_id(1)]
+    version = yt_get_catalog_version(channel_ids)
+    yt_get_channel_videos(fake.channel_id(0))
+
+    assert yt_get_catalog_version(channel_ids) != version
+    # Stable across processes (unlike built-in hash()).
+    assert yt_get_catalog_version([]) == '97d170e1550eee4afc0af065b78cda302a97674c'
+
+def test_web_videos_filter(fake, tmpdir):
+    tmpdir.join('db.json').write(json.dumps({ FAKE_USER_ID: {
+        fake.channel_id(index): { 'played': {}, 'archived': {} }
+        for index in range(3)
+    } }))
+    tracks = [{ 'id': fake.channel_id(index) } for index in range(3)]
+    videos = web_videos_filter('all', tracks, 'null', 'null')
+
+    assert len(videos) == 360
+    assert videos == sorted(videos, key = web_videos_key, reverse = True)
+    fake.calls.clear()
+
+    # Next pages are served from cached catalogs.
+    web_videos_filter('all', tracks, 'false', 'null')
+    assert not fake.calls
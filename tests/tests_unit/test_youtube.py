@@ -2,16 +2,22 @@ import json
 
 import flask
 import flexmock
-import google.oauth2.credentials
+import google_auth_httplib2
 import googleapiclient.discovery
 import pytest
 
 from videolog.app import app
 from videolog.constants import API_SERVICE_NAME, API_VERSION
+from videolog.fake import FAKE_USER_ID
 from videolog.helpers import build_resource
 from videolog.youtube import yt_get_client
 from videolog.youtube import yt_get_user, yt_get_subscriptions
 from videolog.youtube import yt_get_channel, yt_get_channel_videos
+from videolog.youtube import yt_get_channel_catalog, yt_get_video
+from videolog.youtube import yt_get_next_unplayed, yt_update_next_unplayed
+from videolog.youtube import yt_insert_to_playlist, yt_remove_from_playlist
+from videolog.youtube import yt_create_subscription, yt_remove_subscription
+from videolog.youtube import yt_confirm_pending_changes
 
 DB_FIXTURE_PATH = './tests/fixtures/db.json'
 
@@ -19,8 +25,8 @@ def test_yt_get_client():
     import videolog.youtube
     (flexmock(videolog.youtube)
         .should_call('googleapiclient.discovery.build')
-        .with_args(API_SERVICE_NAME, API_VERSION, credentials =
-            google.oauth2.credentials.Credentials)
+        .with_args(API_SERVICE_NAME, API_VERSION, http =
+            google_auth_httplib2.AuthorizedHttp)
         .and_return(googleapiclient.discovery.Resource))
 
     with app.test_client() as client:
@@ -63,18 +69,20 @@ def test_yt_get_subscriptions():
                 )
             )
         )
-    ))
+    ), yt_get_pending_changes = lambda kind = None: {})
 
-    assert len(yt_get_subscriptions()) == 4
-    assert yt_get_subscriptions() == yt_get_subscriptions(list_only = False)
-    assert yt_get_subscriptions()[0]['snippet']['resourceId']['channelId'] == (
-        'UC1EXoqvR9VrmWnM9S47SfVA')
-    assert yt_get_subscriptions(list_only = True) == {
-        'UC1EXoqvR9VrmWnM9S47SfVA': 'MpajmvGNexIkHC8F7y2fiSTLzSRwLzqiDEJZG8lxZNQ',
-        'UCGg-UqjRgzhYDPJMr-9HXCg': 'MpajmvGNexIo-VllBd2eTP0cR2c_IK9tKnN-JMChPWE',
-        'UCH7xyou6RXO8PKwMZ4nQ64Q': 'MpajmvGNexIkHC8F7y2fiVn_Hu_lfY-ZLzRKqVI4dGo',
-        'UC1l7wYrva1qCH-wgqcHaaRg': 'MpajmvGNexIkHC8F7y2fiaLMDN6JNxp1K4Jl2GuLQnA'
-    }
+    with app.test_request_context():
+        flask.session['user'] = { 'id': 'user_id' }
+        assert len(yt_get_subscriptions()) == 4
+        assert yt_get_subscriptions() == yt_get_subscriptions(list_only = False)
+        assert yt_get_subscriptions()[0]['snippet']['resourceId']['channelId'] == (
+            'UC1EXoqvR9VrmWnM9S47SfVA')
+        assert yt_get_subscriptions(list_only = True) == {
+            'UC1EXoqvR9VrmWnM9S47SfVA': 'MpajmvGNexIkHC8F7y2fiSTLzSRwLzqiDEJZG8lxZNQ',
+            'UCGg-UqjRgzhYDPJMr-9HXCg': 'MpajmvGNexIo-VllBd2eTP0cR2c_IK9tKnN-JMChPWE',
+            'UCH7xyou6RXO8PKwMZ4nQ64Q': 'MpajmvGNexIkHC8F7y2fiVn_Hu_lfY-ZLzRKqVI4dGo',
+            'UC1l7wYrva1qCH-wgqcHaaRg': 'MpajmvGNexIkHC8F7y2fiaLMDN6JNxp1K4Jl2GuLQnA'
+        }
 
 def test_yt_get_channel():
     import videolog.youtube
@@ -114,12 +122,132 @@ def test_yt_get_channel_videos():
             )
         )
     ))
-    flexmock(videolog.youtube, db_get_video = None)
     flexmock(videolog.youtube, get_db = json.load(open(DB_FIXTURE_PATH)))
 
-    result = yt_get_channel_videos('UC_x5XG1OV2P6uZZ5FSM9Ttw')
+    with app.test_request_context():
+        flask.session['user'] = { 'id': 'user_id' }
+        result = yt_get_channel_videos('UC_x5XG1OV2P6uZZ5FSM9Ttw')
 
     assert len(result) == 4
     for item in result:
         assert item['archived'] is None
         assert item['played'] is None
+
+def test_yt_remove_from_playlist(fake):
+    playlist_id = fake.create_playlist('Test', [
+        fake.video_id(0, index) for index in range(120)
+    ])
+    item_id = yt_insert_to_playlist(fake.video_id(1, 1), playlist_id)
+    fake.calls.clear()
+
+    assert yt_remove_from_playlist(fake.video_id(1, 1), playlist_id, item_id)
+    assert fake.calls == { 'playlistItems.delete': 1 }
+
+    fake.calls.clear()
+
+    assert yt_remove_from_playlist(fake.video_id(0, 119), playlist_id, item_id)
+    assert fake.calls['playlistItems.list'] == 3
+    assert fake.calls['playlistItems.delete'] == 2
+
+def test_yt_get_playlist_index(fake):
+    playlist_id = fake.create_playlist('Test', [fake.video_id(0, 1)])
+    other_id = fake.create_playlist('Other')
+
+    playlists = yt_get_video(fake.video_id(0, 1))['playlists']
+    assert playlists[playlist_id] == { 'title': 'Test', 'included': True }
+    assert playlists[other_id] == { 'title': 'Other', 'included': False }
+
+    yt_insert_to_playlist(fake.video_id(0, 1), other_id)
+    yt_remove_from_playlist(fake.video_id(0, 1), playlist_id)
+    fake.calls.clear()
+
+    playlists = yt_get_video(fake.video_id(0, 1))['playlists']
+    assert playlists[playlist_id]['included'] == False
+    assert playlists[other_id]['included'] == True
+    assert 'playlistItems.list' not in fake.calls
+    assert 'playlists.list' not in fake.calls
+
+def test_yt_get_playlist_index_failed(fake, monkeypatch):
+    import videolog.youtube
+    from videolog.youtube import yt_get_playlist_index
+
+    playlist_id = fake.create_playlist('Test', [fake.video_id(0, 1)])
+
+    fake.error_rate = 1.0
+    assert yt_get_playlist_index() is None
+    fake.error_rate = 0.0
+
+    monkeypatch.setattr(videolog.youtube, 'yt_get_playlist_items', lambda *args: None)
+    assert yt_get_playlist_index() is None
+    monkeypatch.undo()
+
+    index = yt_get_playlist_index()
+    assert index['videos'][fake.video_id(0, 1)] == {
+        playlist_id: next(iter(fake.playlists[playlist_id]['items']))
+    }
+
+def test_yt_get_channel_catalog(fake):
+
+    catalog = yt_get_channel_catalog(fake.channel_id(1))
+    assert catalog.ids[0] == fake.video_id(1, 0) and len(catalog) == 120
+    fake.calls.clear()
+
+    assert yt_get_channel_catalog(fake.channel_id(1)) is catalog
+    assert not fake.calls
+
+def test_yt_get_next_unplayed(fake):
+    played = { fake.video_id(1, 0): 'timestamp' }
+
+    assert yt_get_next_unplayed(fake.channel_id(1), played) == fake.video_id(1, 1)
+
+    played[fake.video_id(1, 1)] = 'timestamp'
+    yt_update_next_unplayed(fake.channel_id(1), fake.video_id(1, 1), True)
+    played[fake.video_id(1, 2)] = 'timestamp'
+    fake.calls.clear()
+
+    assert yt_get_next_unplayed(fake.channel_id(1), played) == fake.video_id(1, 3)
+
+    played.pop(fake.video_id(1, 1))
+    yt_update_next_unplayed(fake.channel_id(1), fake.video_id(1, 1), False)
+
+    assert yt_get_next_unplayed(fake.channel_id(1), played) == fake.video_id(1, 1)
+    assert not fake.calls
+
+def test_yt_pending_changes(fake):
+    subscription_id = yt_create_subscription(fake.channel_id(2))
+    removed_id = fake.subscriptions[fake.channel_id(0)]
+    yt_remove_subscription(removed_id)
+
+    # Simulate YouTube not listing the changes yet.
+    fake.subscriptions.pop(fake.channel_id(2))
+    fake.subscriptions[fake.channel_id(0)] = removed_id
+
+    assert yt_get_subscriptions(list_only = True) == {
+        fake.channel_id(1): fake.subscriptions[fake.channel_id(1)],
+        fake.channel_id(2): subscription_id
+    }
+    assert yt_confirm_pending_changes() == 2
+
+    fake.subscriptions.pop(fake.channel_id(0))
+    fake.subscriptions[fake.channel_id(2)] = subscription_id
+
+    assert yt_confirm_pending_changes() == 0
+    assert yt_get_subscriptions(list_only = True).keys() == set([
+        fake.channel_id(1), fake.channel_id(2)
+    ])
+
+def test_yt_pending_changes_failed(fake):
+    removed_id = fake.subscriptions[fake.channel_id(0)]
+    yt_remove_subscription(removed_id)
+    fake.subscriptions[fake.channel_id(0)] = removed_id
+
+    # Failed listing confirms nothing.
+    fake.error_rate = 1.0
+    assert yt_confirm_pending_changes() == 1
+    fake.error_rate = 0.0
+
+    with open('db.json') as f:
+        assert list(json.load(f)['meta'][FAKE_USER_ID]['pending']) == [
+            'subscription:' + removed_id
+        ]
+    assert fake.channel_id(0) not in yt_get_subscriptions(list_only = True)
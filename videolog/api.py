@@ -5,19 +5,64 @@ This module contains application's API routes handlers.
 
 import datetime
 import json
+import os
 import urllib
 
 import flask
 
 from videolog.auth import auth_check
-from videolog.db import get_db, update_db
-from videolog.db import db_get_archives
+from videolog.db import get_db
+from videolog.db import db_apply, db_archive_videos, db_get_archive_counts
+from videolog.db import db_count_archived, db_get_channel, db_get_tracks
+from videolog.db import db_update_tracks, db_update_version
+from videolog.helpers import paginate, stream_zip
+from videolog.jobs import runner
 from videolog.youtube import yt_get_client
 from videolog.youtube import yt_get_subscriptions
 from videolog.youtube import yt_create_subscription, yt_remove_subscription
-from videolog.youtube import yt_get_comments
-from videolog.youtube import yt_create_playlist
+from videolog.youtube import yt_get_comments, yt_get_playlist_index
+from videolog.youtube import yt_update_next_unplayed
 from videolog.youtube import yt_insert_to_playlist, yt_remove_from_playlist
+from videolog.youtube import PlaylistFull
+from videolog.web import web_archive_insert, web_videos_filter, web_videos_key
+
+def api_videos(channel = None):
+    """API videos route handler.
+
+    Returns page of video list. Uses GET query parameters ``archived`` and
+        ``played`` for filtering (applied before paging) and ``cursor`` for
+        pagination.
+
+    Args:
+        channel (Optional[str]): YouTube channel ID (or 'all').
+
+    Returns:
+        flask.Response: Rendered video cards (``html``) and next page cursor
+            (``cursor``, ``null`` on last page) in JSON, or ``false`` on
+            failure.
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    if channel is not None:
+        videos, cursor = paginate(
+            web_videos_filter(channel,
+                [{ 'id': channel_id } for channel_id in db_get_tracks()],
+                flask.request.args.get('archived', 'null'),
+                flask.request.args.get('played', 'null')
+            ),
+            web_videos_key, flask.request.args.get('cursor')
+        )
+
+        return flask.jsonify({
+            'html': flask.render_template('videos.html',
+                channel = channel, videos = videos
+            ),
+            'cursor': cursor
+        })
 
 def api_video_play(channel = None, video = None):
     """API video play route handler.
@@ -38,16 +83,21 @@ def api_video_play(channel = None, video = None):
         return flask.jsonify(False)
 
     if channel is not None and video is not None:
-        db = get_db()
         user_id = flask.session['user']['id']
 
-        if video not in db[user_id][channel]['played']:
+        def update(db):
+            if video in db[user_id][channel]['played']:
+                return False
             db[user_id][channel]['played'][video] = (
                 datetime.datetime.utcnow().replace(
                     microsecond = 0, tzinfo = datetime.timezone.utc
                 ).isoformat()
             )
-            update_db(db)
+            return True
+
+        if video not in db_get_channel(channel)['played'] and db_apply(update):
+            db_update_tracks(channel, True)
+            yt_update_next_unplayed(channel, video, True)
 
         return flask.jsonify(True)
 
@@ -70,10 +120,14 @@ def api_video_unplay(channel = None, video = None):
         return flask.jsonify(False)
 
     if channel is not None and video is not None:
-        db = get_db()
-        if video in db[flask.session['user']['id']][channel]['played']:
-            db[flask.session['user']['id']][channel]['played'].pop(video)
-            update_db(db)
+        user_id = flask.session['user']['id']
+
+        def update(db):
+            return db[user_id][channel]['played'].pop(video, None) is not None
+
+        if video in db_get_channel(channel)['played'] and db_apply(update):
+            db_update_tracks(channel, False)
+            yt_update_next_unplayed(channel, video, False)
 
         return flask.jsonify(True)
 
@@ -96,19 +150,9 @@ def api_video_archive(channel = None, video = None):
         return flask.jsonify(False)
 
     if channel is not None and video is not None:
-        db = get_db()
-        archive = None
-        for playlist in db_get_archives():
-            if playlist['contentDetails']['itemCount'] < 5000:
-                archive = playlist
-                break
-
-        if archive is None:
-            archive = yt_create_playlist()
-
-        if yt_insert_to_playlist(video, archive['id']):
-            db[flask.session['user']['id']][channel]['archived'][video] = archive['id']
-            update_db(db)
+        archive_id, item_id = web_archive_insert(video, db_get_archive_counts())
+        if item_id:
+            db_archive_videos([(channel, video, archive_id, item_id)])
             return flask.jsonify(True)
         else:
             return flask.jsonify(False)
@@ -132,14 +176,19 @@ def api_video_unarchive(channel = None, video = None):
         return flask.jsonify(False)
 
     if channel is not None and video is not None:
-        db = get_db()
         user_id = flask.session['user']['id']
-        if video in db[user_id][channel]['archived']:
-            if yt_remove_from_playlist(
-                video, db[user_id][channel]['archived'][video]
+        record = db_get_channel(channel)
+        if video in record['archived']:
+            if yt_remove_from_playlist(video, record['archived'][video],
+                record.get('archived_items', {}).get(video)
             ):
-                db[user_id][channel]['archived'].pop(video)
-                update_db(db)
+                def update(db):
+                    archive_id = db[user_id][channel]['archived'].pop(video, None)
+                    db[user_id][channel].get('archived_items', {}).pop(video, None)
+                    if archive_id is not None:
+                        db_count_archived(db, archive_id, -1)
+
+                db_apply(update)
             else:
                 return flask.jsonify(False)
 
@@ -169,12 +218,14 @@ def api_video_rate(channel = None, video = None):
         rating == 'like' or rating == 'dislike' or rating == 'none'
     ):
         yt_get_client().videos().rate(id = video, rating = rating).execute()
+        db_update_version()
         return flask.jsonify(True)
 
 def api_video_playlists(channel = None, video = None):
     """API video playlists route handler.
 
-    Handles updating video's playlists.
+    Handles updating video's playlists. Skips playlists whose membership
+        of the video does not change.
 
     Args:
         channel (Optional[str]): YouTube channel ID.
@@ -192,11 +243,19 @@ def api_video_playlists(channel = None, video = None):
     data = flask.request.args.get('data', None)
 
     if channel is not None and video is not None and data is not None:
+        index = yt_get_playlist_index()
+        if index is None:
+            return flask.jsonify(False)
+        membership = index['videos'].get(video, {})
+
         for playlist_id, include in json.loads(urllib.parse.unquote(data)).items():
-            if include:
-                yt_insert_to_playlist(video, playlist_id)
-            else:
-                yt_remove_from_playlist(video, playlist_id)
+            if include and playlist_id not in membership:
+                try:
+                    yt_insert_to_playlist(video, playlist_id)
+                except PlaylistFull:
+                    return flask.jsonify(False)
+            elif not include and playlist_id in membership:
+                yt_remove_from_playlist(video, playlist_id, membership[playlist_id])
 
         return flask.jsonify(True)
 
@@ -220,6 +279,7 @@ def api_video_subscribe(channel = None, video = None):
 
     if channel is not None and video is not None:
         if yt_create_subscription(channel):
+            runner.submit_once('confirm', {})
             return flask.jsonify(True)
         else:
             return flask.jsonify(False)
@@ -248,6 +308,7 @@ def api_video_unsubscribe(channel = None, video = None):
         for subscription in yt_get_subscriptions():
             if subscription['snippet']['resourceId']['channelId'] == channel:
                 if yt_remove_subscription(subscription['id']):
+                    runner.submit_once('confirm', {})
                     return flask.jsonify(True)
                 else:
                     return flask.jsonify(False)
@@ -279,3 +340,133 @@ def api_video_comments(channel = None, video = None):
             mimetype = 'application/json',
             headers = { 'Content-Disposition': 'attachment;filename=' + video + '.comments.json' }
         )
+
+def api_jobs():
+    """API jobs route handler.
+
+    Lists user's background jobs.
+
+    Returns:
+        flask.Response: Job statuses (list in JSON).
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    return flask.jsonify(runner.list(flask.session['user']['id']))
+
+def api_jobs_submit(type = None):
+    """API job submit route handler.
+
+    Submits background job: ``comments`` (archived videos' comments export),
+        ``import`` (playlist import to archive, uses GET query parameter
+        ``id``) or ``sync`` (archives synchronization).
+
+    Args:
+        type (Optional[str]): Job type.
+
+    Returns:
+        flask.Response: Job status (in JSON) or ``false`` on failure.
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    if type == 'comments':
+        params = { 'videos': [
+            [channel_id, video_id]
+            for channel_id, channel in get_db()[flask.session['user']['id']].items()
+            for video_id in channel['archived']
+        ] }
+    elif type == 'import' and flask.request.args.get('id'):
+        params = { 'id': flask.request.args['id'] }
+    elif type == 'sync':
+        params = {}
+    else:
+        return flask.jsonify(False)
+
+    return flask.jsonify(runner.submit(type, params))
+
+def api_job(job = None):
+    """API job route handler.
+
+    Returns background job's status and progress.
+
+    Args:
+        job (Optional[str]): Job ID.
+
+    Returns:
+        flask.Response: Job status (in JSON) or ``false`` on failure.
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    return flask.jsonify(runner.get(job, flask.session['user']['id']) or False)
+
+def api_job_cancel(job = None):
+    """API job cancel route handler.
+
+    Cancels queued or running background job.
+
+    Args:
+        job (Optional[str]): Job ID.
+
+    Returns:
+        flask.Response: Whether operation has succeeded (bool in JSON).
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    if runner.get(job, flask.session['user']['id']) is None:
+        return flask.jsonify(False)
+
+    runner.cancel(job)
+
+    return flask.jsonify(True)
+
+def api_job_download(job = None):
+    """API job download route handler.
+
+    Streams finished comments export job's results as ZIP archive.
+
+    Args:
+        job (Optional[str]): Job ID.
+
+    Returns:
+        flask.Response: ZIP archive of archived videos' comments.
+    """
+
+    try:
+        auth_check()
+    except Exception as e:
+        return flask.jsonify(False)
+
+    status = runner.get(job, flask.session['user']['id'])
+
+    if status is None or status['type'] != 'comments' or status['status'] != 'done':
+        return flask.jsonify(False)
+
+    directory = os.path.join(runner.get_directory(job), 'comments')
+
+    def files():
+        for root, dirs, names in os.walk(directory):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, directory).replace(os.sep, '/'), f.read()
+
+    return flask.Response(stream_zip(files()),
+        mimetype = 'application/zip',
+        headers = { 'Content-Disposition': 'attachment;filename=archive_comments.zip' }
+    )
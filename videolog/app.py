@@ -8,12 +8,16 @@ Attributes:
 
 import flask
 
+from videolog.api import api_videos
 from videolog.api import api_video_play, api_video_unplay
 from videolog.api import api_video_archive, api_video_unarchive
 from videolog.api import api_video_rate, api_video_playlists, api_video_comments
 from videolog.api import api_video_subscribe, api_video_unsubscribe
+from videolog.api import api_jobs, api_jobs_submit
+from videolog.api import api_job, api_job_cancel, api_job_download
 from videolog.auth import auth_authorize, auth_oauth2callback
 from videolog.auth import auth_check, auth_logout
+from videolog.session import SqliteSessionInterface
 from videolog.web import web_index
 from videolog.web import web_videos
 from videolog.web import web_channels, web_channels_track
@@ -23,6 +27,7 @@ from videolog.web import web_archive_batch, web_archive_comments
 from videolog.web import web_archive_config
 
 app = flask.Flask(__name__)
+app.session_interface = SqliteSessionInterface()
 app.secret_key = b'\xfb\x04\x088E6\xff\xd2\x86\x93\xcef%\x1b\xe6F9`o\xb8\xbd\xc3\xf3['
 
 @app.route('/')
@@ -159,6 +164,18 @@ def archive_config():
 
     return web_archive_config()
 
+@app.route('/api/videos/<channel>')
+def videos_page(channel = None):
+    """API videos route.
+
+    Returns next page of video list.
+
+    See also:
+        :func:`~videolog.api.api_videos()`
+    """
+
+    return api_videos(channel)
+
 @app.route('/api/videos/<channel>/<video>/play')
 def video_play(channel = None, video = None):
     """API play video route.
@@ -267,6 +284,66 @@ def video_comments(channel = None, video = None):
 
     return api_video_comments(channel, video)
 
+@app.route('/api/jobs')
+def jobs():
+    """API jobs route.
+
+    Returns user's background jobs.
+
+    See also:
+        :func:`~videolog.api.api_jobs()`
+    """
+
+    return api_jobs()
+
+@app.route('/api/jobs/submit/<type>')
+def jobs_submit(type = None):
+    """API job submit route.
+
+    Handles submitting background job.
+
+    See also:
+        :func:`~videolog.api.api_jobs_submit()`
+    """
+
+    return api_jobs_submit(type)
+
+@app.route('/api/jobs/<job>')
+def job(job = None):
+    """API job route.
+
+    Returns background job's status and progress.
+
+    See also:
+        :func:`~videolog.api.api_job()`
+    """
+
+    return api_job(job)
+
+@app.route('/api/jobs/<job>/cancel')
+def job_cancel(job = None):
+    """API job cancel route.
+
+    Handles cancelling background job.
+
+    See also:
+        :func:`~videolog.api.api_job_cancel()`
+    """
+
+    return api_job_cancel(job)
+
+@app.route('/api/jobs/<job>/download')
+def job_download(job = None):
+    """API job download route.
+
+    Handles background job's results download.
+
+    See also:
+        :func:`~videolog.api.api_job_download()`
+    """
+
+    return api_job_download(job)
+
 @app.route('/authorize')
 def authorize():
     """Authorization route.
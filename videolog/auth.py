@@ -3,12 +3,21 @@
 This module contains application's authorization methods.
 """
 
+import calendar
+import time
+
 import flask
+import google.auth.exceptions
+import google.auth.transport.requests
+import google.oauth2.credentials
 import google_auth_oauthlib.flow
 import requests
 
-from videolog.constants import CLIENT_SECRETS_FILE, SCOPES
-from videolog.db import get_db, update_db
+from videolog.constants import API_ROOT_URL, CLIENT_SECRETS_FILE, SCOPES
+from videolog.constants import TOKEN_EXPIRY_MARGIN, TOKEN_RETRY_INTERVAL
+from videolog.constants import TOKENINFO_PATH
+from videolog.db import db_apply
+from videolog.transport import get_session
 from videolog.youtube import yt_get_user
 
 def auth_authorize():
@@ -52,7 +61,27 @@ def auth_oauth2callback():
     authorization_response = flask.request.url
     flow.fetch_token(authorization_response = authorization_response)
 
-    credentials = flow.credentials
+    auth_store_credentials(flow.credentials)
+    flask.session['user'] = yt_get_user()
+
+    user_id = flask.session['user']['id']
+
+    def update(db):
+        db.setdefault(user_id, {})
+
+    db_apply(update)
+
+    return flask.redirect(flask.url_for('index'))
+
+def auth_store_credentials(credentials):
+    """Stores credentials.
+
+    Stores OAuth 2.0 credentials and access token expiry (UNIX timestamp)
+        in the session.
+
+    Args:
+        credentials (google.oauth2.credentials.Credentials): Credentials.
+    """
     flask.session['credentials'] = {
         'token': credentials.token,
         'refresh_token': credentials.refresh_token,
@@ -61,20 +90,71 @@ def auth_oauth2callback():
         'client_secret': credentials.client_secret,
         'scopes': credentials.scopes
     }
-    flask.session['user'] = yt_get_user()
 
-    db = get_db()
-    if flask.session['user']['id'] not in db:
-        db[flask.session['user']['id']] = {}
-    update_db(db)
+    if credentials.expiry is not None:
+        flask.session['token_expiry'] = calendar.timegm(
+            credentials.expiry.utctimetuple()
+        )
+    else:
+        flask.session.pop('token_expiry', None)
 
-    return flask.redirect(flask.url_for('index'))
+def auth_refresh():
+    """Refreshes access token.
+
+    Obtains new access token using the stored refresh token. Without refresh
+        token, asks Google for remaining lifetime of the current access token
+        instead. If Google cannot be reached or gives no answer, keeps current
+        token and retries after ``TOKEN_RETRY_INTERVAL``.
+
+    Raises:
+        Exception: Redirection route ('logout')
+    """
+    if flask.session['credentials'].get('refresh_token'):
+        credentials = google.oauth2.credentials.Credentials(
+            **flask.session['credentials']
+        )
+        try:
+            credentials.refresh(
+                google.auth.transport.requests.Request(session = get_session())
+            )
+        except google.auth.exceptions.RefreshError:
+            raise Exception('logout')
+        except google.auth.exceptions.TransportError:
+            credentials = None
+
+        if credentials is not None:
+            auth_store_credentials(credentials)
+            return
+    else:
+        base_url = (
+            flask.current_app.config.get('API_ROOT_URL', API_ROOT_URL) +
+            TOKENINFO_PATH + '?access_token='
+        )
+        try:
+            response = get_session().get(
+                base_url + flask.session['credentials']['token']
+            )
+        except requests.exceptions.RequestException:
+            response = None
+
+        if response is not None and response.status_code == 400:
+            raise Exception('logout')
+        if response is not None and response.status_code == 200:
+            expires_in = response.json().get('expires_in')
+            if expires_in is not None:
+                flask.session['token_expiry'] = time.time() + int(expires_in)
+                return
+
+    flask.session['token_expiry'] = (
+        time.time() + TOKEN_EXPIRY_MARGIN + TOKEN_RETRY_INTERVAL
+    )
 
 def auth_check():
     """Authorization checks provider.
 
     Checks user credentials and token validity. Redirects back to authorization.
-        if needed.
+        if needed. Token validity is tracked locally, token is refreshed
+        ``TOKEN_EXPIRY_MARGIN`` seconds before it expires.
 
     Raises:
         Exception: Redirection route ('authorize' or 'logout')
@@ -83,20 +163,24 @@ def auth_check():
         raise Exception('authorize')
     else:
         if 'token' in flask.session['credentials']:
-            base_url = 'https://www.googleapis.com/oauth2/v3/tokeninfo?access_token='
-            response = requests.get(base_url + flask.session['credentials']['token'])
-            if response.status_code == 400:
-                raise Exception('logout')
+            expiry = flask.session.get('token_expiry')
+            if expiry is None or expiry - TOKEN_EXPIRY_MARGIN <= time.time():
+                auth_refresh()
         else:
             raise Exception('logout')
 
 def auth_logout():
     """Logout route handler.
 
-    Handles user logout (clears session and redirects to index = auth).
+    Handles user logout (removes user's scheduled jobs, clears session and
+        redirects to index = auth).
 
     Returns:
         flask.Response: Index page (which then redirects to auth).
     """
+    from videolog.jobs import runner
+
+    if 'user' in flask.session:
+        runner.unschedule(flask.session['user']['id'])
     flask.session.clear()
     return flask.redirect('')
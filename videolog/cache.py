@@ -0,0 +1,127 @@
+"""Cache module
+
+This module contains simple thread-safe in-process cache shared by all
+    requests of the application.
+"""
+
+import threading
+import time
+import weakref
+
+_caches = weakref.WeakSet()
+
+class Cache:
+    """In-process cache.
+
+    Maps keys (e.g. YouTube user IDs) to values, optionally expiring them
+        after given time.
+
+    Args:
+        ttl (Optional[float]): Time to live of cached values (in seconds).
+            ``None`` means values never expire.
+    """
+
+    def __init__(self, ttl = None):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.RLock()
+        _caches.add(self)
+
+    def get(self, key, default = None):
+        """Gets cached value.
+
+        Args:
+            key: Cache key.
+            default: Value returned if key is missing or expired.
+
+        Returns:
+            Cached value or ``default``.
+        """
+
+        with self._lock:
+            if key in self._data:
+                value, expires = self._data[key]
+                if expires is None or expires > time.monotonic():
+                    return value
+                self._data.pop(key)
+            return default
+
+    def set(self, key, value):
+        """Sets cached value.
+
+        Args:
+            key: Cache key.
+            value: Cached value.
+        """
+
+        with self._lock:
+            expires = None if self.ttl is None else time.monotonic() + self.ttl
+            self._data[key] = (value, expires)
+
+    def get_or_set(self, key, factory):
+        """Gets cached value, computing it if needed.
+
+        Args:
+            key: Cache key.
+            factory (function): Function without arguments computing value.
+                Called without holding the lock. May return ``None`` when
+                value could not be computed, which is not cached.
+
+        Returns:
+            Cached or computed value.
+        """
+
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = factory()
+            if value is not None:
+                self.set(key, value)
+
+        return value
+
+    def update(self, key, function):
+        """Updates cached value in place.
+
+        Calls given function with cached value while holding the lock. Does
+            nothing if key is missing or expired.
+
+        Args:
+            key: Cache key.
+            function (function): Function taking cached value.
+
+        Returns:
+            bool: Whether value was cached (and updated).
+        """
+
+        missing = object()
+
+        with self._lock:
+            value = self.get(key, missing)
+            if value is missing:
+                return False
+            function(value)
+            return True
+
+    def pop(self, key):
+        """Invalidates cached value.
+
+        Args:
+            key: Cache key.
+        """
+
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Invalidates all cached values."""
+
+        with self._lock:
+            self._data.clear()
+
+def clear_caches():
+    """Invalidates values of all caches (e.g. between tests)."""
+
+    for cache in list(_caches):
+        cache.clear()
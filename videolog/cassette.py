@@ -0,0 +1,200 @@
+"""Cassette module
+
+This module contains record/replay HTTP transport for YouTube Data API
+    client. In ``record`` mode, every API call is performed and stored together
+    with its response and duration in a per-user cassette (JSON lines file).
+    In ``replay`` mode, calls are answered from the cassette without network
+    access, either with their original timing or with zero latency.
+
+Cassettes are enabled by ``CASSETTE_MODE`` (``record`` or ``replay``),
+    ``CASSETTE_DIR`` and ``CASSETTE_TIMING`` application configuration values.
+"""
+
+import base64
+import collections
+import json
+import os
+import threading
+import time
+
+import httplib2
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+class CassetteError(Exception):
+    """Raised when replayed request is missing from the cassette."""
+
+class Cassette:
+    """Recorded HTTP interactions.
+
+    Interactions are matched by method, URI and body. Repeated identical
+        requests are replayed in the recorded order; once exhausted, the last
+        recorded response is repeated.
+
+    Args:
+        path (str): Cassette file path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions = None
+        self._positions = collections.Counter()
+
+    def record(self, method, uri, body, response, content, elapsed):
+        """Records interaction.
+
+        Appends interaction to the cassette file.
+
+        Args:
+            method (str): HTTP method.
+            uri (str): Request URI.
+            body (str or bytes): Request body.
+            response (httplib2.Response): Response headers and status.
+            content (bytes): Response body.
+            elapsed (float): Request duration (in seconds).
+        """
+
+        interaction = {
+            'method': method, 'uri': uri, 'body': _decode(body),
+            'headers': dict(response), 'status': response.status,
+            'content': _decode(content), 'elapsed': elapsed
+        }
+
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok = True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(interaction, sort_keys = True) + '\n')
+            if self._interactions is not None:
+                self._interactions[_key(method, uri, interaction['body'])].append(
+                    interaction
+                )
+
+    def play(self, method, uri, body):
+        """Replays interaction.
+
+        Args:
+            method (str): HTTP method.
+            uri (str): Request URI.
+            body (str or bytes): Request body.
+
+        Returns:
+            tuple: ``httplib2.Response``, response body (bytes) and recorded
+                request duration (in seconds).
+
+        Raises:
+            CassetteError: Request was not recorded.
+        """
+
+        key = _key(method, uri, _decode(body))
+
+        with self._lock:
+            if self._interactions is None:
+                self._load()
+            recorded = self._interactions.get(key)
+            if not recorded:
+                raise CassetteError('Not recorded: ' + method + ' ' + uri)
+            interaction = recorded[min(self._positions[key], len(recorded) - 1)]
+            self._positions[key] += 1
+
+        response = httplib2.Response(dict(
+            interaction['headers'], status = str(interaction['status'])
+        ))
+        return response, _encode(interaction['content']), interaction['elapsed']
+
+    def _load(self):
+        self._interactions = collections.defaultdict(list)
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._interactions[_key(
+                            interaction['method'], interaction['uri'],
+                            interaction['body']
+                        )].append(interaction)
+
+class CassetteHttp(httplib2.Http):
+    """Recording or replaying HTTP transport.
+
+    Drop-in replacement for ``httplib2.Http`` to be wrapped by
+        ``google_auth_httplib2.AuthorizedHttp``.
+
+    Args:
+        cassette (Cassette): Cassette to record to or replay from.
+        mode (str): ``record`` or ``replay``.
+        timing (bool): Whether to replay with original request durations.
+        http (Optional[httplib2.Http]): Transport used for recording.
+    """
+
+    def __init__(self, cassette, mode, timing = True, http = None):
+        super().__init__()
+        self.cassette = cassette
+        self.mode = mode
+        self.timing = timing
+        self.http = http if http is not None else httplib2.Http()
+
+    def request(self, uri, method = 'GET', body = None, headers = None,
+                redirections = httplib2.DEFAULT_MAX_REDIRECTS,
+                connection_type = None, **kwargs):
+        """Implementation of httplib2's Http.request."""
+
+        if self.mode == 'replay':
+            response, content, elapsed = self.cassette.play(method, uri, body)
+            if self.timing:
+                time.sleep(elapsed)
+            return response, content
+
+        start = time.perf_counter()
+        response, content = self.http.request(
+            uri, method, body = body, headers = headers,
+            redirections = redirections, connection_type = connection_type,
+            **kwargs
+        )
+        self.cassette.record(
+            method, uri, body, response, content, time.perf_counter() - start
+        )
+        return response, content
+
+def get_cassette(directory, user_id):
+    """Gets user's cassette.
+
+    Cassettes are shared by all requests (and threads) of the process.
+
+    Args:
+        directory (str): Cassettes directory.
+        user_id (str): YouTube user (channel) ID.
+
+    Returns:
+        Cassette: User's cassette.
+    """
+
+    path = os.path.join(directory, (user_id or 'anonymous') + '.jsonl')
+
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+def _key(method, uri, body):
+    if isinstance(body, dict):
+        body = body['base64']
+    return method.upper(), uri, body
+
+def _decode(data):
+    if data is None or isinstance(data, str):
+        return data
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(data).decode('ascii')}
+
+def _encode(data):
+    if data is None:
+        return b''
+    if isinstance(data, dict):
+        return base64.b64decode(data['base64'])
+    return data.encode('utf-8')
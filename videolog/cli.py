@@ -9,6 +9,8 @@ import os
 import click
 
 from videolog.app import app
+from videolog.jobs import runner
+from videolog.session import FilesystemSessionInterface, SqliteSessionInterface
 
 @click.group(name = 'videolog')
 @click.version_option(version = '0.1',
@@ -24,16 +26,83 @@ def cli(ctx):
               help = 'The port to bind to.')
 @click.option('--debug', '-d', is_flag = True,
               help = 'Turns on debug mode.')
+@click.option('--api-url', default = None,
+              help = 'Root URL of Google APIs (e.g. of fake API server).')
+@click.option('--cassette-mode', default = None,
+              type = click.Choice(['record', 'replay']),
+              help = 'Record or replay YouTube Data API traffic.')
+@click.option('--cassette-dir', default = 'cassettes', type = click.Path(),
+              help = 'Directory with per-user cassettes.')
+@click.option('--cassette-timing/--no-cassette-timing', default = True,
+              help = 'Whether to replay with original timing.')
+@click.option('--session-store', default = 'sqlite',
+              type = click.Choice(['sqlite', 'filesystem']),
+              help = 'Server-side session storage.')
+@click.option('--session-path', default = None, type = click.Path(),
+              help = 'Session database file or directory.')
+@click.option('--sync-interval', default = None, type = int,
+              help = 'Seconds between background syncs of archives.')
 @click.pass_context
-def run(ctx, host, port, debug):
+def run(ctx, host, port, debug, api_url, cassette_mode, cassette_dir,
+        cassette_timing, session_store, session_path, sync_interval):
     os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1' # TODO: rm in production
 
+    if api_url is not None:
+        app.config['API_ROOT_URL'] = api_url.rstrip('/')
+
+    if cassette_mode is not None:
+        app.config['CASSETTE_MODE'] = cassette_mode
+        app.config['CASSETTE_DIR'] = cassette_dir
+        app.config['CASSETTE_TIMING'] = cassette_timing
+
+    if session_store == 'filesystem':
+        app.session_interface = FilesystemSessionInterface()
+    else:
+        app.session_interface = SqliteSessionInterface()
+    app.config['SESSION_PATH'] = session_path
+    app.config['ARCHIVE_SYNC_INTERVAL'] = sync_interval
+
     if not os.path.isfile('./db.json'):
         with open('./db.json', 'w') as f:
             json.dump({}, f, indent = 2, sort_keys = True)
 
+    # With reloader, only the serving child process runs jobs.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        runner.resume(app)
+
     app.run(host = host, port = port, debug = debug)
 
+@cli.command(name = 'fake-api',
+             help = 'Run fake YouTube Data API server with synthetic data.')
+@click.option('--host', '-h', default = '127.0.0.1',
+              help = 'The interface to bind to.')
+@click.option('--port', '-p', default = 8091,
+              help = 'The port to bind to.')
+@click.option('--channels', default = 10,
+              help = 'Number of channels.')
+@click.option('--videos', default = 100,
+              help = 'Number of videos per channel.')
+@click.option('--comments', default = 5,
+              help = 'Number of top level comments per video.')
+@click.option('--replies', default = 2,
+              help = 'Number of replies per top level comment.')
+@click.option('--subscriptions', default = 0,
+              help = 'Number of channels the user is subscribed to.')
+@click.option('--latency', default = 0.0,
+              help = 'Delay added to every response (in seconds).')
+@click.option('--error-rate', default = 0.0,
+              help = 'Probability of any API call failing.')
+@click.pass_context
+def fake_api(ctx, host, port, channels, videos, comments, replies,
+             subscriptions, latency, error_rate):
+    from videolog.fake import FakeYouTube
+
+    FakeYouTube(
+        channels = channels, videos = videos, comments = comments,
+        replies = replies, subscriptions = subscriptions, latency = latency,
+        error_rate = error_rate
+    ).serve_forever(host = host, port = port)
+
 def main():
     """Runs app.
 
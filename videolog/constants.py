@@ -3,14 +3,89 @@
 This module contains constants for use by other modules.
 
 Attributes:
+    API_ROOT_URL (str): Root URL of Google APIs. Can be overridden by the
+        application's ``API_ROOT_URL`` configuration value (e.g. to use
+        :class:`~videolog.fake.FakeYouTube`).
     API_SERVICE_NAME (str): YouTube Data API service name.
     API_VERSION (str): YouTube Data API version.
+    ARCHIVE_CAPACITY (int): Maximum number of videos in an archive (YouTube
+        playlist).
+    ARCHIVE_SYNC_INTERVAL (int): Default time (in seconds) between background
+        syncs of user's archives with YouTube.
+    BATCH_MAX_SHARDS (int): Maximum number of youtube-dl batch file shards.
+    CHANNEL_CATALOG_TTL (int): Time (in seconds) after which channel's
+        catalog of known videos is refreshed from YouTube.
+    CHANNEL_FETCH_WORKERS (int): Maximum number of channels whose videos are
+        fetched in parallel.
     CLIENT_SECRETS_FILE (str): Name of the file containing Google application
         client secret.
+    DISCOVERY_PATH (str): Path of YouTube Data API discovery document
+        (relative to API root URL).
+    ETAG_MAX_AGE (int): Time (in seconds) for which views rendered with data
+        from YouTube may be revalidated without rendering them again.
+    HTTP_POOL_CONNECTIONS (int): Number of hosts whose connections are kept
+        in the shared HTTP session.
+    HTTP_POOL_MAXSIZE (int): Maximum number of kept-alive connections per
+        host in the shared HTTP session.
+    HTTP_TIMEOUT (int): Timeout (in seconds) of YouTube Data API requests.
+    IMPORT_COMMIT_SIZE (int): Number of videos imported to archive between
+        database updates.
+    JOB_CHECKPOINT_INTERVAL (int): Minimum time (in seconds) between writes
+        of running jobs' progress to the job table.
+    JOB_RETENTION (int): Time (in seconds) after which finished jobs and
+        their results are deleted.
+    JOB_SCHEDULE_TICK (int): Time (in seconds) between checks for due
+        scheduled jobs.
+    JOB_WORKERS (int): Number of background job worker threads.
+    PENDING_CHANGE_INTERVAL (int): Time (in seconds) between checks whether
+        YouTube lists changes made by the application.
+    PENDING_CHANGE_TTL (int): Time (in seconds) after which changes made by
+        the application are no longer overlaid on data listed by YouTube.
+    PLAYLISTS_CACHE_TTL (int): Time (in seconds) after which user's cached
+        playlists and their membership index are rebuilt.
+    RANDOM_SAMPLE_ATTEMPTS (int): Number of random draws of rejection sampling
+        before falling back to choosing among all matching videos.
     SCOPES (str): YouTube Data API scopes used by the application.
+    SESSION_CLEANUP_INTERVAL (int): Minimum time (in seconds) between purges
+        of expired server-side sessions.
+    TOKEN_EXPIRY_MARGIN (int): Time (in seconds) before access token expiry
+        when it is refreshed.
+    TOKEN_RETRY_INTERVAL (int): Time (in seconds) after which failed access
+        token refresh or lifetime check is retried.
+    TOKENINFO_PATH (str): Path of OAuth 2.0 token information endpoint
+        (relative to API root URL).
+    TRACKS_CACHE_TTL (int): Time (in seconds) after which user's cached
+        tracked channels (with statistics from YouTube) are rebuilt.
+    VIDEOS_PAGE_SIZE (int): Number of videos rendered per page of video list.
 """
 
+API_ROOT_URL = 'https://www.googleapis.com'
 API_SERVICE_NAME = 'youtube'
 API_VERSION = 'v3'
+ARCHIVE_CAPACITY = 5000
+ARCHIVE_SYNC_INTERVAL = 3600
+BATCH_MAX_SHARDS = 64
+CHANNEL_CATALOG_TTL = 3600
+CHANNEL_FETCH_WORKERS = 8
 CLIENT_SECRETS_FILE = 'client_secret.json'
+DISCOVERY_PATH = '/discovery/v1/apis/{api}/{apiVersion}/rest'
+ETAG_MAX_AGE = 300
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 16
+HTTP_TIMEOUT = 60
+IMPORT_COMMIT_SIZE = 100
+JOB_CHECKPOINT_INTERVAL = 1
+JOB_RETENTION = 7 * 24 * 3600
+JOB_SCHEDULE_TICK = 60
+JOB_WORKERS = 2
+PENDING_CHANGE_INTERVAL = 10
+PENDING_CHANGE_TTL = 300
+PLAYLISTS_CACHE_TTL = 3600
+RANDOM_SAMPLE_ATTEMPTS = 32
 SCOPES = ['https://www.googleapis.com/auth/youtube.force-ssl']
+SESSION_CLEANUP_INTERVAL = 3600
+TOKEN_EXPIRY_MARGIN = 300
+TOKEN_RETRY_INTERVAL = 60
+TOKENINFO_PATH = '/oauth2/v3/tokeninfo'
+TRACKS_CACHE_TTL = 600
+VIDEOS_PAGE_SIZE = 48
@@ -1,11 +1,24 @@
 """DB module
 
 This module contains methods to work with application's simple JSON database.
+    Database is written atomically (to a temporary file replacing the JSON
+    file) under a process-wide lock. Updates are applied to a freshly loaded
+    database under the lock (see :func:`~videolog.db.db_apply()`), so
+    concurrent updates (e.g. of a request and a background job) are not lost.
 """
 
 import json
+import os
+import threading
+
 import flask
 
+from videolog.cache import Cache
+from videolog.constants import TRACKS_CACHE_TTL
+
+_lock = threading.RLock()
+_tracks_cache = Cache(ttl = TRACKS_CACHE_TTL)
+
 def get_db():
     """Gets database.
 
@@ -15,25 +28,99 @@ def get_db():
         dict: JSON database object.
     """
 
-    return json.load(open('db.json'))
+    with open('db.json') as f:
+        return json.load(f)
 
 def update_db(db):
     """Updates database.
 
-    Saves database updates back to the JSON file.
+    Saves database updates back to the JSON file. Updates made on behalf of
+        a user change their data version (see
+        :func:`~videolog.db.db_get_version()`).
 
     Args:
         dict: JSON database object.
     """
-    with open('db.json', 'w') as f:
-        json.dump(db, f, indent = 2, sort_keys = True)
+    temp = 'db.json.' + str(os.getpid()) + '.tmp'
+
+    with _lock:
+        if flask.has_request_context() and 'user' in flask.session:
+            meta = db_get_meta(db)
+            meta['version'] = meta.get('version', 0) + 1
+
+        with open(temp, 'w') as f:
+            json.dump(db, f, indent = 2, sort_keys = True)
+        os.replace(temp, 'db.json')
+
+def db_apply(update):
+    """Applies update to database.
+
+    Loads database, applies the update and saves the database under
+        database lock, so no other update of this process is lost. Slow work
+        (e.g. YouTube API calls) should be done before, outside of the lock.
+
+    Args:
+        update (function): Function modifying loaded database (JSON database
+            object as the only argument).
+
+    Returns:
+        Return value of ``update``.
+    """
+
+    with _lock:
+        db = get_db()
+        result = update(db)
+        update_db(db)
+
+    return result
+
+def db_get_meta(db):
+    """Gets user's metadata.
+
+    Gets the current user's record in the ``meta`` section of the database
+        (application's own data kept apart from tracked channels). Creates
+        the record if missing.
+
+    Args:
+        db (dict): JSON database object.
+
+    Returns:
+        dict: User's metadata.
+    """
+
+    return db.setdefault('meta', {}).setdefault(flask.session['user']['id'], {})
+
+def db_get_version():
+    """Gets user's data version.
+
+    Version of the current user's data changes with every update of the
+        database or YouTube data made on their behalf. It is kept in the
+        database, so it is shared by all application processes.
+
+    Returns:
+        str: Data version.
+    """
+
+    return str(db_get_meta(get_db()).get('version', 0))
+
+def db_update_version():
+    """Changes user's data version.
+
+    Used for changes of YouTube data (the database is written).
+
+    See also:
+        :func:`~videolog.db.db_get_version()`
+    """
+
+    db_apply(lambda db: None)
 
 def db_get_tracks(sort_by_played = None):
     """Gets tracked channels.
 
     Gets tracked channels from the database, either list of YouTube channel IDs
         or list of entire objects with optional sorting by played percentage and
-        channel title.
+        channel title. Entire objects are fetched in bulk and cached per user
+        (see :func:`~videolog.db.db_update_tracks()`).
 
     Args:
         sort_by_played (bool): Whether to sort by played percentage. Can also
@@ -43,29 +130,27 @@ def db_get_tracks(sort_by_played = None):
         list: Tracked channels or their IDs.
     """
 
-    from videolog.youtube import yt_get_channel
+    from videolog.youtube import yt_get_channels
     db = get_db()
+    user_id = flask.session['user']['id']
 
     if sort_by_played is None:
-        return list(db[flask.session['user']['id']].keys())
+        return list(db[user_id].keys())
     else:
-        tracks = []
+        def build():
+            tracks = {}
+            channels = yt_get_channels(db[user_id].keys(), 'snippet,statistics')
 
-        for channel_id in db_get_tracks(sort_by_played = None):
-            channel = yt_get_channel('snippet,statistics', channel_id = channel_id)
+            for channel_id, channel in channels.items():
+                channel['statistics']['videoCount'] = int(
+                    channel['statistics']['videoCount']
+                )
+                tracks[channel_id] = channel
+                db_update_track_stats(channel, len(db[user_id][channel_id]['played']))
 
-            channel['statistics']['videoCount'] = int(
-                channel['statistics']['videoCount']
-            )
-            channel['statistics']['playedCount'] = len(
-                db[flask.session['user']['id']][channel_id]['played']
-            )
-            channel['statistics']['playedPercentage'] = (
-                channel['statistics']['playedCount'] /
-                channel['statistics']['videoCount']
-            ) * 100
+            return tracks
 
-            tracks.append(channel)
+        tracks = list(_tracks_cache.get_or_set(user_id, build).values())
 
         if sort_by_played:
             return sorted(tracks,
@@ -77,6 +162,48 @@ def db_get_tracks(sort_by_played = None):
         else:
             return sorted(tracks, key = lambda item: item['snippet']['title'])
 
+def db_update_track_stats(channel, played_count):
+    """Updates tracked channel's statistics.
+
+    Args:
+        channel (dict): YouTube channel with ``statistics`` part.
+        played_count (int): Number of played videos of the channel.
+    """
+
+    channel['statistics']['playedCount'] = played_count
+    channel['statistics']['playedPercentage'] = (
+        played_count / channel['statistics']['videoCount'] * 100
+        if channel['statistics']['videoCount'] else 0
+    )
+
+def db_update_tracks(channel_id = None, played = None):
+    """Updates cached tracked channels.
+
+    Records a played (or unplayed) video in the cached tracked channels of
+        the current user. Drops the cache when channels are tracked or
+        untracked (``played`` not given), so it is rebuilt on next use.
+        Channels' statistics from YouTube are refreshed after
+        ``TRACKS_CACHE_TTL`` anyway.
+
+    Args:
+        channel_id (Optional[str]): YouTube channel ID.
+        played (Optional[bool]): Whether video has been played or unplayed.
+    """
+
+    user_id = flask.session['user']['id']
+
+    def update(tracks):
+        channel = tracks.get(channel_id)
+        if channel is not None:
+            db_update_track_stats(channel,
+                channel['statistics']['playedCount'] + (1 if played else -1)
+            )
+
+    if played is None:
+        _tracks_cache.pop(user_id)
+    else:
+        _tracks_cache.update(user_id, update)
+
 def db_get_archives():
     """Gets archives.
 
@@ -104,48 +231,306 @@ def db_get_archives():
     else:
         return archives
 
+def db_get_archive_counts():
+    """Gets archives' item counts.
+
+    Counts archived videos of each archive in the database. Archives also
+        hold items the database does not record (deleted or private videos),
+        so stored item counts (reconciled with YouTube by
+        :func:`~videolog.db.db_update_archives()` and updated on insert and
+        remove) are used where higher. Archives without recorded videos are
+        included. No YouTube API calls are needed.
+
+    Returns:
+        dict: Numbers of items by YouTube playlist ID.
+    """
+
+    db = get_db()
+    counts = {}
+
+    for channel in db[flask.session['user']['id']].values():
+        for archive_id in channel['archived'].values():
+            counts[archive_id] = counts.get(archive_id, 0) + 1
+
+    for archive_id, count in db_get_meta(db).get('archives', {}).items():
+        counts[archive_id] = max(counts.get(archive_id, 0), count)
+
+    return counts
+
+def db_count_archived(db, archive_id, change):
+    """Updates archive's stored item count.
+
+    Args:
+        db (dict): JSON database object.
+        archive_id (str): YouTube playlist ID.
+        change (int): Number of inserted (removed if negative) items.
+    """
+
+    counts = db_get_meta(db).setdefault('archives', {})
+    counts[archive_id] = max(counts.get(archive_id, 0) + change, 0)
+
+def db_update_archive_counts(counts):
+    """Stores archives' item counts.
+
+    Used for created archives (empty) and archives YouTube reports full.
+
+    Args:
+        counts (dict): Numbers of items by YouTube playlist ID.
+    """
+
+    def update(db):
+        db_get_meta(db).setdefault('archives', {}).update(counts)
+
+    db_apply(update)
+
+def db_archive_videos(videos):
+    """Records archived videos.
+
+    Records videos inserted to archives in the database at once (one
+        database write).
+
+    Args:
+        videos (list): YouTube channel ID, video ID, archive (playlist) ID
+            and playlist item ID of each archived video.
+    """
+
+    if not videos:
+        return
+
+    user_id = flask.session['user']['id']
+
+    def update(db):
+        for channel_id, video_id, archive_id, item_id in videos:
+            if channel_id not in db[user_id]:
+                db[user_id][channel_id] = {
+                    'played': {}, 'archived': {}
+                }
+                db_update_tracks()
+            db[user_id][channel_id]['archived'][video_id] = archive_id
+            db[user_id][channel_id].setdefault('archived_items', {})[video_id] = item_id
+            db_count_archived(db, archive_id, 1)
+
+    db_apply(update)
+
+def db_get_removals():
+    """Gets videos queued for removal from archives.
+
+    Archived videos of untracked channels are queued until they are removed
+        from archives on YouTube (see
+        :func:`~videolog.jobs.job_untrack_channels()`).
+
+    Returns:
+        dict: YouTube playlist item IDs (or ``None`` if unknown) by YouTube
+            video ID by YouTube playlist ID.
+    """
+
+    return db_get_meta(get_db()).get('removing', {})
+
+def db_queue_removals(db, archives):
+    """Queues videos for removal from archives.
+
+    Args:
+        db (dict): JSON database object.
+        archives (dict): YouTube playlist item IDs (or ``None`` if unknown) by
+            YouTube video ID by YouTube playlist ID.
+    """
+
+    removing = db_get_meta(db).setdefault('removing', {})
+
+    for archive_id, videos in archives.items():
+        removing.setdefault(archive_id, {}).update(videos)
+
+def db_confirm_removals(archive_id, video_ids):
+    """Confirms removal of videos from archive.
+
+    Removes videos which are no longer in the archive from the removal
+        queue.
+
+    Args:
+        archive_id (str): YouTube playlist ID.
+        video_ids (set): YouTube video IDs.
+    """
+
+    def update(db):
+        removing = db_get_meta(db).get('removing', {})
+        for video_id in video_ids:
+            removing.get(archive_id, {}).pop(video_id, None)
+        db_count_archived(db, archive_id, -len(video_ids))
+        if not removing.get(archive_id, True):
+            removing.pop(archive_id)
+
+    db_apply(update)
+
+def db_diff_archives(db, remote):
+    """Compares archives with YouTube.
+
+    Diffs archived videos in the database with contents of respective YouTube
+        playlists using hash lookups only, in time linear to the number of
+        videos. Videos recorded in archives whose contents are unknown are
+        left as they are.
+
+    Args:
+        db (dict): JSON database object.
+        remote (dict): Playlist item IDs by YouTube video ID (or ``None`` if
+            contents could not be fetched) by YouTube playlist ID (contents of
+            archives).
+
+    Returns:
+        dict: Diff report: ``added`` (video IDs by archive ID, videos missing
+            in the database), ``removed`` (video IDs by archive ID, videos
+            missing in archives), ``moved`` (archive IDs by video ID, videos
+            found in other archive only) and ``items`` (playlist item IDs by
+            video ID, changed or missing in the database).
+    """
+
+    local = {}
+    items = {}
+    for channel in db[flask.session['user']['id']].values():
+        local.update(channel['archived'])
+        items.update(channel.get('archived_items', {}))
+
+    found = {}
+    unknown = set()
+    for archive_id in sorted(remote):
+        if remote[archive_id] is None:
+            unknown.add(archive_id)
+            continue
+        for video_id in remote[archive_id]:
+            found.setdefault(video_id, archive_id)
+
+    report = { 'added': {}, 'removed': {}, 'moved': {}, 'items': {} }
+
+    for video_id, archive_id in local.items():
+        if video_id not in found and archive_id not in unknown:
+            report['removed'].setdefault(archive_id, []).append(video_id)
+
+    for video_id, archive_id in found.items():
+        if video_id not in local:
+            report['added'].setdefault(archive_id, []).append(video_id)
+        elif local[video_id] in unknown:
+            continue
+        elif video_id in remote.get(local[video_id], {}):
+            archive_id = local[video_id]
+        else:
+            report['moved'][video_id] = archive_id
+
+        item_id = remote[archive_id][video_id]
+        if items.get(video_id) != item_id:
+            report['items'][video_id] = item_id
+
+    return report
+
 def db_update_archives():
     """Synchronizes archives with YouTube.
 
     Synchronizes archives in the database with respective YouTube playlists.
-        Works bidirectionally.
+        Works bidirectionally. Also stores YouTube playlist item IDs of
+        archived videos and archives' item counts (including items of
+        unavailable videos). Archives which could not be fetched are skipped,
+        so are videos queued for removal (see
+        :func:`~videolog.db.db_get_removals()`). Channels of videos added to
+        archives on YouTube are resolved in bulk. The diff is computed
+        without holding the database; only the differences are then applied
+        to the current database (those still valid, as the database may have
+        changed meanwhile) and the database is not written if there are none.
+
+    Returns:
+        dict: Diff report (see :func:`~videolog.db.db_diff_archives()`).
     """
 
-    from videolog.youtube import yt_get_playlist_items, yt_get_video
-    db = get_db()
+    from videolog.youtube import yt_get_playlist_items, yt_get_videos
     user_id = flask.session['user']['id']
 
-    archived_video_ids_local = db_get_archived()
-    archived_video_ids_remote = []
-    unarchive_videos = []
+    remote = {}
+    sizes = {}
+    for archive_id in db_get_archive_counts():
+        items = yt_get_playlist_items(archive_id)
+        if items is None:
+            # Leave archive as it is rather than wipe it.
+            remote[archive_id] = None
+            continue
+        remote[archive_id] = {}
+        sizes[archive_id] = len(items)
+        for item in items:
+            video_id = item['snippet']['resourceId']['videoId']
+            remote[archive_id].setdefault(video_id, item['id'])
 
-    for archive in db_get_archives():
-        for video in yt_get_playlist_items(archive['id']):
-            video_id = video['snippet']['resourceId']['videoId']
-            if video_id not in archived_video_ids_local:
-                video = yt_get_video(video_id)
-                channel_id = video['snippet']['channelId']
-                archived_video_ids_remote.append(video['id'])
+    db = get_db()
+
+    for archive_id, videos in db_get_meta(db).get('removing', {}).items():
+        for video_id in videos:
+            if remote.get(archive_id) is not None:
+                remote[archive_id].pop(video_id, None)
+
+    report = db_diff_archives(db, remote)
 
-                if channel_id not in db[user_id]:
-                    db[user_id][channel_id] = {
+    if not any(report.values()):
+        if sizes != {
+            archive_id: count
+            for archive_id, count in db_get_meta(db).get('archives', {}).items()
+            if archive_id in sizes
+        }:
+            db_update_archive_counts(sizes)
+        return report
+
+    added = [
+        video_id
+        for video_ids in report['added'].values()
+        for video_id in video_ids
+    ]
+    resolved = {
+        video_id: video['snippet']['channelId']
+        for video_id, video in yt_get_videos(added, part = 'snippet').items()
+    }
+
+    def update(db):
+        db_get_meta(db).setdefault('archives', {}).update(sizes)
+        channel_ids = {
+            video_id: channel_id
+            for channel_id, channel in db[user_id].items()
+            for video_id in channel['archived']
+        }
+        removing = {
+            video_id
+            for videos in db_get_meta(db).get('removing', {}).values()
+            for video_id in videos
+        }
+
+        def archived(video_id):
+            return db[user_id][channel_ids[video_id]]['archived']
+
+        for archive_id, video_ids in report['removed'].items():
+            for video_id in video_ids:
+                if video_id in channel_ids and archived(video_id)[video_id] == archive_id:
+                    archived(video_id).pop(video_id)
+                    db[user_id][channel_ids[video_id]].get(
+                        'archived_items', {}
+                    ).pop(video_id, None)
+
+        for archive_id, video_ids in report['added'].items():
+            for video_id in video_ids:
+                if video_id in resolved and video_id not in channel_ids and \
+                        video_id not in removing:
+                    channel_ids[video_id] = resolved[video_id]
+                    if channel_ids[video_id] not in db[user_id]:
+                        db_update_tracks()
+                    db[user_id].setdefault(channel_ids[video_id], {
                         'played': {}, 'archived': {}
-                    }
+                    })['archived'][video_id] = archive_id
 
-                if video['id'] not in db[user_id][channel_id]['archived']:
-                    db[user_id][channel_id]['archived'][video['id']] = archive['id']
-            else:
-                archived_video_ids_remote.append(video_id)
+        for video_id, archive_id in report['moved'].items():
+            if video_id in channel_ids:
+                archived(video_id)[video_id] = archive_id
 
-    for channel_id, channel in db[user_id].items():
-        for video_id in channel['archived'].keys():
-            if video_id not in archived_video_ids_remote:
-                unarchive_videos.append((channel_id, video_id))
+        for video_id, item_id in report['items'].items():
+            if video_id in channel_ids and video_id in archived(video_id):
+                db[user_id][channel_ids[video_id]].setdefault(
+                    'archived_items', {}
+                )[video_id] = item_id
 
-    for item in unarchive_videos:
-        db[user_id][item[0]]['archived'].pop(item[1])
+    db_apply(update)
 
-    update_db(db)
+    return report
 
 def db_get_archived():
     """Gets archived video IDs.
@@ -164,6 +549,26 @@ def db_get_archived():
         for video_id in channel['archived'].keys()
     ])
 
+def db_get_channel(channel_id):
+    """Gets tracked channel.
+
+    Gets channel's record from the database.
+
+    Args:
+        channel_id (str): YouTube channel ID.
+
+    Returns:
+        dict: Channel's ``played`` and ``archived`` videos (both empty if
+            channel is not tracked).
+    """
+
+    channel = get_db().get(flask.session['user']['id'], {}).get(channel_id, {})
+
+    channel.setdefault('played', {})
+    channel.setdefault('archived', {})
+
+    return channel
+
 def db_get_video(video_id, channel_id, field = 'played'):
     """Gets video metadata.
 
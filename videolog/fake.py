@@ -0,0 +1,710 @@
+"""Fake module
+
+This module contains a local stand-in for the part of YouTube Data API used by
+    the application. It generates synthetic channels, videos, comments and
+    playlists of configurable size and serves them over HTTP, optionally with
+    injected latency and errors. Point the application at it by setting
+    ``API_ROOT_URL`` in the Flask application's configuration (or by running
+    ``videolog run --api-url``).
+"""
+
+import collections
+import datetime
+import http.server
+import json
+import random
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from videolog.constants import API_SERVICE_NAME, API_VERSION
+
+FAKE_USER_ID = 'UCfakeuser000000000000'
+FAKE_EPOCH = datetime.datetime(2010, 1, 1, tzinfo = datetime.timezone.utc)
+PLAYLIST_MAX_ITEMS = 5000
+
+def _discovery_document(root_url):
+    """Builds discovery document.
+
+    Builds minimal discovery document describing the methods served by the
+        fake API, so that regular ``googleapiclient`` clients can talk to it.
+
+    Args:
+        root_url (str): Root URL of the fake API (ends with slash).
+
+    Returns:
+        dict: Discovery document.
+    """
+
+    string = {'type': 'string', 'location': 'query'}
+    required = {'type': 'string', 'location': 'query', 'required': True}
+    integer = {'type': 'integer', 'location': 'query'}
+    boolean = {'type': 'boolean', 'location': 'query'}
+    paging = {'maxResults': integer, 'pageToken': string}
+
+    def method(path, http_method, parameters, request = False):
+        name = path.replace('/', '.')
+        desc = {
+            'id': 'youtube.' + name, 'path': path, 'httpMethod': http_method,
+            'parameters': parameters,
+            'parameterOrder': [
+                key for key, value in parameters.items()
+                if value.get('required')
+            ]
+        }
+        if request:
+            desc['request'] = {'$ref': 'Resource'}
+        if http_method != 'DELETE':
+            desc['response'] = {'$ref': 'Resource'}
+        return desc
+
+    def resource(name, methods):
+        return {'methods': {
+            key: method(name + ('' if key in ('list', 'insert', 'update', 'delete')
+                                else '/' + key), *value)
+            for key, value in methods.items()
+        }}
+
+    return {
+        'kind': 'discovery#restDescription', 'discoveryVersion': 'v1',
+        'id': API_SERVICE_NAME + ':' + API_VERSION,
+        'name': API_SERVICE_NAME, 'version': API_VERSION,
+        'rootUrl': root_url, 'servicePath': 'youtube/v3/',
+        'baseUrl': root_url + 'youtube/v3/', 'batchPath': 'batch',
+        'protocol': 'rest', 'parameters': {},
+        'schemas': {'Resource': {'id': 'Resource', 'type': 'object'}},
+        'resources': {
+            'channels': resource('channels', {
+                'list': ('GET', dict(paging, part = required, id = string,
+                                     forUsername = string, mine = boolean))
+            }),
+            'playlistItems': resource('playlistItems', {
+                'list': ('GET', dict(paging, part = required,
+                                     playlistId = string, id = string)),
+                'insert': ('POST', {'part': required}, True),
+                'delete': ('DELETE', {'id': required})
+            }),
+            'playlists': resource('playlists', {
+                'list': ('GET', dict(paging, part = required, id = string,
+                                     mine = boolean)),
+                'insert': ('POST', {'part': required}, True),
+                'update': ('PUT', {'part': required}, True)
+            }),
+            'videos': resource('videos', {
+                'list': ('GET', dict(paging, part = required, id = string)),
+                'getRating': ('GET', {'id': required}),
+                'rate': ('POST', {'id': required, 'rating': required})
+            }),
+            'commentThreads': resource('commentThreads', {
+                'list': ('GET', dict(paging, part = required, videoId = string))
+            }),
+            'comments': resource('comments', {
+                'list': ('GET', dict(paging, part = required, parentId = string))
+            }),
+            'subscriptions': resource('subscriptions', {
+                'list': ('GET', dict(paging, part = required, mine = boolean,
+                                     order = string)),
+                'insert': ('POST', {'part': required}, True),
+                'delete': ('DELETE', {'id': required})
+            })
+        }
+    }
+
+class FakeYouTubeError(Exception):
+    """Fake YouTube Data API error.
+
+    Args:
+        status (int): HTTP status code.
+        reason (str): YouTube Data API error reason.
+    """
+
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+class FakeYouTube:
+    """Fake YouTube Data API.
+
+    Holds synthetic data set and serves it over HTTP. Channels, their videos
+        and comments are generated lazily and deterministically from their
+        indices, so even large data sets cost no memory up front. User's
+        playlists, subscriptions and ratings are mutable.
+
+    Args:
+        channels (int): Number of channels.
+        videos (int): Number of uploaded videos per channel.
+        comments (int): Number of top level comments per video.
+        replies (int): Number of replies per top level comment.
+        subscriptions (int): Number of channels the user is subscribed to.
+        latency (float): Delay added to every API response (in seconds).
+        error_rate (float): Probability of any API call failing with
+            ``500 backendError``.
+        seed (int): Seed for error injection.
+
+    Attributes:
+        calls (collections.Counter): Number of served API calls by
+            ``resource.method``.
+    """
+
+    def __init__(self, channels = 10, videos = 100, comments = 5, replies = 2,
+                 subscriptions = 0, latency = 0.0, error_rate = 0.0, seed = 0):
+        self.channels = channels
+        self.videos = videos
+        self.comments = comments
+        self.replies = replies
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = collections.Counter()
+        self.playlists = collections.OrderedDict()
+        self.subscriptions = {}
+        self.ratings = {}
+        self.server = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+        for index in range(min(subscriptions, channels)):
+            self.subscriptions[self.channel_id(index)] = self._new_id('sub')
+
+    @property
+    def url(self):
+        """str: Root URL of the running server (``None`` if not running)."""
+
+        if self.server is None:
+            return None
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self, host = '127.0.0.1', port = 0):
+        """Starts HTTP server.
+
+        Starts serving in a daemon thread.
+
+        Args:
+            host (str): The interface to bind to.
+            port (int): The port to bind to (``0`` picks a free one).
+
+        Returns:
+            str: Root URL of the server.
+        """
+
+        self.server = _FakeServer((host, port), _FakeHandler)
+        self.server.fake = self
+        thread = threading.Thread(target = self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+    def stop(self):
+        """Stops HTTP server."""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def serve_forever(self, host = '127.0.0.1', port = 8091):
+        """Serves HTTP in the current thread until interrupted.
+
+        Args:
+            host (str): The interface to bind to.
+            port (int): The port to bind to.
+        """
+
+        self.server = _FakeServer((host, port), _FakeHandler)
+        self.server.fake = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.server = None
+
+    def channel_id(self, index):
+        """Gets channel ID.
+
+        Args:
+            index (int): Channel index.
+
+        Returns:
+            str: YouTube channel ID.
+        """
+
+        return 'UCfake{:016d}'.format(index)
+
+    def video_id(self, channel_index, index):
+        """Gets video ID.
+
+        Args:
+            channel_index (int): Channel index.
+            index (int): Video index within the channel (oldest is ``0``).
+
+        Returns:
+            str: YouTube video ID.
+        """
+
+        return 'v{:05d}{:05d}'.format(channel_index, index)
+
+    def create_playlist(self, title, video_ids = ()):
+        """Creates user's playlist.
+
+        Args:
+            title (str): Playlist title.
+            video_ids (iterable): YouTube video IDs to insert.
+
+        Returns:
+            str: YouTube playlist ID.
+        """
+
+        with self._lock:
+            playlist_id = self._new_id('PLfake')
+            self.playlists[playlist_id] = {
+                'title': title, 'publishedAt': self._now(),
+                'items': collections.OrderedDict()
+            }
+            for video_id in video_ids:
+                self.playlists[playlist_id]['items'][self._new_id('item')] = video_id
+
+        return playlist_id
+
+    def handle(self, method, path, query, body):
+        """Handles API call.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path.
+            query (dict): Query parameters (single values).
+            body (dict): JSON request body.
+
+        Returns:
+            tuple: HTTP status code and JSON response (or ``None``).
+        """
+
+        root = '/youtube/' + API_VERSION + '/'
+        discovery = '/discovery/v1/apis/' + API_SERVICE_NAME + '/' + API_VERSION + '/rest'
+
+        if path == discovery:
+            return 200, _discovery_document(self.url + '/')
+        if path == '/oauth2/v3/tokeninfo':
+            return 200, {'expires_in': 3600, 'scope': ''}
+        if not path.startswith(root):
+            return 404, _error(404, 'notFound')
+
+        name = path[len(root):].replace('/', '.')
+        if '.' not in name:
+            name += {
+                'GET': '.list', 'POST': '.insert',
+                'PUT': '.update', 'DELETE': '.delete'
+            }.get(method, '')
+
+        with self._lock:
+            self.calls[name] += 1
+            failed = self._random.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 500, _error(500, 'backendError')
+
+        handler = getattr(self, '_' + name.replace('.', '_'), None)
+        if handler is None:
+            return 404, _error(404, 'notFound')
+
+        try:
+            with self._lock:
+                return handler(query, body)
+        except FakeYouTubeError as e:
+            return e.status, _error(e.status, e.reason)
+
+    def _new_id(self, prefix):
+        self._next_id += 1
+        return '{}{:010d}'.format(prefix, self._next_id)
+
+    def _now(self):
+        return datetime.datetime.utcnow().replace(
+            microsecond = 0, tzinfo = datetime.timezone.utc
+        ).isoformat().replace('+00:00', '.000Z')
+
+    def _timestamp(self, channel_index, index):
+        return (FAKE_EPOCH + datetime.timedelta(
+            days = index, minutes = channel_index
+        )).isoformat().replace('+00:00', '.000Z')
+
+    def _parse_channel(self, channel_id):
+        try:
+            index = int(channel_id[len('UCfake'):])
+        except ValueError:
+            return None
+        if channel_id.startswith('UCfake') and 0 <= index < self.channels:
+            return index
+        return None
+
+    def _parse_video(self, video_id):
+        try:
+            channel_index, index = int(video_id[1:6]), int(video_id[6:11])
+        except ValueError:
+            return None
+        if (video_id.startswith('v') and len(video_id) == 11 and
+                0 <= channel_index < self.channels and 0 <= index < self.videos):
+            return channel_index, index
+        return None
+
+    def _thumbnails(self, id):
+        return {
+            size: {'url': 'https://i.ytimg.com/fake/' + id + '/' + size + '.jpg'}
+            for size in ('default', 'medium', 'high')
+        }
+
+    def _channel(self, index):
+        channel_id = self.channel_id(index)
+        return {
+            'kind': 'youtube#channel', 'id': channel_id,
+            'snippet': {
+                'title': 'Channel {:05d}'.format(index),
+                'description': '', 'publishedAt': self._timestamp(index, 0),
+                'thumbnails': self._thumbnails(channel_id)
+            },
+            'contentDetails': {
+                'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}
+            },
+            'statistics': {
+                'videoCount': str(self.videos), 'viewCount': '0',
+                'subscriberCount': '0', 'hiddenSubscriberCount': False
+            }
+        }
+
+    def _user_channel(self):
+        return {
+            'kind': 'youtube#channel', 'id': FAKE_USER_ID,
+            'snippet': {
+                'title': 'Fake User', 'description': '',
+                'publishedAt': self._timestamp(0, 0),
+                'thumbnails': self._thumbnails(FAKE_USER_ID)
+            },
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UUfakeuser'}},
+            'statistics': {'videoCount': '0'}
+        }
+
+    def _video(self, channel_index, index):
+        video_id = self.video_id(channel_index, index)
+        return {
+            'kind': 'youtube#video', 'id': video_id,
+            'snippet': {
+                'publishedAt': self._timestamp(channel_index, index),
+                'channelId': self.channel_id(channel_index),
+                'channelTitle': 'Channel {:05d}'.format(channel_index),
+                'title': 'Video {:05d} of channel {:05d}'.format(index, channel_index),
+                'description': 'Synthetic video.', 'tags': ['fake'],
+                'thumbnails': self._thumbnails(video_id)
+            },
+            'contentDetails': {
+                'duration': 'PT{}M{}S'.format(1 + index % 59, index % 60)
+            },
+            'statistics': {
+                'viewCount': str(index * 10), 'likeCount': str(index),
+                'dislikeCount': '0', 'favoriteCount': '0',
+                'commentCount': str(self.comments)
+            },
+            'status': {
+                'embeddable': True, 'privacyStatus': 'public',
+                'uploadStatus': 'processed'
+            }
+        }
+
+    def _playlist_item(self, item_id, playlist_id, position, video_id,
+                       published_at = None):
+        parsed = self._parse_video(video_id)
+        if parsed is not None:
+            video = self._video(*parsed)
+        else:
+            video = {'snippet': {
+                'title': video_id, 'description': '', 'channelId': FAKE_USER_ID,
+                'channelTitle': 'Fake User', 'publishedAt': self._timestamp(0, 0),
+                'thumbnails': self._thumbnails(video_id)
+            }}
+        snippet = video['snippet']
+        return {
+            'kind': 'youtube#playlistItem', 'id': item_id,
+            'snippet': {
+                'publishedAt': published_at or snippet['publishedAt'],
+                'channelId': snippet['channelId'],
+                'channelTitle': snippet['channelTitle'],
+                'title': snippet['title'], 'description': snippet['description'],
+                'thumbnails': snippet['thumbnails'],
+                'playlistId': playlist_id, 'position': position,
+                'resourceId': {'kind': 'youtube#video', 'videoId': video_id}
+            },
+            'contentDetails': {
+                'videoId': video_id, 'videoPublishedAt': snippet['publishedAt']
+            }
+        }
+
+    def _playlist(self, playlist_id):
+        playlist = self.playlists[playlist_id]
+        return {
+            'kind': 'youtube#playlist', 'id': playlist_id,
+            'snippet': {
+                'publishedAt': playlist['publishedAt'],
+                'channelId': FAKE_USER_ID, 'channelTitle': 'Fake User',
+                'title': playlist['title'], 'description': '',
+                'thumbnails': self._thumbnails(playlist_id)
+            },
+            'status': {'privacyStatus': 'private'},
+            'contentDetails': {'itemCount': len(playlist['items'])}
+        }
+
+    def _comment(self, comment_id, video_id, index):
+        return {
+            'kind': 'youtube#comment', 'id': comment_id,
+            'snippet': {
+                'videoId': video_id,
+                'authorDisplayName': 'Commenter {}'.format(index),
+                'authorProfileImageUrl': 'https://i.ytimg.com/fake/avatar.jpg',
+                'authorChannelUrl': 'https://www.youtube.com/channel/UCfakeauthor',
+                'authorChannelId': {'value': 'UCfakeauthor'},
+                'textDisplay': 'Comment {} on {}.'.format(comment_id, video_id),
+                'textOriginal': 'Comment {} on {}.'.format(comment_id, video_id),
+                'likeCount': index % 3, 'publishedAt': self._timestamp(0, index),
+                'updatedAt': self._timestamp(0, index)
+            }
+        }
+
+    def _page(self, kind, items, query, default = 5):
+        max_results = int(query.get('maxResults', default))
+        offset = int(query.get('pageToken', 0))
+        page = items[offset:offset + max_results]
+        response = {
+            'kind': kind, 'items': page,
+            'pageInfo': {'totalResults': len(items), 'resultsPerPage': max_results}
+        }
+        if offset + max_results < len(items):
+            response['nextPageToken'] = str(offset + max_results)
+        return response
+
+    def _channels_list(self, query, body):
+        if query.get('mine') == 'true':
+            items = [self._user_channel()]
+        elif 'forUsername' in query:
+            items = [self._channel(0)] if self.channels else []
+        else:
+            indices = [
+                self._parse_channel(channel_id)
+                for channel_id in query.get('id', '').split(',')
+            ]
+            items = [self._channel(index) for index in indices if index is not None]
+        return 200, self._page('youtube#channelListResponse', items, query)
+
+    def _playlistItems_list(self, query, body):
+        playlist_id = query.get('playlistId', '')
+        channel_index = self._parse_channel('UC' + playlist_id[2:])
+
+        if playlist_id.startswith('UU') and channel_index is not None:
+            max_results = int(query.get('maxResults', 5))
+            offset = int(query.get('pageToken', 0))
+            items = [
+                self._playlist_item(
+                    'UU{:05d}{:05d}'.format(channel_index, self.videos - 1 - position),
+                    playlist_id, position,
+                    self.video_id(channel_index, self.videos - 1 - position)
+                )
+                for position in range(offset, min(offset + max_results, self.videos))
+            ]
+            response = {
+                'kind': 'youtube#playlistItemListResponse', 'items': items,
+                'pageInfo': {'totalResults': self.videos, 'resultsPerPage': max_results}
+            }
+            if offset + max_results < self.videos:
+                response['nextPageToken'] = str(offset + max_results)
+            return 200, response
+
+        if playlist_id not in self.playlists:
+            raise FakeYouTubeError(404, 'playlistNotFound')
+
+        items = [
+            self._playlist_item(item_id, playlist_id, position, video_id)
+            for position, (item_id, video_id) in enumerate(
+                self.playlists[playlist_id]['items'].items()
+            )
+        ]
+        return 200, self._page('youtube#playlistItemListResponse', items, query)
+
+    def _playlistItems_insert(self, query, body):
+        snippet = body.get('snippet', {})
+        playlist_id = snippet.get('playlistId')
+        video_id = snippet.get('resourceId', {}).get('videoId')
+
+        if playlist_id not in self.playlists:
+            raise FakeYouTubeError(404, 'playlistNotFound')
+        if self._parse_video(video_id or '') is None:
+            raise FakeYouTubeError(404, 'videoNotFound')
+        items = self.playlists[playlist_id]['items']
+        if len(items) >= PLAYLIST_MAX_ITEMS:
+            raise FakeYouTubeError(403, 'playlistContainsMaximumNumberOfVideos')
+
+        item_id = self._new_id('item')
+        items[item_id] = video_id
+        return 200, self._playlist_item(
+            item_id, playlist_id, len(items) - 1, video_id, self._now()
+        )
+
+    def _playlistItems_delete(self, query, body):
+        for playlist in self.playlists.values():
+            if query.get('id') in playlist['items']:
+                playlist['items'].pop(query['id'])
+                return 204, None
+        raise FakeYouTubeError(404, 'playlistItemNotFound')
+
+    def _playlists_list(self, query, body):
+        if 'id' in query:
+            ids = [
+                playlist_id for playlist_id in query['id'].split(',')
+                if playlist_id in self.playlists
+            ]
+        else:
+            ids = list(self.playlists.keys())
+        items = [self._playlist(playlist_id) for playlist_id in ids]
+        return 200, self._page('youtube#playlistListResponse', items, query)
+
+    def _playlists_insert(self, query, body):
+        title = body.get('snippet', {}).get('title', '')
+        playlist_id = self._new_id('PLfake')
+        self.playlists[playlist_id] = {
+            'title': title, 'publishedAt': self._now(),
+            'items': collections.OrderedDict()
+        }
+        return 200, self._playlist(playlist_id)
+
+    def _playlists_update(self, query, body):
+        if body.get('id') not in self.playlists:
+            raise FakeYouTubeError(404, 'playlistNotFound')
+        self.playlists[body['id']]['title'] = body.get('snippet', {}).get('title', '')
+        return 200, self._playlist(body['id'])
+
+    def _videos_list(self, query, body):
+        items = []
+        for video_id in query.get('id', '').split(','):
+            parsed = self._parse_video(video_id)
+            if parsed is not None:
+                items.append(self._video(*parsed))
+        return 200, self._page('youtube#videoListResponse', items, query, 50)
+
+    def _videos_getRating(self, query, body):
+        return 200, {
+            'kind': 'youtube#videoGetRatingResponse',
+            'items': [
+                {'videoId': video_id, 'rating': self.ratings.get(video_id, 'none')}
+                for video_id in query.get('id', '').split(',')
+            ]
+        }
+
+    def _videos_rate(self, query, body):
+        if self._parse_video(query.get('id', '')) is None:
+            raise FakeYouTubeError(404, 'videoNotFound')
+        self.ratings[query['id']] = query.get('rating', 'none')
+        return 204, None
+
+    def _commentThreads_list(self, query, body):
+        video_id = query.get('videoId', '')
+        if self._parse_video(video_id) is None:
+            raise FakeYouTubeError(404, 'videoNotFound')
+
+        items = []
+        for index in range(self.comments):
+            thread_id = 'Ug{}{:04d}'.format(video_id, index)
+            items.append({
+                'kind': 'youtube#commentThread', 'id': thread_id,
+                'snippet': {
+                    'videoId': video_id,
+                    'topLevelComment': self._comment(thread_id, video_id, index),
+                    'canReply': True, 'totalReplyCount': self.replies,
+                    'isPublic': True
+                }
+            })
+        return 200, self._page('youtube#commentThreadListResponse', items, query, 20)
+
+    def _comments_list(self, query, body):
+        parent_id = query.get('parentId', '')
+        if self._parse_video(parent_id[2:13]) is None:
+            raise FakeYouTubeError(404, 'commentNotFound')
+
+        items = [
+            self._comment(parent_id + '.{:04d}'.format(index), parent_id[2:13], index)
+            for index in range(self.replies)
+        ]
+        for item in items:
+            item['snippet']['parentId'] = parent_id
+        return 200, self._page('youtube#commentListResponse', items, query, 20)
+
+    def _subscriptions_list(self, query, body):
+        items = [
+            {
+                'kind': 'youtube#subscription', 'id': subscription_id,
+                'snippet': {
+                    'title': self._channel(self._parse_channel(channel_id))['snippet']['title'],
+                    'description': '', 'channelId': FAKE_USER_ID,
+                    'resourceId': {'kind': 'youtube#channel', 'channelId': channel_id},
+                    'thumbnails': self._thumbnails(channel_id)
+                }
+            }
+            for channel_id, subscription_id in sorted(self.subscriptions.items())
+        ]
+        return 200, self._page('youtube#subscriptionListResponse', items, query)
+
+    def _subscriptions_insert(self, query, body):
+        channel_id = body.get('snippet', {}).get('resourceId', {}).get('channelId', '')
+        if self._parse_channel(channel_id) is None:
+            raise FakeYouTubeError(404, 'publisherNotFound')
+        if channel_id in self.subscriptions:
+            raise FakeYouTubeError(400, 'subscriptionDuplicate')
+
+        self.subscriptions[channel_id] = self._new_id('sub')
+        return 200, {
+            'kind': 'youtube#subscription', 'id': self.subscriptions[channel_id],
+            'snippet': {'resourceId': {'kind': 'youtube#channel', 'channelId': channel_id}}
+        }
+
+    def _subscriptions_delete(self, query, body):
+        for channel_id, subscription_id in list(self.subscriptions.items()):
+            if subscription_id == query.get('id'):
+                self.subscriptions.pop(channel_id)
+                return 204, None
+        raise FakeYouTubeError(404, 'subscriptionNotFound')
+
+def _error(status, reason):
+    return {'error': {
+        'code': status, 'message': reason,
+        'errors': [{'domain': 'youtube', 'reason': reason, 'message': reason}]
+    }}
+
+class _FakeServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class _FakeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def _dispatch(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = {
+            key: values[-1]
+            for key, values in urllib.parse.parse_qs(url.query).items()
+        }
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length).decode('utf-8') or '{}') if length else {}
+
+        status, response = self.server.fake.handle(self.command, url.path, query, body)
+        content = b'' if response is None else json.dumps(response).encode('utf-8')
+
+        self.send_response(status)
+        if response is not None:
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
@@ -3,6 +3,13 @@
 This module contains helper functions.
 """
 
+import heapq
+import io
+import re
+import zipfile
+
+from videolog.constants import VIDEOS_PAGE_SIZE
+
 def build_resource(properties):
     """Builds YouTube resource.
 
@@ -73,3 +80,185 @@ def allowed_file(filename):
             filename.rsplit('.', 1)[1].lower() in set([
                 'html', 'htm', 'xhtml', 'php'
             ]))
+
+def paginate(items, key, cursor = None, size = VIDEOS_PAGE_SIZE):
+    """Gets page of items.
+
+    Items have to be sorted by given key in descending order and keys have to
+        be unique. The cursor is the key of the last item of previous page, so
+        pages stay stable when items are added or removed meanwhile.
+
+    Args:
+        items (list): Sorted items.
+        key (function): Function returning item's (unique) key string.
+        cursor (Optional[str]): Key of the last item of previous page
+            (``None`` for the first page).
+        size (Optional[int]): Page size.
+
+    Returns:
+        tuple: Page items (list) and cursor of the next page (``None`` if
+            there are no more items).
+    """
+
+    start = 0
+
+    if cursor:
+        start = next((
+            index
+            for index, item in enumerate(items)
+            if key(item) < cursor
+        ), len(items))
+
+    page = items[start:start + size]
+
+    if start + size < len(items):
+        return page, key(page[-1])
+    else:
+        return page, None
+
+def filter_downloaded(lines, video_ids):
+    """Filters out downloaded videos.
+
+    Streams youtube-dl download archive (lines ``<extractor> <video ID>``)
+        and discards YouTube videos found there from given video IDs. Only
+        given video IDs are held in memory, so archive size does not matter.
+        Other extractors' and malformed lines are ignored.
+
+    Args:
+        lines (iterable): youtube-dl download archive lines (``bytes``).
+        video_ids (iterable): YouTube video IDs.
+
+    Returns:
+        set: YouTube video IDs not found in the download archive.
+    """
+
+    remaining = set(video_ids)
+
+    for line in lines:
+        if not remaining:
+            break
+
+        fields = line.split()
+        if len(fields) == 2 and fields[0].lower() == b'youtube':
+            try:
+                remaining.discard(fields[1].decode('ascii'))
+            except UnicodeDecodeError:
+                pass
+
+    return remaining
+
+def parse_duration(duration):
+    """Parses video duration.
+
+    Args:
+        duration (str): ISO 8601 duration as used by YouTube Data API
+            (e.g. ``PT1H2M3S`` or ``P1DT2H``).
+
+    Returns:
+        int: Duration in seconds (0 if it cannot be parsed).
+    """
+
+    match = re.match(
+        r'^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$',
+        duration or ''
+    )
+
+    if match is None:
+        return 0
+
+    weeks, days, hours, minutes, seconds = [
+        int(value or 0) for value in match.groups()
+    ]
+
+    return (((weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def shard(items, count, weight = None, group = None):
+    """Splits items into balanced shards.
+
+    Uses greedy longest processing time first scheduling: units (items or,
+        if ``group`` is given, groups of items) are assigned from the heaviest
+        to the least loaded shard. Ties are broken by item order, so the
+        result only depends on the items, not on their input order.
+
+    Args:
+        items (iterable): Items (sortable, e.g. video IDs).
+        count (int): Number of shards.
+        weight (Optional[function]): Function returning item's weight (e.g.
+            duration). Each item weighs 1 if not given.
+        group (Optional[function]): Function returning item's group (e.g.
+            channel ID). Items of a group are kept in the same shard.
+
+    Returns:
+        list: Shards (lists of items, ordered by unit and item), some may
+            be empty.
+    """
+
+    units = {}
+
+    for item in items:
+        units.setdefault(item if group is None else group(item), []).append(item)
+
+    units = sorted([
+        (sum(weight(item) if weight else 1 for item in unit), key, sorted(unit))
+        for key, unit in units.items()
+    ], key = lambda unit: (-unit[0], unit[1]))
+
+    shards = [[] for index in range(count)]
+    loads = [(0, index) for index in range(count)]
+
+    for unit_weight, key, unit in units:
+        load, index = heapq.heappop(loads)
+        shards[index].extend(unit)
+        heapq.heappush(loads, (load + unit_weight, index))
+
+    return shards
+
+class ZipStream(io.RawIOBase):
+    """Unseekable output stream for ZIP archive streaming.
+
+    Collects data written by :class:`zipfile.ZipFile` until they are drained.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Drains written data.
+
+        Returns:
+            bytes: Data written since the last drain.
+        """
+
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(files):
+    """Streams ZIP archive.
+
+    Generates ZIP archive chunk by chunk, one file at a time, so only one
+        file is held in memory regardless of archive size.
+
+    Args:
+        files (iterable): File names and contents (``str`` or ``bytes``).
+
+    Yields:
+        bytes: ZIP archive chunks.
+    """
+
+    stream = ZipStream()
+
+    with zipfile.ZipFile(stream, 'w') as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+            yield stream.drain()
+
+    yield stream.drain()
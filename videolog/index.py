@@ -0,0 +1,162 @@
+"""Index module
+
+This module contains in-memory video indexes. Bitmap index is used for
+    filtering of video lists: video IDs of a list are interned to their
+    integer positions; sets of videos (e.g. played or archived) are then
+    bitmaps (Python integers) and filtering is a matter of bitwise operations.
+    Channel catalog keeps known video IDs of a channel, so videos can be
+    picked without listing channel's uploads again.
+"""
+
+import random
+
+from videolog.constants import RANDOM_SAMPLE_ATTEMPTS
+
+class VideoIndex:
+    """Bitmap index of video list.
+
+    Args:
+        video_ids (list): Video IDs in list order. Bit ``i`` of every bitmap
+            stands for ``video_ids[i]``.
+    """
+
+    def __init__(self, video_ids):
+        self.ids = list(video_ids)
+        self.positions = {
+            video_id: position
+            for position, video_id in enumerate(self.ids)
+        }
+        self.all = (1 << len(self.ids)) - 1
+
+    def bitmap(self, video_ids):
+        """Builds bitmap of videos.
+
+        Args:
+            video_ids (iterable): Video IDs. IDs missing in the list are
+                ignored.
+
+        Returns:
+            int: Bitmap of given videos.
+        """
+
+        bits = bytearray((len(self.ids) + 7) // 8)
+
+        for video_id in video_ids:
+            position = self.positions.get(video_id)
+            if position is not None:
+                bits[position >> 3] |= 1 << (position & 7)
+
+        return int.from_bytes(bits, 'little')
+
+    def filter(self, bitmap, value):
+        """Restricts videos by bitmap.
+
+        Args:
+            bitmap (int): Bitmap of videos (e.g. played ones).
+            value (str): 'true' (videos in bitmap), 'false' (videos not in
+                bitmap) or anything else (all videos).
+
+        Returns:
+            int: Bitmap of matching videos.
+        """
+
+        if value == 'true':
+            return bitmap & self.all
+        elif value == 'false':
+            return ~bitmap & self.all
+        else:
+            return self.all
+
+    def select(self, items, bitmap):
+        """Selects list items by bitmap.
+
+        Args:
+            items (list): Items in the same order as index's video IDs.
+            bitmap (int): Bitmap of selected videos.
+
+        Returns:
+            list: Selected items (in list order).
+        """
+
+        return [items[position] for position in self.iter_positions(bitmap)]
+
+    def iter_positions(self, bitmap):
+        """Iterates positions of set bits.
+
+        Args:
+            bitmap (int): Bitmap of videos.
+
+        Yields:
+            int: Positions of videos in bitmap (ascending).
+        """
+
+        data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+
+        for index, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                yield (index << 3) + low.bit_length() - 1
+                byte ^= low
+
+class ChannelCatalog:
+    """Catalog of channel's known videos.
+
+    Args:
+        videos (list): Channel's videos (playlist item resources).
+
+    Attributes:
+        videos (list): Videos ordered by date published (oldest first).
+        ids (list): Video IDs in the same order.
+        positions (dict): Positions of video IDs in ``ids``.
+    """
+
+    def __init__(self, videos):
+        self.videos = sorted(videos, key = lambda video: (
+            video['snippet']['publishedAt'],
+            video['snippet']['resourceId']['videoId']
+        ))
+        self.ids = [
+            video['snippet']['resourceId']['videoId']
+            for video in self.videos
+        ]
+        self.positions = {
+            video_id: position
+            for position, video_id in enumerate(self.ids)
+        }
+
+    def __contains__(self, video_id):
+        return video_id in self.positions
+
+    def __len__(self):
+        return len(self.ids)
+
+def sample(population, accept = None, attempts = RANDOM_SAMPLE_ATTEMPTS):
+    """Picks random item.
+
+    Uses rejection sampling: draws up to ``attempts`` random items until one
+        is accepted, so a pick takes constant time unless accepted items are
+        rare; then falls back to choosing from all accepted items.
+
+    Args:
+        population (list): Items.
+        accept (Optional[function]): Function taking item and returning
+            whether it can be picked (``None`` accepts everything).
+        attempts (Optional[int]): Number of random draws before fallback.
+
+    Returns:
+        Picked item.
+
+    Raises:
+        IndexError: No item can be picked.
+    """
+
+    if accept is None:
+        return random.choice(population)
+
+    if population:
+        for attempt in range(attempts):
+            item = random.choice(population)
+            if accept(item):
+                return item
+
+    return random.choice([item for item in population if accept(item)])
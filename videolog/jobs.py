@@ -0,0 +1,697 @@
+"""Jobs module
+
+This module contains background job runner for long running tasks (comments
+    export, playlist import, archive sync, confirmation of changes, removal of
+    untracked channels' videos from archives). Jobs are kept in a job table on
+    disk (``jobs.json`` in ``JOBS_PATH`` directory, each job's parameters and
+    results in its own subdirectory) and run by worker threads inside a
+    request context with the submitting user's session. Job records refer to
+    the session by its ID only; session data (credentials) are read from
+    the server-side session storage when the job runs.
+
+Jobs record checkpoints of their progress, so jobs interrupted by application
+    restart resume from their last checkpoint (see
+    :meth:`~videolog.jobs.JobRunner.resume()`).
+
+Jobs can also be scheduled to run periodically for a user (see
+    :meth:`~videolog.jobs.JobRunner.schedule()`). Schedules are kept in
+    ``schedules.json`` next to the job table.
+
+Attributes:
+    runner (videolog.jobs.JobRunner): Application's job runner.
+"""
+
+import concurrent.futures
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import flask
+
+from videolog.auth import auth_check
+from videolog.constants import JOB_CHECKPOINT_INTERVAL, JOB_RETENTION
+from videolog.constants import JOB_SCHEDULE_TICK
+from videolog.constants import JOB_WORKERS, PENDING_CHANGE_INTERVAL
+from videolog.db import db_confirm_removals, db_get_removals, db_update_archives
+from videolog.youtube import yt_confirm_pending_changes, yt_get_comments
+from videolog.youtube import yt_remove_videos_from_playlist
+
+class JobCancelled(Exception):
+    """Job has been cancelled."""
+
+class Job:
+    """Running job.
+
+    Handle passed to job handlers.
+
+    Args:
+        runner (videolog.jobs.JobRunner): Job runner.
+        record (dict): Job record from the job table.
+    """
+
+    def __init__(self, runner, record):
+        self.runner = runner
+        self.id = record['id']
+        self.checkpoint = dict(record['checkpoint'])
+        self.directory = runner.get_directory(self.id)
+
+        with open(os.path.join(self.directory, 'params.json')) as f:
+            self.params = json.load(f)
+
+    def progress(self, done, total, checkpoint = None):
+        """Records job progress.
+
+        Args:
+            done (int): Number of finished steps.
+            total (int): Number of all steps.
+            checkpoint (Optional[dict]): State the job resumes from.
+
+        Raises:
+            JobCancelled: Job has been cancelled.
+        """
+
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+
+        self.runner.update(self.id, done = done, total = total,
+            checkpoint = self.checkpoint
+        )
+
+class JobRunner:
+    """Background job runner.
+
+    Args:
+        workers (Optional[int]): Number of worker threads.
+    """
+
+    def __init__(self, workers = JOB_WORKERS):
+        self.app = None
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.RLock()
+        self._jobs = None
+        self._schedules = None
+        self._saved = 0
+        self._wake = threading.Event()
+        self._scheduling = threading.Lock()
+
+    def get_path(self):
+        """Gets job table directory.
+
+        Returns:
+            str: ``JOBS_PATH`` application configuration value or ``jobs``.
+        """
+
+        return self.app.config.get('JOBS_PATH') or 'jobs'
+
+    def get_directory(self, job_id):
+        """Gets job's directory.
+
+        Args:
+            job_id (str): Job ID.
+
+        Returns:
+            str: Directory with job's parameters and results.
+        """
+
+        return os.path.join(self.get_path(), job_id)
+
+    def _load(self):
+        if self._jobs is None:
+            try:
+                with open(os.path.join(self.get_path(), 'jobs.json')) as f:
+                    self._jobs = json.load(f)
+            except FileNotFoundError:
+                self._jobs = {}
+
+        return self._jobs
+
+    def _save(self):
+        path = os.path.join(self.get_path(), 'jobs.json')
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._jobs, f, indent = 2, sort_keys = True)
+        os.replace(path + '.tmp', path)
+        self._saved = time.monotonic()
+
+    def _load_schedules(self):
+        if self._schedules is None:
+            try:
+                with open(os.path.join(self.get_path(), 'schedules.json')) as f:
+                    self._schedules = json.load(f)
+            except FileNotFoundError:
+                self._schedules = {}
+
+        return self._schedules
+
+    def _save_schedules(self):
+        path = os.path.join(self.get_path(), 'schedules.json')
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._schedules, f, indent = 2, sort_keys = True)
+        os.replace(path + '.tmp', path)
+
+    def _prune(self):
+        jobs = self._load()
+
+        for job_id, record in list(jobs.items()):
+            if record['status'] not in ('queued', 'running') and \
+                    record['updated'] < time.time() - JOB_RETENTION:
+                shutil.rmtree(self.get_directory(job_id), ignore_errors = True)
+                jobs.pop(job_id)
+
+    def _start(self, app = None):
+        if app is None:
+            app = flask.current_app._get_current_object()
+
+        with self._lock:
+            if self.app is None:
+                self.app = app
+                os.makedirs(self.get_path(), exist_ok = True)
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers = self.workers
+                )
+                threading.Thread(target = self._tick, daemon = True).start()
+
+    def _tick(self):
+        while True:
+            self._wake.wait(self._next_run())
+            self._wake.clear()
+            try:
+                self.run_schedules()
+            except Exception:
+                self.app.logger.exception('Scheduling jobs failed')
+
+    def _next_run(self):
+        with self._lock:
+            delays = [
+                (schedule['submitted'] or 0) + schedule['interval'] - time.time()
+                for schedule in self._load_schedules().values()
+            ]
+
+        return max(min(delays + [JOB_SCHEDULE_TICK]), 1)
+
+    def _store_session(self):
+        interface = self.app.session_interface
+        interface.write(self.app, flask.session.sid, flask.session)
+        return flask.session.sid
+
+    def _load_session(self, sid):
+        if sid is None:
+            return None
+        return self.app.session_interface.read(self.app, sid)
+
+    def submit(self, type, params):
+        """Submits job.
+
+        Must be called within request context of the submitting user.
+
+        Args:
+            type (str): Job type (key of ``HANDLERS``).
+            params (dict): Job parameters.
+
+        Returns:
+            dict: Job status.
+        """
+
+        self._start()
+        job_id = uuid.uuid4().hex
+        sid = self._store_session()
+
+        os.makedirs(self.get_directory(job_id))
+        with open(os.path.join(self.get_directory(job_id), 'params.json'), 'w') as f:
+            json.dump(params, f)
+
+        with self._lock:
+            self._prune()
+            self._load()[job_id] = {
+                'id': job_id, 'type': type, 'status': 'queued',
+                'user': flask.session['user']['id'], 'sid': sid,
+                'done': 0, 'total': None, 'checkpoint': {}, 'error': None,
+                'cancel': False, 'created': time.time(), 'updated': time.time()
+            }
+            self._save()
+
+        self._executor.submit(self._run, job_id)
+
+        return self.get(job_id)
+
+    def submit_once(self, type, params):
+        """Submits job unless one is pending.
+
+        Must be called within request context of the submitting user.
+
+        Args:
+            type (str): Job type (key of ``HANDLERS``).
+            params (dict): Job parameters.
+
+        Returns:
+            dict: Status of submitted job or ``None`` if user's job of the
+                type is already queued or running.
+        """
+
+        if any(
+            job['type'] == type and job['status'] in ('queued', 'running')
+            for job in self.list(flask.session['user']['id'])
+        ):
+            return None
+
+        return self.submit(type, params)
+
+    def schedule(self, type, params, interval, start = True):
+        """Schedules job.
+
+        Runs job of given type for the current user every ``interval``
+            seconds (with user's current session, updated by every call).
+            Submits the job right away if it is due.
+
+        Must be called within request context of the submitting user.
+
+        Args:
+            type (str): Job type (key of ``HANDLERS``).
+            params (dict): Job parameters.
+            interval (float): Time (in seconds) between job runs.
+            start (bool): Whether new schedule's first job is due right away
+                (otherwise after ``interval``).
+
+        Returns:
+            dict: Schedule status (see
+                :meth:`~videolog.jobs.JobRunner.get_schedule()`).
+        """
+
+        self._start()
+        user_id = flask.session['user']['id']
+        sid = self._store_session()
+
+        with self._lock:
+            schedule = self._load_schedules().setdefault(user_id + ':' + type, {
+                'user': user_id, 'type': type, 'finished': None,
+                'submitted': None if start else time.time()
+            })
+            schedule.update(params = params, interval = interval, sid = sid)
+            self._save_schedules()
+
+        self._wake.set()
+        if start:
+            self.run_schedules()
+
+        return self.get_schedule(user_id, type)
+
+    def get_schedule(self, user_id, type):
+        """Gets schedule status.
+
+        Args:
+            user_id (str): YouTube user ID.
+            type (str): Job type.
+
+        Returns:
+            dict: Schedule status with time of last submitted (``submitted``)
+                and successfully finished (``finished``) job or ``None`` if
+                job is not scheduled.
+        """
+
+        self._start()
+
+        with self._lock:
+            schedule = self._load_schedules().get(user_id + ':' + type)
+
+            if schedule is None:
+                return None
+
+            return {
+                key: value
+                for key, value in schedule.items()
+                if key not in ('sid', 'params')
+            }
+
+    def unschedule(self, user_id, type = None):
+        """Removes user's schedules.
+
+        Args:
+            user_id (str): YouTube user ID.
+            type (Optional[str]): Job type (all if not given).
+        """
+
+        self._start()
+
+        with self._lock:
+            schedules = self._load_schedules()
+            for key, schedule in list(schedules.items()):
+                if schedule['user'] == user_id and type in (None, schedule['type']):
+                    schedules.pop(key)
+            self._save_schedules()
+
+    def run_schedules(self):
+        """Submits due scheduled jobs.
+
+        Job is due when ``interval`` has passed since the last one was
+            submitted (job still queued or running counts as submitted).
+            Called by runner's thread when the next job is due (and every
+            ``JOB_SCHEDULE_TICK`` seconds at least). Schedules whose session
+            has expired are removed.
+        """
+
+        with self._scheduling:
+            with self._lock:
+                due = [
+                    dict(schedule)
+                    for schedule in self._load_schedules().values()
+                    if schedule['submitted'] is None or
+                        schedule['submitted'] + schedule['interval'] <= time.time()
+                ]
+
+            for schedule in due:
+                key = schedule['user'] + ':' + schedule['type']
+                session = self._load_session(schedule.get('sid'))
+
+                if session is None:
+                    with self._lock:
+                        self._load_schedules().pop(key, None)
+                        self._save_schedules()
+                    continue
+
+                with self.app.test_request_context():
+                    flask.session.update(session)
+                    flask.session.sid = schedule['sid']
+                    self.submit_once(schedule['type'], schedule['params'])
+                    with self._lock:
+                        if key in self._load_schedules():
+                            self._load_schedules()[key]['submitted'] = time.time()
+                            self._save_schedules()
+
+    def resume(self, app):
+        """Resumes interrupted jobs.
+
+        Requeues jobs which were queued or running when the application
+            stopped. Running jobs continue from their last checkpoint.
+
+        Args:
+            app (flask.Flask): Flask application.
+        """
+
+        self._start(app)
+
+        with self._lock:
+            job_ids = [
+                job_id
+                for job_id, record in self._load().items()
+                if record['status'] in ('queued', 'running')
+            ]
+
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+
+    def get(self, job_id, user_id = None):
+        """Gets job status.
+
+        Args:
+            job_id (str): Job ID.
+            user_id (Optional[str]): Owner's YouTube user ID (any if not given).
+
+        Returns:
+            dict: Job status or ``None`` if there is no such job.
+        """
+
+        self._start()
+
+        with self._lock:
+            record = self._load().get(job_id)
+
+            if record is None or (user_id is not None and record['user'] != user_id):
+                return None
+
+            return {
+                key: value
+                for key, value in record.items()
+                if key not in ('sid', 'checkpoint', 'cancel')
+            }
+
+    def list(self, user_id):
+        """Lists user's jobs.
+
+        Args:
+            user_id (str): YouTube user ID.
+
+        Returns:
+            list: Job statuses (newest first).
+        """
+
+        self._start()
+
+        with self._lock:
+            job_ids = [
+                job_id
+                for job_id, record in self._load().items()
+                if record['user'] == user_id
+            ]
+
+        return sorted([self.get(job_id) for job_id in job_ids],
+            key = lambda job: job['created'], reverse = True
+        )
+
+    def cancel(self, job_id):
+        """Cancels job.
+
+        Queued job is cancelled immediately, running one at its next progress
+            update. Cancelled job's results are deleted.
+
+        Args:
+            job_id (str): Job ID.
+        """
+
+        self._start()
+
+        with self._lock:
+            record = self._load().get(job_id)
+
+            if record is not None and record['status'] in ('queued', 'running'):
+                record['cancel'] = True
+                if record['status'] == 'queued':
+                    self._finish(record, 'cancelled')
+
+    def update(self, job_id, **kwargs):
+        """Updates running job's record.
+
+        Job table is written at most every ``JOB_CHECKPOINT_INTERVAL``
+            seconds.
+
+        Args:
+            job_id (str): Job ID.
+            **kwargs: Updated record fields.
+
+        Raises:
+            JobCancelled: Job has been cancelled.
+        """
+
+        with self._lock:
+            record = self._load()[job_id]
+            record.update(kwargs, updated = time.time())
+
+            if record['cancel']:
+                raise JobCancelled()
+
+            if time.monotonic() - self._saved >= JOB_CHECKPOINT_INTERVAL:
+                self._save()
+
+    def _finish(self, record, status, error = None):
+        record.update(status = status, error = error, updated = time.time())
+        schedule = self._load_schedules().get(record['user'] + ':' + record['type'])
+        if schedule is not None and status == 'done':
+            schedule['finished'] = time.time()
+            self._save_schedules()
+        if status == 'cancelled':
+            shutil.rmtree(self.get_directory(record['id']), ignore_errors = True)
+        self._save()
+
+    def _run(self, job_id):
+        with self._lock:
+            record = self._load().get(job_id)
+            if record is None or record['status'] not in ('queued', 'running'):
+                return
+            if record['cancel']:
+                self._finish(record, 'cancelled')
+                return
+            record['status'] = 'running'
+            self._save()
+
+        session = self._load_session(record.get('sid')) or {}
+
+        with self.app.test_request_context():
+            flask.session.update(session)
+            flask.session.sid = record.get('sid') or flask.session.sid
+
+            try:
+                HANDLERS[record['type']](Job(self, record))
+            except JobCancelled:
+                with self._lock:
+                    self._finish(record, 'cancelled')
+            except Exception as e:
+                self.app.logger.exception('Job %s failed', job_id)
+                with self._lock:
+                    self._finish(record, 'failed', str(e))
+            else:
+                with self._lock:
+                    self._finish(record, 'done')
+            finally:
+                # Keep credentials refreshed by the job (unless user has
+                # logged out meanwhile).
+                if dict(flask.session) != session and \
+                        self._load_session(flask.session.sid) is not None:
+                    self.app.session_interface.write(self.app, flask.session.sid,
+                        flask.session
+                    )
+
+def job_confirm_changes(job):
+    """Confirms pending changes with YouTube.
+
+    Checks once whether YouTube lists changes made by the application
+        (subscriptions, archive renames). While some are still pending (until
+        they expire after ``PENDING_CHANGE_TTL``), the job is scheduled to run
+        again every ``PENDING_CHANGE_INTERVAL`` seconds.
+
+    Args:
+        job (videolog.jobs.Job): Running job.
+
+    See also:
+        :func:`~videolog.youtube.yt_confirm_pending_changes()`
+    """
+
+    auth_check()
+
+    if yt_confirm_pending_changes():
+        job.runner.schedule('confirm', {}, PENDING_CHANGE_INTERVAL, start = False)
+    else:
+        job.runner.unschedule(flask.session['user']['id'], 'confirm')
+
+    job.progress(1, 1)
+
+def job_export_comments(job):
+    """Exports archived videos' comments.
+
+    Writes each video's comments to a file in job's directory (by YouTube
+        channel ID). Videos whose comments have been written are skipped when
+        the job resumes.
+
+    Args:
+        job (videolog.jobs.Job): Running job. Parameter ``videos`` is a list of
+            YouTube channel and video ID pairs.
+    """
+
+    videos = job.params['videos']
+
+    for index, (channel_id, video_id) in enumerate(videos):
+        path = os.path.join(job.directory, 'comments', channel_id,
+            video_id + '.comments.json'
+        )
+
+        if not os.path.isfile(path):
+            auth_check()
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(yt_get_comments(video_id), f, indent = 2, sort_keys = True)
+            os.replace(path + '.tmp', path)
+
+        job.progress(index + 1, len(videos))
+
+def job_import_playlist(job):
+    """Imports playlist to archive.
+
+    Already archived videos are skipped, so the job resumes where its last
+        database update left off.
+
+    Args:
+        job (videolog.jobs.Job): Running job. Parameter ``id`` is YouTube
+            playlist ID.
+
+    See also:
+        :func:`~videolog.web.web_archive_import_playlist()`
+    """
+
+    from videolog.web import web_archive_import_playlist
+
+    auth_check()
+    web_archive_import_playlist(job.params['id'], job.progress)
+
+def job_sync_archives(job):
+    """Synchronizes archives with YouTube.
+
+    Stores diff report of the sync in job's directory (``report.json``).
+        Submits removal of videos left queued for removal by failed untrack
+        jobs.
+
+    Args:
+        job (videolog.jobs.Job): Running job.
+
+    See also:
+        :func:`~videolog.db.db_update_archives()`
+    """
+
+    auth_check()
+    report = db_update_archives()
+
+    with open(os.path.join(job.directory, 'report.json'), 'w') as f:
+        json.dump(report, f, indent = 2, sort_keys = True)
+
+    removals = db_get_removals()
+    if removals:
+        job.runner.submit_once('untrack', { 'archives': removals })
+
+    job.progress(1, 1)
+
+def job_untrack_channels(job):
+    """Removes untracked channels' videos from archives.
+
+    Removes videos archive by archive, paging each archive at most once, and
+        confirms their removal in the database. Finished archives are skipped
+        when the job resumes. Job fails if some videos could not be removed;
+        they stay queued for removal and archive sync retries them.
+
+    Args:
+        job (videolog.jobs.Job): Running job. Parameter ``archives`` maps
+            YouTube playlist IDs to playlist item IDs (or ``None``) by
+            YouTube video ID.
+
+    See also:
+        :func:`~videolog.youtube.yt_remove_videos_from_playlist()`,
+        :func:`~videolog.db.db_confirm_removals()`
+    """
+
+    archives = job.params['archives']
+    finished = job.checkpoint.get('archives', [])
+    failed = job.checkpoint.get('failed', 0)
+    total = sum(len(videos) for videos in archives.values())
+    done = sum(len(archives[archive_id]) for archive_id in finished)
+
+    def callback(video_id):
+        nonlocal done
+        done += 1
+        job.progress(done, total)
+
+    for archive_id in sorted(archives):
+        if archive_id not in finished:
+            auth_check()
+            started = done
+            removed = yt_remove_videos_from_playlist(archive_id,
+                archives[archive_id], callback
+            )
+            db_confirm_removals(archive_id, removed)
+            done = started + len(archives[archive_id])
+            failed += len(archives[archive_id]) - len(removed)
+            finished.append(archive_id)
+            job.progress(done, total, { 'archives': finished, 'failed': failed })
+
+    if failed:
+        raise RuntimeError(str(failed) + ' videos could not be removed')
+
+HANDLERS = {
+    'comments': job_export_comments,
+    'confirm': job_confirm_changes,
+    'import': job_import_playlist,
+    'sync': job_sync_archives,
+    'untrack': job_untrack_channels
+}
+
+runner = JobRunner()
@@ -0,0 +1,317 @@
+"""Session module
+
+This module contains server-side session storage. The session cookie holds
+    only a random session ID; session data (credentials, user) are kept in
+    SQLite database or in files. Stored sessions expire after
+    ``PERMANENT_SESSION_LIFETIME`` of inactivity and expired ones are purged
+    periodically.
+
+Storage location is given by ``SESSION_PATH`` application configuration value
+    and defaults to the application's instance folder.
+"""
+
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+import flask.json.tag
+import flask.sessions
+import werkzeug.datastructures
+
+from videolog.constants import SESSION_CLEANUP_INTERVAL
+
+SID_PATTERN = re.compile('^[A-Za-z0-9_-]{43}$')
+
+class ServerSession(werkzeug.datastructures.CallbackDict, flask.sessions.SessionMixin):
+    """Server-side session.
+
+    Args:
+        initial (Optional[dict]): Session data.
+        sid (Optional[str]): Session ID.
+        new (bool): Whether session has just been created.
+        expires (Optional[float]): Stored session expiry (UNIX timestamp).
+    """
+
+    def __init__(self, initial = None, sid = None, new = False, expires = None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+        self.accessed = False
+
+class ServerSessionInterface(flask.sessions.SessionInterface):
+    """Server-side session interface.
+
+    Base class of session storage backends, which implement ``load``,
+        ``store``, ``delete`` and ``cleanup``.
+    """
+
+    serializer = flask.json.tag.TaggedJSONSerializer()
+    default_path = None
+
+    def __init__(self):
+        self._cleaned = time.time()
+        self._cleanup_lock = threading.Lock()
+
+    def get_path(self, app):
+        """Gets storage location.
+
+        Args:
+            app (flask.Flask): Flask application.
+
+        Returns:
+            str: ``SESSION_PATH`` or backend's default within application's
+                instance folder.
+        """
+
+        path = app.config.get('SESSION_PATH')
+
+        if not path:
+            os.makedirs(app.instance_path, exist_ok = True)
+            path = os.path.join(app.instance_path, self.default_path)
+
+        return path
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+
+        if sid and SID_PATTERN.match(sid):
+            stored = self.load(app, sid)
+            if stored is not None and stored[1] > time.time():
+                return ServerSession(
+                    self.serializer.loads(stored[0]), sid = sid, expires = stored[1]
+                )
+
+        return ServerSession(sid = secrets.token_urlsafe(32), new = True)
+
+    def save_session(self, app, session, response):
+        name = app.config['SESSION_COOKIE_NAME']
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.delete(app, session.sid)
+                response.delete_cookie(name, domain = domain, path = path)
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+
+        if (session.modified or session.expires is None or
+                session.expires - now < lifetime / 2):
+            self.store(
+                app, session.sid, self.serializer.dumps(dict(session)),
+                now + lifetime
+            )
+            self._maybe_cleanup(app, now)
+
+        if session.new or (session.modified and session.permanent):
+            response.set_cookie(
+                name, session.sid,
+                expires = self.get_expiration_time(app, session),
+                httponly = self.get_cookie_httponly(app),
+                domain = domain, path = path,
+                secure = self.get_cookie_secure(app),
+                samesite = self.get_cookie_samesite(app)
+            )
+
+    def read(self, app, sid):
+        """Reads stored session data.
+
+        Used outside of requests (e.g. by background jobs running on behalf
+            of the user).
+
+        Args:
+            app (flask.Flask): Flask application.
+            sid (str): Session ID.
+
+        Returns:
+            dict: Session data or ``None`` if session is not stored or has
+                expired.
+        """
+
+        stored = self.load(app, sid)
+        if stored is None or stored[1] <= time.time():
+            return None
+
+        return self.serializer.loads(stored[0])
+
+    def write(self, app, sid, data):
+        """Writes session data.
+
+        Stored session expires after ``PERMANENT_SESSION_LIFETIME``.
+
+        Args:
+            app (flask.Flask): Flask application.
+            sid (str): Session ID.
+            data (dict): Session data.
+        """
+
+        self.store(app, sid, self.serializer.dumps(dict(data)),
+            time.time() + app.permanent_session_lifetime.total_seconds()
+        )
+
+    def _maybe_cleanup(self, app, now):
+        with self._cleanup_lock:
+            if now - self._cleaned < SESSION_CLEANUP_INTERVAL:
+                return
+            self._cleaned = now
+        self.cleanup(app, now)
+
+    def load(self, app, sid):
+        """Loads stored session.
+
+        Args:
+            app (flask.Flask): Flask application.
+            sid (str): Session ID.
+
+        Returns:
+            tuple: Serialized session data and expiry (UNIX timestamp),
+                or ``None``.
+        """
+
+        raise NotImplementedError
+
+    def store(self, app, sid, data, expires):
+        """Stores session.
+
+        Args:
+            app (flask.Flask): Flask application.
+            sid (str): Session ID.
+            data (str): Serialized session data.
+            expires (float): Expiry (UNIX timestamp).
+        """
+
+        raise NotImplementedError
+
+    def delete(self, app, sid):
+        """Deletes stored session.
+
+        Args:
+            app (flask.Flask): Flask application.
+            sid (str): Session ID.
+        """
+
+        raise NotImplementedError
+
+    def cleanup(self, app, now):
+        """Deletes expired sessions.
+
+        Args:
+            app (flask.Flask): Flask application.
+            now (float): Current time (UNIX timestamp).
+        """
+
+        raise NotImplementedError
+
+class SqliteSessionInterface(ServerSessionInterface):
+    """SQLite session storage.
+
+    Sessions are looked up by primary key. Each thread uses its own
+        connection.
+    """
+
+    default_path = 'sessions.sqlite'
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def _connection(self, app):
+        path = os.path.abspath(self.get_path(app))
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None or self._local.path != path:
+            connection = sqlite3.connect(path, timeout = 30)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)'
+            )
+            connection.commit()
+            self._local.connection = connection
+            self._local.path = path
+
+        return connection
+
+    def load(self, app, sid):
+        return self._connection(app).execute(
+            'SELECT data, expires FROM sessions WHERE id = ?', (sid,)
+        ).fetchone()
+
+    def store(self, app, sid, data, expires):
+        with self._connection(app) as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                (sid, data, expires)
+            )
+
+    def delete(self, app, sid):
+        with self._connection(app) as connection:
+            connection.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def cleanup(self, app, now):
+        with self._connection(app) as connection:
+            connection.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+
+class FilesystemSessionInterface(ServerSessionInterface):
+    """Filesystem session storage.
+
+    Each session is stored in its own JSON file named by session ID.
+    """
+
+    default_path = 'sessions'
+
+    def _file(self, app, sid):
+        directory = self.get_path(app)
+        os.makedirs(directory, exist_ok = True)
+        return os.path.join(directory, sid + '.json')
+
+    def load(self, app, sid):
+        try:
+            with open(self._file(app, sid)) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return stored['data'], stored['expires']
+
+    def store(self, app, sid, data, expires):
+        path = self._file(app, sid)
+        temp = path + '.' + str(threading.get_ident()) + '.tmp'
+
+        with open(temp, 'w') as f:
+            json.dump({ 'data': data, 'expires': expires }, f)
+        os.replace(temp, path)
+
+    def delete(self, app, sid):
+        try:
+            os.remove(self._file(app, sid))
+        except OSError:
+            pass
+
+    def cleanup(self, app, now):
+        directory = self.get_path(app)
+
+        for name in os.listdir(directory):
+            sid = name[:-len('.json')]
+            if name.endswith('.json') and SID_PATTERN.match(sid):
+                stored = self.load(app, sid)
+                if stored is None or stored[1] <= now:
+                    self.delete(app, sid)
@@ -0,0 +1,87 @@
+"""Transport module
+
+This module contains process-wide pooled HTTP session shared by
+    authorization and YouTube Data API traffic. Connections are kept alive
+    and reused across requests (and threads), so TLS handshakes are not
+    repeated for every API call.
+"""
+
+import http.cookiejar
+import threading
+
+import httplib2
+import requests
+import requests.adapters
+
+from videolog.constants import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+from videolog.constants import HTTP_TIMEOUT
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Gets shared HTTP session.
+
+    Creates the session on first use. The session's connection pools are
+        bounded by ``HTTP_POOL_CONNECTIONS`` hosts and ``HTTP_POOL_MAXSIZE``
+        connections per host; threads wait for a free connection instead of
+        opening more. The session is shared by all users, so it rejects all
+        cookies.
+
+    Returns:
+        requests.Session: Shared HTTP session.
+    """
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.cookies.set_policy(
+                http.cookiejar.DefaultCookiePolicy(allowed_domains = [])
+            )
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections = HTTP_POOL_CONNECTIONS,
+                pool_maxsize = HTTP_POOL_MAXSIZE,
+                pool_block = True
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+
+        return _session
+
+class PooledHttp(httplib2.Http):
+    """Pooled HTTP transport.
+
+    ``httplib2.Http`` compatible transport (as used by ``googleapiclient``)
+        sending requests through the shared HTTP session.
+
+    Args:
+        timeout (Optional[float]): Request timeout (in seconds).
+    """
+
+    def __init__(self, timeout = HTTP_TIMEOUT):
+        super().__init__(timeout = timeout)
+
+    def request(self, uri, method = 'GET', body = None, headers = None,
+                redirections = httplib2.DEFAULT_MAX_REDIRECTS,
+                connection_type = None, **kwargs):
+        """Implementation of httplib2's Http.request."""
+
+        response = get_session().request(
+            method, uri, data = body, headers = headers,
+            timeout = self.timeout, allow_redirects = redirections > 0
+        )
+
+        info = {
+            key.lower(): value
+            for key, value in response.headers.items()
+            if key.lower() not in ('content-encoding', 'transfer-encoding')
+        }
+        info['status'] = str(response.status_code)
+
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        """Keeps shared connections open."""
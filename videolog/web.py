@@ -3,32 +3,44 @@
 This module contains application's web routes handlers.
 """
 
+import concurrent.futures
+import datetime
+import hashlib
 import io
 import json
-import random
 import re
 import time
 import urllib
-import zipfile
 
 import flask
 
 from videolog.auth import auth_check
-from videolog.db import get_db, update_db
-from videolog.db import db_get_archived, db_get_archives, db_get_tracks
-from videolog.db import db_update_archives
-from videolog.helpers import allowed_file
+from videolog.constants import ARCHIVE_CAPACITY, ARCHIVE_SYNC_INTERVAL
+from videolog.constants import BATCH_MAX_SHARDS, ETAG_MAX_AGE
+from videolog.constants import CHANNEL_FETCH_WORKERS, IMPORT_COMMIT_SIZE
+from videolog.db import get_db, db_apply, db_get_version
+from videolog.db import db_archive_videos, db_get_archive_counts, db_get_archived
+from videolog.db import db_get_archives, db_get_tracks, db_update_archive_counts
+from videolog.db import db_get_channel, db_queue_removals, db_update_tracks
+from videolog.helpers import allowed_file, filter_downloaded, paginate, stream_zip
+from videolog.helpers import parse_duration, shard
+from videolog.index import VideoIndex, sample
+from videolog.jobs import runner
 from videolog.youtube import yt_get_subscriptions
 from videolog.youtube import yt_create_subscription, yt_remove_subscription
 from videolog.youtube import yt_get_channel, yt_get_channel_videos, yt_get_playlist_items
-from videolog.youtube import yt_get_video, yt_get_comments
+from videolog.youtube import yt_get_catalog_version, yt_get_channel_catalog
+from videolog.youtube import yt_get_next_unplayed
+from videolog.youtube import yt_get_video, yt_get_videos, yt_get_comments
 from videolog.youtube import yt_create_playlist, yt_rename_playlist
-from videolog.youtube import yt_insert_to_playlist, yt_remove_from_playlist
+from videolog.youtube import yt_insert_to_playlist, PlaylistFull
 
 def web_index():
     """Index route handler.
 
-    Requests sync of archives with YouTube and redirects to videos list view.
+    Schedules periodic sync of archives with YouTube (as a background job
+        every ``ARCHIVE_SYNC_INTERVAL`` seconds, see application
+        configuration) and redirects to videos list view.
 
     Returns:
         flask.Response: Index page.
@@ -39,7 +51,9 @@ def web_index():
     except Exception as e:
         return flask.redirect(str(e))
 
-    db_update_archives()
+    runner.schedule('sync', {},
+        flask.current_app.config.get('ARCHIVE_SYNC_INTERVAL') or ARCHIVE_SYNC_INTERVAL
+    )
 
     return flask.redirect('videos')
 
@@ -49,7 +63,9 @@ def web_videos(user = None, tracks = [], subs = [], channel = None, video = None
 
     Renders videos list or video detail view.
 
-    Uses GET query parameters ``archived`` and ``played`` for video list filtering.
+    Uses GET query parameters ``archived`` and ``played`` for video list filtering
+        and ``cursor`` for its pagination. Only the first page is rendered,
+        following pages are loaded by :func:`~videolog.api.api_videos()`.
 
     Args:
         user (Optional[dict]): User object (id, name, thumbnail).
@@ -85,12 +101,23 @@ def web_videos(user = None, tracks = [], subs = [], channel = None, video = None
         if video is None:
             archived = flask.request.args.get('archived', 'null')
             played = flask.request.args.get('played', 'null')
-            videos = web_videos_filter(channel, tracks, archived, played)
-
-            return flask.render_template('index.html', user = flask.session['user'],
-                tracks = tracks, channel = channel,
-                videos = videos, archived = archived, played = played
-            )
+            channel_ids = [channel] if channel != 'all' else [
+                track['id'] for track in tracks
+            ]
+
+            def render():
+                videos, cursor = paginate(
+                    web_videos_filter(channel, tracks, archived, played),
+                    web_videos_key, flask.request.args.get('cursor')
+                )
+
+                return flask.render_template('index.html', user = flask.session['user'],
+                    tracks = tracks, channel = channel,
+                    videos = videos, archived = archived, played = played,
+                    cursor = cursor
+                )
+
+            return web_conditional(render, yt_get_catalog_version(channel_ids))
         elif video == 'random-unplayed':
             return web_videos_random_unplayed(channel)
         elif video == 'next-unplayed':
@@ -100,16 +127,54 @@ def web_videos(user = None, tracks = [], subs = [], channel = None, video = None
         elif video == 'random-all':
             return web_videos_random_all(channel)
         else:
-            return flask.render_template('index.html', user = flask.session['user'],
-                tracks = tracks, subs = yt_get_subscriptions(list_only = True),
+            return web_conditional(lambda: flask.render_template('index.html',
+                user = flask.session['user'], tracks = tracks,
+                subs = yt_get_subscriptions(list_only = True),
                 channel = channel, video = yt_get_video(video)
-            )
+            ))
+
+def web_conditional(render, *keys):
+    """Renders view unless client's copy is current.
+
+    Computes entity tag of the view from user's data version (see
+        :func:`~videolog.db.db_get_version()`), requested URL and given keys.
+        Views also show data fetched from YouTube directly, so the tag changes
+        every ``ETAG_MAX_AGE`` seconds too. Requests with matching
+        ``If-None-Match`` header get ``304 Not Modified`` response without
+        rendering the view.
+
+    Args:
+        render (function): Function without arguments rendering the view.
+        *keys: Other data the view depends on (JSON serializable).
+
+    Returns:
+        flask.Response: Rendered view or ``304 Not Modified`` response.
+    """
+
+    etag = hashlib.sha1(json.dumps([
+        db_get_version(), flask.request.full_path,
+        int(time.time() // ETAG_MAX_AGE), keys
+    ]).encode()).hexdigest()
+
+    if etag in flask.request.if_none_match:
+        response = flask.Response(status = 304)
+    else:
+        response = flask.make_response(render())
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+    return response
 
 def web_videos_filter(channel, tracks, archived, played):
     """Filters video list.
 
     First loads all tracked videos or videos from selected channel. Then
-        filters those by 'archived' and/or 'played'.
+        filters those by 'archived' and/or 'played' using bitmaps of played
+        and archived videos built from the database (loaded once per request).
+        Videos come from channels' cached catalogs, missing catalogs are
+        fetched in parallel. Videos are sorted by date published (newest
+        first), see :func:`~videolog.web.web_videos_key()`.
 
     Args:
         channel (str): YouTube channel ID (or 'all').
@@ -119,54 +184,82 @@ def web_videos_filter(channel, tracks, archived, played):
 
     Returns:
         list: Filtered list of videos.
+
+    See also:
+        :class:`~videolog.index.VideoIndex`
     """
 
-    videos = []
+    db = get_db()
+    channels = db.get(flask.session['user']['id'], {})
 
     if channel == 'all':
-        for tracked in tracks:
-            videos.append(yt_get_channel_videos(tracked['id']))
-        videos = [
-            item
-            for sublist in videos
-            for item in sublist
-        ]
+        channel_ids = [tracked['id'] for tracked in tracks]
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers = CHANNEL_FETCH_WORKERS
+        ) as executor:
+            futures = [
+                executor.submit(
+                    flask.copy_current_request_context(yt_get_channel_videos),
+                    channel_id, db
+                )
+                for channel_id in channel_ids
+            ]
+        videos = sorted([
+                item
+                for future in futures
+                for item in future.result()
+            ],
+            key = web_videos_key,
+            reverse = True
+        )
     else:
-        videos = yt_get_channel_videos(channel)
-
-    if archived == 'true':
-        videos = [
-            video
-            for video in videos
-            if video['archived'] is not None
-        ]
-    elif archived == 'false':
-        videos = [
-            video
-            for video in videos
-            if video['archived'] is None
-        ]
-
-    if played == 'true':
-        videos = [
-            video
-            for video in videos
-            if video['played'] is not None
-        ]
-    elif played == 'false':
-        videos = [
-            video
-            for video in videos
-            if video['played'] is None
-        ]
-
-    return videos
+        channel_ids = [channel]
+        videos = sorted(yt_get_channel_videos(channel, db),
+            key = web_videos_key,
+            reverse = True
+        )
+
+    if archived not in ('true', 'false') and played not in ('true', 'false'):
+        return videos
+
+    index = VideoIndex(
+        video['snippet']['resourceId']['videoId']
+        for video in videos
+    )
+    selected = index.filter(index.bitmap(
+        video_id
+        for channel_id in channel_ids
+        for video_id in channels.get(channel_id, {}).get('archived', {})
+    ), archived) & index.filter(index.bitmap(
+        video_id
+        for channel_id in channel_ids
+        for video_id in channels.get(channel_id, {}).get('played', {})
+    ), played)
+
+    return index.select(videos, selected)
+
+def web_videos_key(video):
+    """Gets video sort key.
+
+    Key is unique and orders videos by date published, so it can be used as
+        video list pagination cursor.
+
+    Args:
+        video (dict): Video (playlist item) resource.
+
+    Returns:
+        str: Date published and video ID.
+    """
+
+    return video['snippet']['publishedAt'] + ' ' + \
+        video['snippet']['resourceId']['videoId']
 
 def web_videos_random_unplayed(channel):
     """Play random unplayed video.
 
-    Chooses random unplayed video from selected channel and redirects to its
-        detail page view.
+    Chooses random unplayed video from selected channel's catalog and
+        redirects to its detail page view.
 
     Args:
         channel (str): YouTube channel ID.
@@ -175,12 +268,12 @@ def web_videos_random_unplayed(channel):
         flask.Response: Selected video detail view.
     """
 
+    played = db_get_channel(channel)['played']
+
     try:
-        choice = random.choice([
-            video['snippet']['resourceId']['videoId']
-            for video in yt_get_channel_videos(channel)
-            if video['played'] is None
-        ])
+        choice = sample(yt_get_channel_catalog(channel).ids,
+            lambda video_id: video_id not in played
+        )
     except IndexError:
         return flask.redirect(flask.url_for('videos',
             channel = channel
@@ -201,28 +294,27 @@ def web_videos_next_unplayed(channel):
 
     Returns:
         flask.Response: Selected video detail view.
+
+    See also:
+        :func:`~videolog.youtube.yt_get_next_unplayed()`
     """
 
-    try:
-        choice = sorted([
-            video
-            for video in yt_get_channel_videos(channel)
-            if video['played'] is None
-        ], key = lambda video: video['snippet']['publishedAt'])[0]
-    except IndexError:
+    choice = yt_get_next_unplayed(channel, db_get_channel(channel)['played'])
+
+    if choice is None:
         return flask.redirect(flask.url_for('videos',
             channel = channel
         ))
 
     return flask.redirect(flask.url_for('videos',
-        channel = channel, video = choice['snippet']['resourceId']['videoId']
+        channel = channel, video = choice
     ))
 
 def web_videos_random_archived(channel):
     """Play random archived video.
 
-    Chooses random archived video from selected channel and redirects to its
-        detail page view.
+    Chooses random archived video (known in selected channel's catalog) and
+        redirects to its detail page view.
 
     Args:
         channel (str): YouTube channel ID.
@@ -231,12 +323,12 @@ def web_videos_random_archived(channel):
         flask.Response: Selected video detail view.
     """
 
+    catalog = yt_get_channel_catalog(channel)
+
     try:
-        choice = random.choice([
-            video['snippet']['resourceId']['videoId']
-            for video in yt_get_channel_videos(channel)
-            if video['archived'] is not None
-        ])
+        choice = sample(list(db_get_channel(channel)['archived']),
+            lambda video_id: video_id in catalog
+        )
     except IndexError:
         return flask.redirect(flask.url_for('videos',
             channel = channel
@@ -249,8 +341,8 @@ def web_videos_random_archived(channel):
 def web_videos_random_all(channel):
     """Play random video.
 
-    Chooses random video from selected channel and redirects to its detail
-        page view.
+    Chooses random video from selected channel's catalog and redirects to its
+        detail page view.
 
     Args:
         channel (str): YouTube channel ID.
@@ -260,10 +352,7 @@ def web_videos_random_all(channel):
     """
 
     try:
-        choice = random.choice([
-            video['snippet']['resourceId']['videoId']
-            for video in yt_get_channel_videos(channel)
-        ])
+        choice = sample(yt_get_channel_catalog(channel).ids)
     except IndexError:
         return flask.redirect(flask.url_for('videos',
             channel = channel
@@ -298,10 +387,11 @@ def web_channels(user = None, subs = None, tracks = [], tracking = False, error
     if 'channels_query_error' in flask.session:
         error = flask.session.pop('channels_query_error')
 
-    return flask.render_template('channels.html', user = flask.session['user'],
+    return web_conditional(lambda: flask.render_template('channels.html',
+        user = flask.session['user'],
         subs = yt_get_subscriptions(list_only = True),
         tracks = db_get_tracks(sort_by_played = False),
-        tracking = tracking, error = error)
+        tracking = tracking, error = error), error)
 
 def web_channels_track(user = None, subs = [], tracks = [], tracking = True, error = False):
     """Channels track route handler.
@@ -325,10 +415,11 @@ def web_channels_track(user = None, subs = [], tracks = [], tracking = True, err
     except Exception as e:
         return flask.redirect(str(e))
 
-    return flask.render_template('channels.html', user = flask.session['user'],
+    return web_conditional(lambda: flask.render_template('channels.html',
+        user = flask.session['user'],
         subs = yt_get_subscriptions(),
         tracks = db_get_tracks(sort_by_played = None),
-        tracking = tracking, error = error)
+        tracking = tracking, error = error), error)
 
 def web_channels_update():
     """Handles channel tracking.
@@ -369,29 +460,38 @@ def web_channels_update():
 def web_channels_update_tracks(tracks):
     """Handles channel tracking using connected account.
 
-    Tracks or untracks YouTube channels using connected account.
+    Tracks or untracks YouTube channels using connected account. Archived
+        videos of untracked channels are queued for removal and removed from
+        archives by a background job.
 
     Args:
         tracks (string): URL encoded JSON data (``channel_id``: ``tracked?``).
     """
 
-    db = get_db()
     user_id = flask.session['user']['id']
-
-    for channel_id, tracked in json.loads(urllib.parse.unquote(tracks)).items():
-        if tracked:
-            if channel_id not in db[user_id]:
-                db[user_id][channel_id] = {
-                    'played': {}, 'archived': {}
-                }
-        else:
-            if channel_id in db[user_id]:
-                channel = db[user_id][channel_id]
-                for video_id, archive_id in channel['archived'].items():
-                    yt_remove_from_playlist(video_id, archive_id)
-                db[user_id].pop(channel_id)
-
-    update_db(db)
+    archives = {}
+
+    def update(db):
+        for channel_id, tracked in json.loads(urllib.parse.unquote(tracks)).items():
+            if tracked:
+                if channel_id not in db[user_id]:
+                    db[user_id][channel_id] = {
+                        'played': {}, 'archived': {}
+                    }
+            else:
+                if channel_id in db[user_id]:
+                    channel = db[user_id].pop(channel_id)
+                    items = channel.get('archived_items', {})
+                    for video_id, archive_id in channel['archived'].items():
+                        archives.setdefault(archive_id, {})[video_id] = items.get(video_id)
+
+        db_queue_removals(db, archives)
+
+    db_apply(update)
+    db_update_tracks()
+
+    if archives:
+        runner.submit('untrack', { 'archives': archives })
 
 def web_channels_update_query(query):
     """Handles channel tracking by user query.
@@ -403,7 +503,6 @@ def web_channels_update_query(query):
             ``value``: ``value``).
     """
 
-    db = get_db()
     query_data = json.loads(urllib.parse.unquote(query))
     user_id = flask.session['user']['id']
 
@@ -413,36 +512,30 @@ def web_channels_update_query(query):
             user = re.search('^.+\/user\/([^\/]+)(\/.*|$)', url,
                 re.IGNORECASE).group(1)
             channel = yt_get_channel('snippet', user = user)
-            db[user_id][channel['id']] = {
-                'played': {}, 'archived': {}
-            }
         elif '/channel/' in url:
             channel_id = url.rsplit('/', 1)[-1]
             channel = yt_get_channel('snippet', channel_id = channel_id)
-            db[user_id][channel['id']] = {
-                'played': {}, 'archived': {}
-            }
         else:
             raise
     elif query_data['type'] == 'user':
         channel = yt_get_channel('snippet', user = query_data['value'])
-        db[user_id][channel['id']] = {
-            'played': {}, 'archived': {}
-        }
     elif query_data['type'] == 'id':
         channel = yt_get_channel('snippet', id = query_data['value'])
+
+    def update(db):
         db[user_id][channel['id']] = {
             'played': {}, 'archived': {}
         }
 
-    update_db(db)
+    db_apply(update)
+    db_update_tracks()
 
 def web_channels_subscriptions():
     """Handles channel subscriptions.
 
     Subscribes user to or unsubscribes user from given YouTube channel,
-        then redirects to given page. Time delay is needed, because of
-        YouTube Data API delays.
+        then redirects to given page. YouTube Data API lists the change with
+        a delay, so it is overlaid until confirmed by a background job.
 
     Uses GET query parameter ``update`` (URL encoded JSON data). Its data
         contain ``id`` (YouTube subscription ID), ``subscribe`` (flag whether
@@ -463,11 +556,12 @@ def web_channels_subscriptions():
         update_data = json.loads(urllib.parse.unquote(update))
 
         if update_data['subscribe']:
-            yt_create_subscription(update_data['id'])
-            time.sleep(10)
+            changed = yt_create_subscription(update_data['id'])
         else:
-            yt_remove_subscription(update_data['id'])
-            time.sleep(10)
+            changed = yt_remove_subscription(update_data['id'])
+
+        if changed:
+            runner.submit_once('confirm', {})
 
         return flask.redirect(update_data['redirect'])
 
@@ -476,7 +570,8 @@ def web_channels_subscriptions():
 def web_archive():
     """Archive route handler.
 
-    Renders archive management view.
+    Renders archive management view including time of the last sync of
+        archives with YouTube.
 
     Returns:
         flask.Response: Archive management view.
@@ -487,8 +582,16 @@ def web_archive():
     except Exception as e:
         return flask.redirect(str(e))
 
-    return flask.render_template('archive.html', user = flask.session['user'],
-        archives = db_get_archives())
+    schedule = runner.get_schedule(flask.session['user']['id'], 'sync')
+    synced = None
+    if schedule is not None and schedule['finished'] is not None:
+        synced = datetime.datetime.fromtimestamp(
+            schedule['finished']
+        ).strftime('%Y-%m-%d %H:%M')
+
+    return web_conditional(lambda: flask.render_template('archive.html',
+        user = flask.session['user'], archives = db_get_archives(),
+        synced = synced), synced)
 
 def web_archive_insert_rename(type = None, id = None):
     """Handles archive management.
@@ -534,33 +637,14 @@ def web_archive_insert_video(id):
 
     Args:
         id (str): YouTube video ID.
-    """
-
-    db = get_db()
-    user_id = flask.session['user']['id']
-
-    video_id = id
-    video = yt_get_video(video_id)
-    channel_id = video['snippet']['channelId']
-
-    archive = None
-    for playlist in db_get_archives():
-        if playlist['contentDetails']['itemCount'] < 5000:
-            archive = playlist
-            break
 
-    if archive is None:
-        archive = yt_create_playlist()
+    See also:
+        :func:`~videolog.web.web_archive_import_videos()`
+    """
 
-    if yt_insert_to_playlist(video_id, archive['id']):
-        if channel_id not in db[user_id]:
-            db[user_id][channel_id] = {
-                'played': {}, 'archived': {}
-            }
-        db[user_id][channel_id]['archived'][video_id] = archive['id']
-        update_db(db)
+    web_archive_import_videos([id])
 
-def web_archive_import_playlist(id):
+def web_archive_import_playlist(id, progress = None):
     """Imports playlist to archive.
 
     Imports entire playlist to the first available archive. Creates new archive
@@ -568,38 +652,150 @@ def web_archive_import_playlist(id):
 
     Args:
         id (str): YouTube playlist ID.
+        progress (Optional[function]): Progress report callback.
+
+    Raises:
+        RuntimeError: Playlist could not be fetched.
+
+    See also:
+        :func:`~videolog.web.web_archive_import_videos()`
     """
 
-    db = get_db()
-    user_id = flask.session['user']['id']
+    video_ids = yt_get_playlist_items(id, video_ids_only = True)
+    if video_ids is None:
+        raise RuntimeError('Playlist could not be fetched')
+
+    web_archive_import_videos(video_ids, progress)
+
+def web_archive_import_videos(video_ids, progress = None):
+    """Imports videos to archive.
+
+    Inserts videos (skipping already archived ones) to the first available
+        archives, creating new archives if all are full. Videos' channels
+        are resolved in bulk and archives' capacity is tracked locally, so
+        each video costs a single insert request. The database is updated in
+        chunks of ``IMPORT_COMMIT_SIZE`` videos.
+
+    Args:
+        video_ids (list): YouTube video IDs.
+        progress (Optional[function]): Called with number of processed and
+            all videos after each database update. Everything reported is
+            recorded in the database.
+
+    Raises:
+        RuntimeError: All archives are full and new one could not be created.
+            Videos imported so far are recorded (and reported).
+    """
+
+    archived = db_get_archived()
+    video_ids = [
+        video_id
+        for video_id in dict.fromkeys(video_ids)
+        if video_id not in archived
+    ]
+    channels = {
+        video_id: video['snippet']['channelId']
+        for video_id, video in yt_get_videos(video_ids, part = 'snippet').items()
+    }
+    counts = db_get_archive_counts()
+    archived = []
+
+    for index, video_id in enumerate(video_ids):
+        if video_id in channels:
+            archive_id, item_id = web_archive_insert(video_id, counts)
+            if archive_id is None:
+                db_archive_videos(archived)
+                if progress is not None:
+                    progress(index, len(video_ids))
+                raise RuntimeError('Archive could not be created')
+
+            if item_id:
+                archived.append((channels[video_id], video_id, archive_id, item_id))
+
+        if len(archived) >= IMPORT_COMMIT_SIZE:
+            db_archive_videos(archived)
+            archived = []
+            if progress is not None:
+                progress(index + 1, len(video_ids))
+
+    db_archive_videos(archived)
+    if progress is not None:
+        progress(len(video_ids), len(video_ids))
+
+def web_archive_insert(video_id, counts):
+    """Inserts video to archive.
 
-    for item in yt_get_playlist_items(id):
-        video_id = item['snippet']['resourceId']['videoId']
-        video = yt_get_video(video_id)
-        channel_id = video['snippet']['channelId']
+    Inserts video to archive chosen by
+        :func:`~videolog.web.web_archive_target()`. If YouTube reports the
+        archive full (its items are undercounted), it is recorded as full and
+        the next one is tried.
 
-        archive = None
-        for playlist in db_get_archives():
-            if playlist['contentDetails']['itemCount'] < 5000:
-                archive = playlist
-                break
+    Args:
+        video_id (str): YouTube video ID.
+        counts (dict): Archives' item counts by YouTube playlist ID (see
+            :func:`~videolog.db.db_get_archive_counts()`). Updated by the
+            insert.
+
+    Returns:
+        tuple: YouTube playlist ID (``None`` if archive could not be created)
+            and inserted playlist item ID (``None`` if insert failed).
+    """
+
+    while True:
+        archive_id = web_archive_target(counts)
+        if archive_id is None:
+            return None, None
+
+        try:
+            item_id = yt_insert_to_playlist(video_id, archive_id)
+        except PlaylistFull:
+            counts[archive_id] = ARCHIVE_CAPACITY
+            db_update_archive_counts({ archive_id: ARCHIVE_CAPACITY })
+            continue
+
+        if item_id:
+            counts[archive_id] += 1
 
-        if archive is None:
-            archive = yt_create_playlist()
+        return archive_id, item_id
+
+def web_archive_target(counts):
+    """Chooses archive to insert to.
+
+    Chooses the fullest archive which is not full yet, so archives are filled
+        one after another. Creates new archive if all are full.
+
+    Args:
+        counts (dict): Archives' item counts by YouTube playlist ID (see
+            :func:`~videolog.db.db_get_archive_counts()`). Created archive is
+            added (and stored in the database).
+
+    Returns:
+        str: YouTube playlist ID or ``None`` if archive could not be created.
+    """
 
-        if yt_insert_to_playlist(video_id, archive['id']):
-            if channel_id not in db[user_id]:
-                db[user_id][channel_id] = {
-                    'played': {}, 'archived': {}
-                }
-            db[user_id][channel_id]['archived'][video_id] = archive['id']
-            update_db(db)
+    available = [
+        (count, archive_id)
+        for archive_id, count in counts.items()
+        if count < ARCHIVE_CAPACITY
+    ]
+
+    if available:
+        return max(available)[1]
+
+    playlist = yt_create_playlist()
+    if not playlist:
+        return None
+
+    counts[playlist['id']] = 0
+    db_update_archive_counts({ playlist['id']: 0 })
+
+    return playlist['id']
 
 def web_archive_rename(id, name):
     """Renames archive.
 
-    Renames given archive. Time delay is needed because of YouTube Data API
-        delays.
+    Renames given archive. YouTube Data API lists the new name with a delay,
+        so it is overlaid until confirmed by a background job.
 
     Args:
         id (str): YouTube playlist ID.
@@ -608,7 +804,7 @@ def web_archive_rename(id, name):
 
     if name is not None:
         yt_rename_playlist(id, name)
-        time.sleep(5)
+        runner.submit_once('confirm', {})
 
 def web_archive_batch():
     """Generates youtube-dl batch file.
@@ -617,8 +813,15 @@ def web_archive_batch():
         uses uploaded youtube-dl ``archive`` file to only include videos not
         yet downloaded.
 
+    Uses POST form values ``shards`` (number of batch files for parallel
+        downloaders), ``balance`` (``count`` or ``duration`` of videos) and
+        ``group`` (``true`` to keep channel's videos in one shard). Multiple
+        shards are returned as ZIP archive with a directory per shard holding
+        ``batch.txt`` and ``config.txt`` (from ``ytdl-*`` form values, see
+        :func:`~videolog.web.web_archive_config()`).
+
     Returns:
-        flask.Response: youtube-dl batch file.
+        flask.Response: youtube-dl batch file or ZIP archive of shards.
     """
 
     try:
@@ -626,37 +829,61 @@ def web_archive_batch():
     except Exception as e:
         return flask.redirect(str(e))
 
-    batch = set()
-
-    if 'archiveFile' in flask.request.files:
-        file = flask.request.files['archiveFile']
-        if file.filename != '':
-            if file and allowed_file(file.filename):
-                downloaded = [
-                    line.decode('utf-8').rstrip('\n').split(' ')[1]
-                    for line in file.readlines()
-                ]
-                archived = db_get_archived()
-
-                for video_id in archived:
-                    if video_id not in downloaded:
-                        batch.add(video_id)
-    else:
-        archived = db_get_archived()
-
-        for video_id in archived:
-            batch.add(video_id)
+    archived = {
+        video_id: channel_id
+        for channel_id, channel in get_db()[flask.session['user']['id']].items()
+        for video_id in channel['archived']
+    }
+    batch = set(archived)
+    file = flask.request.files.get('archiveFile')
+
+    if file and file.filename != '':
+        if allowed_file(file.filename):
+            batch = filter_downloaded(file.stream, batch)
+        else:
+            batch = set()
 
-    return flask.Response('\n'.join(list(batch)),
-        mimetype = 'text/plain',
-        headers = { 'Content-Disposition': 'attachment;filename=batch.txt' }
+    try:
+        shards = min(max(int(flask.request.form.get('shards', '1')), 1), BATCH_MAX_SHARDS)
+    except ValueError:
+        shards = 1
+
+    if shards == 1:
+        return flask.Response('\n'.join(sorted(batch)),
+            mimetype = 'text/plain',
+            headers = { 'Content-Disposition': 'attachment;filename=batch.txt' }
+        )
+
+    weight = None
+    if flask.request.form.get('balance') == 'duration':
+        videos = yt_get_videos(batch)
+        weight = lambda video_id: parse_duration(
+            videos.get(video_id, {}).get('contentDetails', {}).get('duration')
+        )
+
+    group = None
+    if flask.request.form.get('group') == 'true':
+        group = lambda video_id: archived[video_id]
+
+    config = web_archive_config_text(flask.request.form)
+    files = []
+
+    for index, items in enumerate(shard(batch, shards, weight, group)):
+        directory = 'shard-{:02d}/'.format(index + 1)
+        files.append((directory + 'batch.txt', '\n'.join(items)))
+        files.append((directory + 'config.txt', config))
+
+    return flask.Response(stream_zip(files),
+        mimetype = 'application/zip',
+        headers = { 'Content-Disposition': 'attachment;filename=batch.zip' }
     )
 
 def web_archive_comments():
     """Downloads comments.
 
     Downloads archived videos' comments. Places them to subdirectories by
-        YouTube channel ID and generates ZIP archive.
+        YouTube channel ID and streams ZIP archive, each video's comments as
+        soon as they are fetched.
 
     Returns:
         flask.Response: ZIP archive of archived videos' comments.
@@ -667,22 +894,22 @@ def web_archive_comments():
     except Exception as e:
         return flask.redirect(str(e))
 
-    archive_comments = io.BytesIO()
-
-    with zipfile.ZipFile(archive_comments, 'w') as zf:
-        for video_id in db_get_archived():
-            video = yt_get_video(video_id)
-            comments = yt_get_comments(video_id)
-
-            zf.writestr(
-                video['snippet']['channelId'] + '/' + video_id + '.comments.json',
-                json.dumps(comments, indent = 2, sort_keys = True)
-              )
+    archived = [
+        (channel_id, video_id)
+        for channel_id, channel in get_db()[flask.session['user']['id']].items()
+        for video_id in channel['archived']
+    ]
+
+    def files():
+        for channel_id, video_id in archived:
+            yield (
+                channel_id + '/' + video_id + '.comments.json',
+                json.dumps(yt_get_comments(video_id), indent = 2, sort_keys = True)
+            )
 
-    archive_comments.seek(0)
-    return flask.send_file(
-        archive_comments, mimetype = 'application/zip',
-        as_attachment = True, attachment_filename = 'archive_comments.zip'
+    return flask.Response(flask.stream_with_context(stream_zip(files())),
+        mimetype = 'application/zip',
+        headers = { 'Content-Disposition': 'attachment;filename=archive_comments.zip' }
     )
 
 def web_archive_config():
@@ -693,6 +920,9 @@ def web_archive_config():
 
     Returns:
         flask.Response: youtube-dl configuration file.
+
+    See also:
+        :func:`~videolog.web.web_archive_config_text()`
     """
 
     try:
@@ -700,41 +930,52 @@ def web_archive_config():
     except Exception as e:
         return flask.redirect(str(e))
 
-    socket_timeout = flask.request.args.get('ytdl-socket-timeout', '120')
-    retries = flask.request.args.get('ytdl-retries', 'infinite')
-    output = flask.request.args.get('ytdl-output', '%(uploader_id)s/%(id)s.%(ext)s')
-    overwrites = flask.request.args.get('ytdl-overwrites', 'false') == 'true'
-    info_json = flask.request.args.get('ytdl-info-json', 'true') == 'true'
-    thumbnail = flask.request.args.get('ytdl-thumbnail', 'true') == 'true'
-    format = flask.request.args.get('ytdl-format', 'bestvideo[vcodec^=vp]' +
+    return flask.Response(web_archive_config_text(flask.request.args),
+        mimetype = 'text/plain',
+        headers = { 'Content-Disposition': 'attachment;filename=config.txt' }
+    )
+
+def web_archive_config_text(values):
+    """Builds youtube-dl configuration.
+
+    Args:
+        values (werkzeug.datastructures.MultiDict): Query parameters or form
+            values (``ytdl-*``).
+
+    Returns:
+        str: youtube-dl configuration file contents.
+    """
+
+    socket_timeout = values.get('ytdl-socket-timeout', '120')
+    retries = values.get('ytdl-retries', 'infinite')
+    output = values.get('ytdl-output', '%(uploader_id)s/%(id)s.%(ext)s')
+    overwrites = values.get('ytdl-overwrites', 'false') == 'true'
+    info_json = values.get('ytdl-info-json', 'true') == 'true'
+    thumbnail = values.get('ytdl-thumbnail', 'true') == 'true'
+    format = values.get('ytdl-format', 'bestvideo[vcodec^=vp]' +
              '+bestaudio[acodec=opus]/bestvideo+bestaudio[acodec=opus]' +
              '/bestvideo+bestaudio/best')
-    merge_format = flask.request.args.get('ytdl-merge-format', 'mkv')
-    all_subs = flask.request.args.get('ytdl-all-subs', 'true') == 'true'
-    sub_format = flask.request.args.get('ytdl-sub-format', 'srt/best')
-    convert_subs = flask.request.args.get('ytdl-convert-subs', 'srt')
+    merge_format = values.get('ytdl-merge-format', 'mkv')
+    all_subs = values.get('ytdl-all-subs', 'true') == 'true'
+    sub_format = values.get('ytdl-sub-format', 'srt/best')
+    convert_subs = values.get('ytdl-convert-subs', 'srt')
 
-    config = io.BytesIO()
+    config = io.StringIO()
 
-    config.write(('--socket-timeout ' + socket_timeout + '\n').encode('utf-8'))
-    config.write(('--retries ' + retries + '\n').encode('utf-8'))
-    config.write(('--output ' + output + '\n').encode('utf-8'))
+    config.write('--socket-timeout ' + socket_timeout + '\n')
+    config.write('--retries ' + retries + '\n')
+    config.write('--output ' + output + '\n')
     if not overwrites:
-        config.write('--no-overwrites\n'.encode('utf-8'))
+        config.write('--no-overwrites\n')
     if info_json:
-        config.write('--write-info-json\n'.encode('utf-8'))
+        config.write('--write-info-json\n')
     if thumbnail:
-        config.write('--write-thumbnail\n'.encode('utf-8'))
-    config.write(('--format ' + format + '\n').encode('utf-8'))
-    config.write(('--merge-output-format ' + merge_format + '\n').encode('utf-8'))
+        config.write('--write-thumbnail\n')
+    config.write('--format ' + format + '\n')
+    config.write('--merge-output-format ' + merge_format + '\n')
     if all_subs:
-        config.write('--all-subs\n'.encode('utf-8'))
-    config.write(('--sub-format ' + sub_format + '\n').encode('utf-8'))
-    config.write(('--convert-subs ' + convert_subs + '\n').encode('utf-8'))
-
-    config.seek(0)
+        config.write('--all-subs\n')
+    config.write('--sub-format ' + sub_format + '\n')
+    config.write('--convert-subs ' + convert_subs + '\n')
 
-    return flask.Response(config,
-        mimetype = 'text/plain',
-        headers = { 'Content-Disposition': 'attachment;filename=config.txt' }
-    )
+    return config.getvalue()
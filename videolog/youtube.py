@@ -4,31 +4,80 @@ This module contains application's methods for communicating with
     YouTube Data API.
 """
 
+import hashlib
+import json
+import time
+
 import flask
 import google.oauth2.credentials
+import google_auth_httplib2
 import googleapiclient.discovery
 import googleapiclient.errors
 
-from videolog.constants import API_SERVICE_NAME, API_VERSION
-from videolog.db import get_db, db_get_archives, db_get_video
+from videolog.cache import Cache
+from videolog.cassette import CassetteHttp, get_cassette
+from videolog.constants import API_ROOT_URL, API_SERVICE_NAME, API_VERSION
+from videolog.constants import CHANNEL_CATALOG_TTL
+from videolog.constants import DISCOVERY_PATH, PENDING_CHANGE_TTL
+from videolog.constants import PLAYLISTS_CACHE_TTL
+from videolog.db import get_db, db_apply, db_get_archive_counts, db_get_meta
+from videolog.db import db_get_video, db_update_version
 from videolog.helpers import build_resource
+from videolog.index import ChannelCatalog
+from videolog.transport import PooledHttp
+
+_catalog_cache = Cache(ttl = CHANNEL_CATALOG_TTL)
+_catalog_stamps = Cache()
+_next_unplayed_cache = Cache(ttl = CHANNEL_CATALOG_TTL)
+_playlists_cache = Cache(ttl = PLAYLISTS_CACHE_TTL)
+
+class PlaylistFull(Exception):
+    """YouTube playlist has reached maximum number of videos."""
 
 def yt_get_client():
     """Gets YouTube API client.
 
     Obtains client for communicating with YouTube Data API. Uses authenticated
-        user's credentials.
+        user's credentials and the shared pooled HTTP session. Talks to the
+        API at ``API_ROOT_URL`` application configuration value if set.
+        Records or replays API traffic to or from user's cassette if
+        ``CASSETTE_MODE`` is set.
 
     Returns:
         googleapiclient.discovery.Resource: YouTube Data API client.
+
+    See also:
+        :mod:`videolog.cassette`,
+        :mod:`videolog.transport`
     """
 
+    config = flask.current_app.config
     credentials = google.oauth2.credentials.Credentials(
         **flask.session['credentials']
     )
+    kwargs = {}
+
+    root_url = config.get('API_ROOT_URL', API_ROOT_URL)
+    if root_url != API_ROOT_URL:
+        kwargs['discoveryServiceUrl'] = root_url + DISCOVERY_PATH
+        kwargs['cache_discovery'] = False
+
+    http = PooledHttp()
+
+    if config.get('CASSETTE_MODE') is not None:
+        cassette = get_cassette(
+            config.get('CASSETTE_DIR', 'cassettes'),
+            flask.session.get('user', {}).get('id')
+        )
+        http = CassetteHttp(
+            cassette, config['CASSETTE_MODE'],
+            timing = config.get('CASSETTE_TIMING', True), http = http
+        )
+
+    kwargs['http'] = google_auth_httplib2.AuthorizedHttp(credentials, http = http)
 
     return googleapiclient.discovery.build(
-        API_SERVICE_NAME, API_VERSION, credentials = credentials
+        API_SERVICE_NAME, API_VERSION, **kwargs
     )
 
 def yt_get_user():
@@ -57,17 +106,14 @@ def yt_get_user():
             'id': ''
         }
 
-def yt_get_subscriptions(list_only = False):
-    """Gets YouTube user's subscriptions.
+def yt_get_subscription_items():
+    """Gets YouTube user's subscription resources.
 
-    Gets YouTube channels to which is authenticated user subscribed, sorted
-        alphabetically. Can obtain list (channel and subscription IDs) only.
-
-    Args:
-        list_only (bool): Whether to get list only.
+    Lists authenticated user's subscriptions as YouTube lists them (without
+        pending changes), sorted alphabetically.
 
     Returns:
-        dict or list: Subscribed YouTube channels.
+        list: YouTube subscriptions or ``None`` if they could not be listed.
     """
 
     client = yt_get_client()
@@ -75,39 +121,86 @@ def yt_get_subscriptions(list_only = False):
         'part': 'snippet', 'mine': True,
         'order': 'alphabetical', 'maxResults': 50
     }
-    items = {} if list_only else []
+    items = []
 
     try:
         while True:
             response = client.subscriptions().list(**kwargs).execute()
-
-            for item in response['items']:
-                if list_only:
-                    items[item['snippet']['resourceId']['channelId']] = item['id']
-                else:
-                    items.append(item)
+            items.extend(response['items'])
 
             if 'nextPageToken' not in response:
                 return items
             else:
                 kwargs['pageToken'] = response['nextPageToken']
     except googleapiclient.errors.Error:
+        return None
+
+def yt_get_subscriptions(list_only = False, pending = True):
+    """Gets YouTube user's subscriptions.
+
+    Gets YouTube channels to which is authenticated user subscribed, sorted
+        alphabetically. Can obtain list (channel and subscription IDs) only.
+        Subscriptions made or removed by the application are overlaid until
+        YouTube confirms them (see
+        :func:`~videolog.youtube.yt_get_pending_changes()`).
+
+    Args:
+        list_only (bool): Whether to get list only.
+        pending (bool): Whether to overlay pending changes.
+
+    Returns:
+        dict or list: Subscribed YouTube channels.
+    """
+
+    items = yt_get_subscription_items()
+    if items is None:
         return {} if list_only else []
 
+    if pending:
+        changes = yt_get_pending_changes('subscription')
+        channel_ids = set([
+            item['snippet']['resourceId']['channelId'] for item in items
+        ])
+        added = [
+            item
+            for item in changes.values()
+            if item is not None and
+                item['snippet']['resourceId']['channelId'] not in channel_ids
+        ]
+        items = [
+            item
+            for item in items
+            if changes.get(item['id'], True) is not None
+        ]
+
+        if added:
+            items.extend(added)
+            items.sort(key = lambda item: item['snippet'].get('title', '').lower())
+
+    if list_only:
+        return {
+            item['snippet']['resourceId']['channelId']: item['id']
+            for item in items
+        }
+    else:
+        return items
+
 def yt_create_subscription(channel_id):
     """Creates YouTube subscription.
 
-    Subscribes authenticated user to given YouTube channel.
+    Subscribes authenticated user to given YouTube channel. The subscription
+        is pending until YouTube lists it.
 
     Args:
         channel_id (str): YouTube channel ID.
 
     Returns:
-        bool: Whether operation was succesful.
+        str: Created YouTube subscription ID or ``None`` if operation was not
+            succesful.
     """
 
     try:
-        yt_get_client().subscriptions().insert(
+        subscription = yt_get_client().subscriptions().insert(
             body = build_resource({
                 'snippet.resourceId.kind': 'youtube#channel',
                 'snippet.resourceId.channelId': channel_id
@@ -115,14 +208,17 @@ def yt_create_subscription(channel_id):
             part = 'snippet'
         ).execute()
     except googleapiclient.errors.Error:
-        return False
+        return None
 
-    return True
+    yt_add_pending_change('subscription', subscription['id'], subscription)
+
+    return subscription['id']
 
 def yt_remove_subscription(subscription_id):
     """Removes YouTube subscription.
 
-    Unsubscribes authenticated user from given YouTube channel.
+    Unsubscribes authenticated user from given YouTube channel. The removal
+        is pending until YouTube stops listing the subscription.
 
     Args:
         subscription_id (str): YouTube subscription ID.
@@ -138,8 +234,101 @@ def yt_remove_subscription(subscription_id):
     except googleapiclient.errors.Error:
         return False
 
+    yt_add_pending_change('subscription', subscription_id, None)
+
     return True
 
+def yt_add_pending_change(kind, id, value):
+    """Records pending change.
+
+    YouTube Data API is eventually consistent: changes made by the application
+        may not be listed for a while. Pending changes of authenticated user
+        are overlaid on listed data until confirmed by
+        :func:`~videolog.youtube.yt_confirm_pending_changes()` or for
+        ``PENDING_CHANGE_TTL`` at most. They are kept in the database, so all
+        application processes see them.
+
+    Args:
+        kind (str): ``subscription`` (value is subscription resource or
+            ``None`` if removed) or ``playlist`` (value is playlist title).
+        id (str): YouTube subscription or playlist ID.
+        value: Changed value.
+    """
+
+    def update(db):
+        db_get_meta(db).setdefault('pending', {})[kind + ':' + id] = [
+            value, time.time() + PENDING_CHANGE_TTL
+        ]
+
+    db_apply(update)
+
+def yt_get_pending_changes(kind = None):
+    """Gets pending changes.
+
+    Args:
+        kind (Optional[str]): ``subscription`` or ``playlist`` (all if not
+            given).
+
+    Returns:
+        dict: Changed values by YouTube subscription or playlist ID (by
+            ``(kind, id)`` if kind is not given).
+    """
+
+    changes = {}
+
+    for key, (value, expires) in db_get_meta(get_db()).get('pending', {}).items():
+        key = tuple(key.split(':', 1))
+        if expires <= time.time():
+            continue
+        elif kind is None:
+            changes[key] = value
+        elif key[0] == kind:
+            changes[key[1]] = value
+
+    return changes
+
+def yt_confirm_pending_changes():
+    """Confirms pending changes with YouTube.
+
+    Drops pending changes of authenticated user which YouTube already lists
+        (and expired ones). Nothing is confirmed if subscriptions could not
+        be listed.
+
+    Returns:
+        int: Number of changes still pending.
+    """
+
+    changes = yt_get_pending_changes()
+    confirmed = set()
+
+    if any(kind == 'subscription' for kind, id in changes):
+        items = yt_get_subscription_items()
+        if items is None:
+            return len(changes)
+        listed = set([item['id'] for item in items])
+        for (kind, id), value in changes.items():
+            if kind == 'subscription' and (id in listed) == (value is not None):
+                confirmed.add((kind, id))
+
+    for (kind, id), value in changes.items():
+        if kind == 'playlist':
+            if yt_get_playlist(id, pending = False).get('snippet', {}).get('title') == value:
+                confirmed.add((kind, id))
+
+    def update(db):
+        pending = db_get_meta(db).get('pending', {})
+        for key, (value, expires) in list(pending.items()):
+            kind, id = key.split(':', 1)
+            if expires <= time.time() or (
+                (kind, id) in confirmed and value == changes[(kind, id)]
+            ):
+                pending.pop(key)
+
+    if confirmed or len(changes) < len(db_get_meta(get_db()).get('pending', {})):
+        db_apply(update)
+
+    return len(changes) - len(confirmed)
+
 def yt_get_channel(part, channel_id = None, user = None):
     """Gets YouTube channel.
 
@@ -174,20 +363,106 @@ def yt_get_channel(part, channel_id = None, user = None):
 
     return response['items'][0]
 
-def yt_get_channel_videos(channel_id):
+def yt_get_channels(channel_ids, part):
+    """Gets YouTube channels.
+
+    Gets given parts of multiple YouTube channels, 50 channels per request.
+
+    Args:
+        channel_ids (iterable): YouTube channel IDs.
+        part (str): Requested channel resource parts.
+
+    Returns:
+        dict: YouTube channels by their IDs (unavailable channels are
+            missing).
+    """
+
+    client = yt_get_client()
+    channel_ids = list(channel_ids)
+    channels = {}
+
+    for start in range(0, len(channel_ids), 50):
+        try:
+            response = client.channels().list(
+                part = part, id = ','.join(channel_ids[start:start + 50]),
+                maxResults = 50
+            ).execute()
+        except googleapiclient.errors.Error:
+            continue
+
+        for channel in response['items']:
+            channels[channel['id']] = channel
+
+    return channels
+
+def yt_get_channel_videos(channel_id, db = None):
     """Gets YouTube channel videos.
 
-    Gets all uploaded videos for given YouTube channel. Includes information
-        whether they were ``played`` or ``archived`` from the database.
+    Gets all uploaded videos for given YouTube channel from channel's catalog
+        (see :func:`~videolog.youtube.yt_get_channel_catalog()`), so channel's
+        uploads are listed from YouTube only if the catalog is missing or
+        stale. Includes information whether they were ``played`` or
+        ``archived`` from the database.
 
     Args:
         channel_id (str): YouTube channel ID.
+        db (Optional[dict]): Already loaded database (loaded if not given).
 
     Returns:
-        list: YouTube videos uploaded by given channel.
+        list: YouTube videos uploaded by given channel (oldest first).
     """
 
-    db = get_db()
+    if db is None:
+        db = get_db()
+    channel = db.get(flask.session['user']['id'], {}).get(channel_id, {})
+    played = channel.get('played', {})
+    archived = channel.get('archived', {})
+
+    return [
+        dict(video,
+            played = played.get(video['snippet']['resourceId']['videoId']),
+            archived = archived.get(video['snippet']['resourceId']['videoId'])
+        )
+        for video in yt_get_channel_catalog(channel_id).videos
+    ]
+
+def yt_get_catalog_version(channel_ids):
+    """Gets version of channel catalogs.
+
+    Args:
+        channel_ids (iterable): YouTube channel IDs.
+
+    Returns:
+        str: Version changing whenever known videos of any of the channels
+            change.
+    """
+
+    return hashlib.sha1(json.dumps([
+        _catalog_stamps.get(channel_id) for channel_id in channel_ids
+    ]).encode()).hexdigest()
+
+def yt_get_channel_catalog(channel_id):
+    """Gets YouTube channel catalog.
+
+    Gets catalog of channel's known videos. The catalog is kept from the last
+        listing of channel's videos; channel's uploads are listed only if
+        there is none (or it is older than ``CHANNEL_CATALOG_TTL``). Listing
+        refreshes catalog's version (see
+        :func:`~videolog.youtube.yt_get_catalog_version()`).
+
+    Args:
+        channel_id (str): YouTube channel ID.
+
+    Returns:
+        videolog.index.ChannelCatalog: Channel's known videos (empty on
+            failure).
+    """
+
+    catalog = _catalog_cache.get(channel_id)
+
+    if catalog is not None:
+        return catalog
+
     client = yt_get_client()
 
     try:
@@ -203,21 +478,84 @@ def yt_get_channel_videos(channel_id):
 
         while True:
             response = client.playlistItems().list(**kwargs).execute()
-
-            for item in response['items']:
-                video_id = item['snippet']['resourceId']['videoId']
-
-                item['played'] = db_get_video(video_id, channel_id, 'played')
-                item['archived'] = db_get_video(video_id, channel_id, 'archived')
-
-                items.append(item)
+            items.extend(response['items'])
 
             if 'nextPageToken' not in response:
-                return items
+                break
             else:
                 kwargs['pageToken'] = response['nextPageToken']
     except googleapiclient.errors.Error:
-        return []
+        return ChannelCatalog([])
+
+    catalog = ChannelCatalog(items)
+    _catalog_cache.set(channel_id, catalog)
+    _catalog_stamps.set(channel_id, hashlib.sha1(
+        json.dumps(catalog.ids).encode()
+    ).hexdigest())
+
+    return catalog
+
+def yt_get_next_unplayed(channel_id, played):
+    """Gets next unplayed YouTube video.
+
+    Gets the oldest unplayed video of channel's catalog. Authenticated user's
+        cursor into the catalog is kept between calls (see
+        :func:`~videolog.youtube.yt_update_next_unplayed()`), so only videos
+        played since the last call are skipped.
+
+    Args:
+        channel_id (str): YouTube channel ID.
+        played (dict): Channel's played videos from the database.
+
+    Returns:
+        str: YouTube video ID or ``None`` if all videos were played.
+    """
+
+    catalog = yt_get_channel_catalog(channel_id)
+    key = (flask.session['user']['id'], channel_id)
+    cursor = _next_unplayed_cache.get(key)
+
+    # Every video before the cursor is played, so fewer played videos means
+    # the channel's record was reset (e.g. channel re-tracked).
+    if cursor is None or cursor['catalog'] is not catalog or \
+            cursor['position'] > len(played):
+        cursor = { 'catalog': catalog, 'position': 0 }
+
+    while cursor['position'] < len(catalog) and \
+            catalog.ids[cursor['position']] in played:
+        cursor['position'] += 1
+
+    _next_unplayed_cache.set(key, cursor)
+
+    if cursor['position'] < len(catalog):
+        return catalog.ids[cursor['position']]
+    else:
+        return None
+
+def yt_update_next_unplayed(channel_id, video_id, played):
+    """Updates next unplayed YouTube video cursor.
+
+    Moves authenticated user's cursor forward when the next unplayed video is
+        marked as played, or back to a video before the cursor marked as
+        unplayed.
+
+    Args:
+        channel_id (str): YouTube channel ID.
+        video_id (str): YouTube video ID.
+        played (bool): Whether the video has been marked as played.
+    """
+
+    def update(cursor):
+        position = cursor['catalog'].positions.get(video_id)
+
+        if position is None:
+            return
+        elif played and position == cursor['position']:
+            cursor['position'] += 1
+        elif not played and position < cursor['position']:
+            cursor['position'] = position
+
+    _next_unplayed_cache.update((flask.session['user']['id'], channel_id), update)
 
 def yt_get_video(video_id):
     """Gets YouTube video.
@@ -249,10 +587,14 @@ def yt_get_video(video_id):
             id = video_id
         ).execute()['items'][0]['rating']
 
-        for playlist_id, data in yt_get_playlists(no_items = True).items():
+        index = yt_get_playlist_index()
+        if index is None:
+            return {}
+        membership = index['videos'].get(video['id'], {})
+        for playlist_id, title in index['playlists'].items():
             video['playlists'][playlist_id] = {}
-            video['playlists'][playlist_id]['title'] = data['title']
-            if video['id'] in data['videos']:
+            video['playlists'][playlist_id]['title'] = title
+            if playlist_id in membership:
                 video['playlists'][playlist_id]['included'] = True
             else:
                 video['playlists'][playlist_id]['included'] = False
@@ -263,6 +605,37 @@ def yt_get_video(video_id):
 
     return video
 
+def yt_get_videos(video_ids, part = 'contentDetails'):
+    """Gets YouTube videos.
+
+    Gets given parts of multiple YouTube videos, 50 videos per request.
+
+    Args:
+        video_ids (iterable): YouTube video IDs.
+        part (Optional[str]): Requested video resource parts.
+
+    Returns:
+        dict: YouTube videos by their IDs (unavailable videos are missing).
+    """
+
+    client = yt_get_client()
+    video_ids = list(video_ids)
+    videos = {}
+
+    for start in range(0, len(video_ids), 50):
+        try:
+            response = client.videos().list(
+                part = part, id = ','.join(video_ids[start:start + 50]),
+                maxResults = 50
+            ).execute()
+        except googleapiclient.errors.Error:
+            continue
+
+        for video in response['items']:
+            videos[video['id']] = video
+
+    return videos
+
 def yt_get_comments(video_id):
     """Gets YouTube video comments.
 
@@ -354,7 +727,8 @@ def yt_get_playlists(no_items = False):
         ``id``: ``{ 'title': ..., 'videos': ... }``.
 
     Returns:
-        dict: YouTube playlists.
+        dict: YouTube playlists or ``None`` if they (or any playlist's
+            videos) could not be fetched.
     """
 
     client = yt_get_client()
@@ -378,22 +752,86 @@ def yt_get_playlists(no_items = False):
                 kwargs['pageToken'] = response['nextPageToken']
 
         for playlist_id in playlists.keys():
-            if no_items:
-                playlists[playlist_id]['videos'] = []
-            else:
-                playlists[playlist_id]['videos'] = (
-                    yt_get_playlist_items(playlist_id, video_ids_only = True)
-                )
+            if not no_items:
+                videos = yt_get_playlist_items(playlist_id, video_ids_only = True)
+                if videos is None:
+                    return None
+                playlists[playlist_id]['videos'] = videos
     except googleapiclient.errors.Error:
-        return {}
+        return None
 
     return playlists
 
-def yt_get_playlist(playlist_id):
+def yt_get_playlist_index():
+    """Gets YouTube playlists membership index.
+
+    Gets authenticated user's YouTube playlist titles and index of their
+        videos in form of ``{ 'playlists': { id: title },
+        'videos': { video_id: { playlist_id: item_id } } }``. The index is
+        built once per user (paging through every playlist), then kept
+        up to date by playlist changes made by the application and rebuilt
+        after ``PLAYLISTS_CACHE_TTL``. Incomplete index is never cached.
+
+    Returns:
+        dict: YouTube playlists membership index or ``None`` if it could not
+            be built.
+    """
+
+    def build():
+        index = { 'playlists': {}, 'videos': {} }
+        playlists = yt_get_playlists(no_items = True)
+
+        if playlists is None:
+            return None
+
+        for playlist_id, data in playlists.items():
+            index['playlists'][playlist_id] = data['title']
+            items = yt_get_playlist_items(playlist_id)
+            if items is None:
+                return None
+            for item in items:
+                video_id = item['snippet']['resourceId']['videoId']
+                index['videos'].setdefault(video_id, {})[playlist_id] = item['id']
+
+        return index
+
+    return _playlists_cache.get_or_set(flask.session['user']['id'], build)
+
+def yt_update_playlist_index(video_id = None, playlist_id = None, item_id = None,
+                             title = None):
+    """Updates YouTube playlists membership index.
+
+    Records video insertion (``item_id`` given) or removal (``item_id`` is
+        ``None``) or playlist creation or rename (``title`` given) in
+        authenticated user's index, if it is built.
+
+    Args:
+        video_id (Optional[str]): YouTube video ID.
+        playlist_id (Optional[str]): YouTube playlist ID.
+        item_id (Optional[str]): YouTube playlist item ID.
+        title (Optional[str]): YouTube playlist title.
+    """
+
+    def update(index):
+        if title is not None:
+            index['playlists'][playlist_id] = title
+        elif item_id is not None:
+            index['videos'].setdefault(video_id, {})[playlist_id] = item_id
+        else:
+            index['videos'].get(video_id, {}).pop(playlist_id, None)
+
+    _playlists_cache.update(flask.session['user']['id'], update)
+    db_update_version()
+
+def yt_get_playlist(playlist_id, pending = True):
     """Gets YouTube playlist.
 
     Gets information about single YouTube playlist.
 
+    Args:
+        playlist_id (str): YouTube playlist ID.
+        pending (bool): Whether to overlay pending rename.
+
     Returns:
         dict: YouTube playlist.
     """
@@ -407,7 +845,14 @@ def yt_get_playlist(playlist_id):
     except googleapiclient.errors.Error:
         return {}
 
-    return response['items'][0]
+    playlist = response['items'][0]
+
+    if pending:
+        title = yt_get_pending_changes('playlist').get(playlist_id)
+        if title is not None:
+            playlist['snippet']['title'] = title
+
+    return playlist
 
 def yt_get_playlist_items(playlist_id, video_ids_only = False):
     """Gets YouTube playlist's videos.
@@ -419,7 +864,8 @@ def yt_get_playlist_items(playlist_id, video_ids_only = False):
         video_ids_only (bool): Whether to get IDs only.
 
     Returns:
-        list: YouTube playlist videos or video IDs.
+        list: YouTube playlist videos or video IDs or ``None`` if they could
+            not be fetched.
     """
 
     part = 'contentDetails' if video_ids_only else 'snippet'
@@ -444,7 +890,7 @@ def yt_get_playlist_items(playlist_id, video_ids_only = False):
             else:
                 kwargs['pageToken'] = response['nextPageToken']
     except googleapiclient.errors.Error:
-        return []
+        return None
 
 def yt_insert_to_playlist(video_id, playlist_id):
     """Inserts YouTube video to playlist.
@@ -456,37 +902,70 @@ def yt_insert_to_playlist(video_id, playlist_id):
         playlist_id (str): YouTube playlist ID.
 
     Returns:
-        bool: Whether operation was succesful.
+        str: Inserted YouTube playlist item ID or ``None`` if operation
+            was not succesful.
+
+    Raises:
+        PlaylistFull: Playlist has reached maximum number of videos.
     """
 
     try:
-        yt_get_client().playlistItems().insert(
+        item_id = yt_get_client().playlistItems().insert(
             body = build_resource({
                 'snippet.playlistId': playlist_id,
                 'snippet.resourceId.kind': 'youtube#video',
                 'snippet.resourceId.videoId': video_id
             }),
             part = 'snippet'
-        ).execute()
+        ).execute()['id']
+    except googleapiclient.errors.HttpError as e:
+        details = e.error_details if isinstance(e.error_details, list) else []
+        if any(
+            isinstance(detail, dict) and
+            detail.get('reason') == 'playlistContainsMaximumNumberOfVideos'
+            for detail in details
+        ):
+            raise PlaylistFull(playlist_id)
+        return None
     except googleapiclient.errors.Error:
-        return False
+        return None
 
-    return True
+    yt_update_playlist_index(video_id, playlist_id, item_id)
+
+    return item_id
 
-def yt_remove_from_playlist(video_id, playlist_id):
+def yt_remove_from_playlist(video_id, playlist_id, item_id = None):
     """Removes YouTube video from playlist.
 
-    Removes given YouTube video from YouTube playlist.
+    Removes given YouTube video from YouTube playlist. Deletes playlist item
+        directly if its ID is known (given or found in playlists membership
+        index), otherwise (or if that fails) pages through the playlist
+        to find it.
 
     Args:
         video_id (str): YouTube video ID.
         playlist_id (str): YouTube playlist ID.
+        item_id (Optional[str]): YouTube playlist item ID.
 
     Returns:
         bool: Whether operation was succesful.
     """
 
     client =  yt_get_client()
+
+    if item_id is None:
+        index = _playlists_cache.get(flask.session['user']['id'])
+        if index is not None:
+            item_id = index['videos'].get(video_id, {}).get(playlist_id)
+
+    if item_id is not None:
+        try:
+            client.playlistItems().delete(id = item_id).execute()
+            yt_update_playlist_index(video_id, playlist_id)
+            return True
+        except googleapiclient.errors.Error:
+            pass
+
     kwargs = {
         'part': 'snippet', 'maxResults': 50,
         'playlistId': playlist_id
@@ -499,6 +978,7 @@ def yt_remove_from_playlist(video_id, playlist_id):
             for item in response['items']:
                 if item['snippet']['resourceId']['videoId'] == video_id:
                     client.playlistItems().delete(id = item['id']).execute()
+                    yt_update_playlist_index(video_id, playlist_id)
                     return True
 
             if 'nextPageToken' not in response:
@@ -508,6 +988,60 @@ def yt_remove_from_playlist(video_id, playlist_id):
     except googleapiclient.errors.Error:
         return False
 
+def yt_remove_videos_from_playlist(playlist_id, videos, callback = None):
+    """Removes YouTube videos from playlist.
+
+    Removes given YouTube videos from YouTube playlist. Deletes playlist items
+        directly if their IDs are known, the rest is found by paging through
+        the playlist once. Videos not found in the playlist count as removed.
+
+    Args:
+        playlist_id (str): YouTube playlist ID.
+        videos (dict): YouTube playlist item IDs (or ``None`` if unknown) by
+            YouTube video ID.
+        callback (Optional[function]): Called with YouTube video ID after its
+            removal.
+
+    Returns:
+        set: Removed YouTube video IDs (the rest could not be removed).
+    """
+
+    client = yt_get_client()
+    index = _playlists_cache.get(flask.session['user']['id'])
+    removed = set()
+
+    def delete(video_id, item_id):
+        try:
+            client.playlistItems().delete(id = item_id).execute()
+        except googleapiclient.errors.Error:
+            return
+        yt_update_playlist_index(video_id, playlist_id)
+        removed.add(video_id)
+        if callback is not None:
+            callback(video_id)
+
+    for video_id, item_id in videos.items():
+        if item_id is None and index is not None:
+            item_id = index['videos'].get(video_id, {}).get(playlist_id)
+        if item_id is not None:
+            delete(video_id, item_id)
+
+    if len(removed) < len(videos):
+        items = yt_get_playlist_items(playlist_id)
+        if items is None:
+            return removed
+
+        present = set()
+        for item in items:
+            video_id = item['snippet']['resourceId']['videoId']
+            if video_id in videos and video_id not in removed:
+                present.add(video_id)
+                delete(video_id, item['id'])
+
+        removed.update(set(videos) - present)
+
+    return removed
+
 def yt_create_playlist():
     """Creates YouTube playlist.
 
@@ -519,12 +1053,12 @@ def yt_create_playlist():
     """
 
     try:
-        return yt_get_client().playlists().insert(
+        playlist = yt_get_client().playlists().insert(
             body = build_resource({
                 'snippet.title': (
                     flask.session['user']['name'] +
                     '\'s Archive #' +
-                    str(len(db_get_archives()) + 1)
+                    str(len(db_get_archive_counts()) + 1)
                 ),
                 'status.privacyStatus': 'private'
             }),
@@ -533,8 +1067,20 @@ def yt_create_playlist():
     except googleapiclient.errors.Error:
         return {}
 
+    yt_update_playlist_index(
+        playlist_id = playlist['id'], title = playlist['snippet']['title']
+    )
+
+    return playlist
+
 def yt_rename_playlist(playlist_id, name):
     """Renames YouTube playlist.
+
+    The new name is pending until YouTube lists it.
+
+    Args:
+        playlist_id (str): YouTube playlist ID.
+        name (str): New playlist title.
     """
 
     try:
@@ -547,3 +1093,6 @@ def yt_rename_playlist(playlist_id, name):
         ).execute()
     except googleapiclient.errors.Error:
         return {}
+
+    yt_add_pending_change('playlist', playlist_id, name)
+    yt_update_playlist_index(playlist_id = playlist_id, title = name)